@@ -0,0 +1,322 @@
+"""Streams JSONL or CSV records through an IContentSafety operation.
+
+Every record is passed to the operation as keyword arguments, e.g. a "text" column
+for text_moderation, and one JSON line is written per record as soon as it
+completes: {"index": ..., "id": ..., "result": ..., "error": ...}. Records are read
+only when a request slot is free, so memory stays constant whatever the input
+size. A checkpoint file next to the output records progress, and re-running the
+same command resumes an interrupted run where it stopped. Failed records are
+recorded too; --retry-failed runs them again, and their new line supersedes the
+error line written earlier:
+
+    content-safety-bulk records.jsonl results.jsonl --max-concurrency 16
+    content-safety-bulk records.jsonl results.jsonl --retry-failed
+    content-safety-bulk records.csv results.jsonl --arg 'categories=["Hate"]'
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any, Iterable, Iterator, Literal
+
+if TYPE_CHECKING:
+    from azure_content_safety.protocols.i_content_safety import IContentSafety
+
+OPERATIONS = (
+    "text_moderation",
+    "text_moderation_long",
+    "image_moderation",
+    "prompt_shield",
+    "detect_groundedness",
+    "detect_protected_materials",
+    "detect_protected_material_for_code",
+)
+"""Operations of IContentSafety that can be run over records."""
+
+CHECKPOINT_VERSION = 1
+
+
+def read_records(path: Path, format: Literal["jsonl", "csv"]) -> Iterator[dict]:
+    """Lazily reads the records of a JSONL or CSV (with header) file."""
+    with path.open(newline="" if format == "csv" else None, encoding="utf-8") as f:
+        if format == "csv":
+            yield from csv.DictReader(f)
+            return
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+@dataclass
+class Checkpoint:
+    """Progress of a bulk run.
+
+    Every record below watermark is done, as are the records in done, which
+    completed while an earlier record was still in flight. Records in failed are
+    done but failed, so that a later run can retry them. output_offset is the size
+    of the output file when the checkpoint was saved; lines written after it are
+    discarded on resume, so no record is written twice by interrupted runs.
+    """
+
+    path: Path
+    watermark: int = 0
+    done: set[int] = field(default_factory=set)
+    output_offset: int = 0
+    failed: set[int] = field(default_factory=set)
+
+    @classmethod
+    def load(cls, path: Path) -> "Checkpoint":
+        if not path.exists():
+            return cls(path)
+        data = json.loads(path.read_text())
+        if data.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"unsupported checkpoint file {path}")
+        return cls(
+            path,
+            watermark=data["watermark"],
+            done=set(data["done"]),
+            output_offset=data["output_offset"],
+            failed=set(data.get("failed", [])),
+        )
+
+    def is_done(self, index: int) -> bool:
+        return index < self.watermark or index in self.done
+
+    def mark(self, index: int, failed: bool = False) -> None:
+        if failed:
+            self.failed.add(index)
+        else:
+            self.failed.discard(index)
+        if index < self.watermark:
+            return  # a retried record
+        self.done.add(index)
+        while self.watermark in self.done:
+            self.done.remove(self.watermark)
+            self.watermark += 1
+
+    def save(self) -> None:
+        data = {
+            "version": CHECKPOINT_VERSION,
+            "watermark": self.watermark,
+            "done": sorted(self.done),
+            "output_offset": self.output_offset,
+            "failed": sorted(self.failed),
+        }
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps(data))
+        os.replace(tmp, self.path)
+
+
+@dataclass
+class BulkRunSummary:
+    succeeded: int = 0
+    failed: int = 0
+    skipped: int = 0
+    """Records done by a previous run."""
+    failed_before: int = 0
+    """Records that failed in a previous run and were not retried."""
+
+
+def _to_json(result: Any) -> Any:
+    if hasattr(result, "model_dump"):
+        return result.model_dump(mode="json")
+    return result
+
+
+async def run_bulk(
+    content_safety: "IContentSafety",
+    operation: str,
+    records: Iterable[dict],
+    output: IO[bytes],
+    checkpoint: Checkpoint,
+    max_concurrency: int = 8,
+    id_field: str = "id",
+    args: dict[str, Any] | None = None,
+    json_fields: Iterable[str] = (),
+    checkpoint_every: int = 100,
+    retry_failed: bool = False,
+) -> BulkRunSummary:
+    """Runs operation over the records, writing one JSON line per record to output
+    in completion order, and saves the checkpoint every checkpoint_every records
+    and on exit (including cancellation). With retry_failed, the records that
+    failed in a previous run are run again."""
+    from azure_content_safety.services.batching import bounded_map
+
+    if operation not in OPERATIONS:
+        raise ValueError(f"operation must be one of {', '.join(OPERATIONS)}")
+
+    fn = getattr(content_safety, operation)
+    json_fields = frozenset(json_fields)
+    summary = BulkRunSummary()
+
+    def pending() -> Iterator[tuple[int, dict]]:
+        for index, record in enumerate(records):
+            if not checkpoint.is_done(index) or (
+                retry_failed and index in checkpoint.failed
+            ):
+                yield index, record
+            elif index in checkpoint.failed:
+                summary.failed_before += 1
+            else:
+                summary.skipped += 1
+
+    async def call(item: tuple[int, dict]) -> tuple[int, Any, Any, Exception | None]:
+        index, record = item
+        record = dict(record)
+        record_id = record.pop(id_field, index)
+        kwargs = dict(args or {})
+        for key, value in record.items():
+            kwargs[key] = json.loads(value) if key in json_fields else value
+        try:
+            return index, record_id, await fn(**kwargs), None
+        except Exception as e:
+            return index, record_id, None, e
+
+    since_save = 0
+    items = bounded_map(call, pending(), max_concurrency, ordered=False)
+    try:
+        async for item in items:
+            index, record_id, result, error = item.result  # type: ignore[misc]
+            line = {
+                "index": index,
+                "id": record_id,
+                "result": _to_json(result),
+                "error": None if error is None else f"{type(error).__name__}: {error}",
+            }
+            output.write(json.dumps(line).encode() + b"\n")
+            checkpoint.mark(index, failed=error is not None)
+            if error is None:
+                summary.succeeded += 1
+            else:
+                summary.failed += 1
+
+            since_save += 1
+            if since_save >= checkpoint_every:
+                _save(output, checkpoint)
+                since_save = 0
+    finally:
+        await items.aclose()
+        _save(output, checkpoint)
+
+    return summary
+
+
+def _save(output: IO[bytes], checkpoint: Checkpoint) -> None:
+    output.flush()
+    checkpoint.output_offset = output.tell()
+    checkpoint.save()
+
+
+def open_output(path: Path, checkpoint: Checkpoint) -> IO[bytes]:
+    """Opens the output file, truncated to the checkpoint when resuming."""
+    if checkpoint.output_offset and path.exists():
+        output = path.open("r+b")
+        output.truncate(checkpoint.output_offset)
+        output.seek(0, os.SEEK_END)
+        return output
+
+    checkpoint.watermark = 0
+    checkpoint.done.clear()
+    checkpoint.output_offset = 0
+    return path.open("wb")
+
+
+def _parse_arg(value: str) -> tuple[str, Any]:
+    key, sep, raw = value.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected KEY=JSON, got {value!r}")
+    try:
+        return key, json.loads(raw)
+    except json.JSONDecodeError:
+        return key, raw
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("input", type=Path, help="JSONL or CSV file of records")
+    parser.add_argument("output", type=Path, help="JSONL file of results")
+    parser.add_argument("--operation", choices=OPERATIONS, default="text_moderation")
+    parser.add_argument(
+        "--format",
+        choices=("jsonl", "csv"),
+        help="input format, defaults to the extension of the input",
+    )
+    parser.add_argument(
+        "--arg",
+        type=_parse_arg,
+        action="append",
+        default=[],
+        metavar="KEY=JSON",
+        help="argument passed with every record, e.g. 'categories=[\"Hate\"]'",
+    )
+    parser.add_argument(
+        "--json-field",
+        action="append",
+        default=[],
+        help="CSV column holding JSON, e.g. groundingSources",
+    )
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--checkpoint", type=Path, help="defaults to OUTPUT.checkpoint")
+    parser.add_argument("--checkpoint-every", type=int, default=100)
+    parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="run the records that failed in a previous run again",
+    )
+    args = parser.parse_args(argv)
+    if args.format is None:
+        args.format = "csv" if args.input.suffix.lower() == ".csv" else "jsonl"
+    if args.checkpoint is None:
+        args.checkpoint = args.output.with_name(args.output.name + ".checkpoint")
+    return args
+
+
+async def run(args: argparse.Namespace) -> BulkRunSummary:
+    from azure_content_safety.hosting import lifespan
+    from azure_content_safety.protocols.i_content_safety import IContentSafety
+
+    checkpoint = Checkpoint.load(args.checkpoint)
+    with open_output(args.output, checkpoint) as output:
+        async with lifespan() as container:
+            return await run_bulk(
+                container[IContentSafety],
+                args.operation,
+                read_records(args.input, args.format),
+                output,
+                checkpoint,
+                max_concurrency=args.max_concurrency,
+                id_field=args.id_field,
+                args=dict(args.arg),
+                json_fields=args.json_field,
+                checkpoint_every=args.checkpoint_every,
+                retry_failed=args.retry_failed,
+            )
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    try:
+        summary = asyncio.run(run(args))
+    except KeyboardInterrupt:
+        print("interrupted, re-run the command to resume", file=sys.stderr)
+        return 130
+
+    print(
+        f"succeeded: {summary.succeeded}, failed: {summary.failed}, "
+        f"skipped: {summary.skipped}, failed before: {summary.failed_before}",
+        file=sys.stderr,
+    )
+    if summary.failed or summary.failed_before:
+        print("re-run with --retry-failed to retry the failures", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,24 @@
+class ContentSafetyHttpError(ValueError):
+    """Raised when the Content Safety service answers with a non-200 status."""
+
+    def __init__(
+        self, fn_name: str, status: int, body: object, retry_after: str | None = None
+    ):
+        super().__init__(f"Failed to {fn_name}: {body}")
+        self.fn_name = fn_name
+        self.status = status
+        self.body = body
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the service while the circuit of an operation is
+    open. fail_open tells callers whether to let the content through (fail open)
+    or to treat it as blocked (fail closed). The analysis methods of ContentSafety
+    only raise it when failing closed; blocklist management always raises it."""
+
+    def __init__(self, fn_name: str, retry_in: float, fail_open: bool = False):
+        super().__init__(f"Circuit of {fn_name} is open, retry in {retry_in:.1f}s")
+        self.fn_name = fn_name
+        self.retry_in = retry_in
+        self.fail_open = fail_open
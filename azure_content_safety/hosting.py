@@ -3,32 +3,88 @@ Utilizes the Lagom library for dependency injection, see more at:
 
 - https://lagom-di.readthedocs.io/en/latest/
 - https://github.com/meadsteve/lagom
+
+Importing this module has no side effects: the container (and lagom) is built on
+first access of `container`, and the .env file is loaded when the container first
+resolves IContentSafety, so that short-lived workers only pay for what they use.
 """
 
 import logging
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator
+
+if TYPE_CHECKING:
+    from lagom import Container
 
-from dotenv import load_dotenv
-from lagom import Container, dependency_definition
+    container: Container
+    """The top level DI container for our application."""
 
-from azure_content_safety.protocols.i_content_safety import IContentSafety
+_container: "Container | None" = None
 
-load_dotenv(dotenv_path=".env")
 
+def get_container() -> "Container":
+    global _container
+    if _container is None:
+        _container = _build_container()
+    return _container
 
-container = Container()
-"""The top level DI container for our application."""
+
+def __getattr__(name: str) -> object:
+    # `from azure_content_safety.hosting import container` builds the container
+    if name == "container":
+        return get_container()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # Register our dependencies ------------------------------------------------------------
 
 
-@dependency_definition(container, singleton=True)
-def _() -> logging.Logger:
-    return logging.getLogger("studio_board")
+def _build_container() -> "Container":
+    from lagom import Container, dependency_definition
+
+    from azure_content_safety.protocols.i_content_safety import IContentSafety
+    from azure_content_safety.services.sync_content_safety import SyncContentSafety
+
+    container = Container()
+
+    @dependency_definition(container, singleton=True)
+    def _() -> logging.Logger:
+        return logging.getLogger("studio_board")
+
+    @dependency_definition(container, singleton=True)
+    def _(c: Container) -> IContentSafety:
+        from dotenv import load_dotenv
+
+        from azure_content_safety.services.content_safety import ContentSafety
+
+        load_dotenv(dotenv_path=".env")
+        return c[ContentSafety]
+
+    @dependency_definition(container, singleton=True)
+    def _(c: Container) -> SyncContentSafety:
+        # a second instance would run the singleton IContentSafety on a second loop
+        return SyncContentSafety(c[IContentSafety])
+
+    return container
+
+
+# Lifecycle ----------------------------------------------------------------------------
+
 
+@asynccontextmanager
+async def lifespan() -> AsyncIterator["Container"]:
+    """Starts the long-lived services of the container (e.g. the pooled HTTP session
+    of IContentSafety) and closes them on exit.
 
-@dependency_definition(container, singleton=True)
-def _(c: Container) -> IContentSafety:
-    from azure_content_safety.services.content_safety import ContentSafety
+    async with lifespan() as c:
+        result = await c[IContentSafety].text_moderation("...")
+    """
+    from azure_content_safety.protocols.i_content_safety import IContentSafety
 
-    return c[ContentSafety]
+    container = get_container()
+    content_safety = container[IContentSafety]
+    await content_safety.start()
+    try:
+        yield container
+    finally:
+        await content_safety.close()
@@ -1,5 +1,12 @@
+import hashlib
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import Any, Generic, TypeVar
+
 from pydantic import BaseModel
 
+T = TypeVar("T")
+
 
 class UserPromptAnalysis(BaseModel):
     attackDetected: bool
@@ -49,3 +56,135 @@ class TextModerationResponse(BaseModel):
 
 class ImageModerationResponse(BaseModel):
     categoriesAnalysis: list[ModerationResponseAnalysisItem]
+
+
+class TextBlocklist(BaseModel):
+    blocklistName: str
+    description: str = ""
+
+
+class TextBlocklistItem(BaseModel):
+    blocklistItemId: str
+    text: str
+    description: str = ""
+    isRegex: bool = False
+
+
+class AddOrUpdateBlocklistItemsResponse(BaseModel):
+    blocklistItems: list[TextBlocklistItem]
+
+
+class Page(BaseModel, Generic[T]):
+    value: list[T]
+    nextLink: str | None = None
+
+
+@dataclass(frozen=True)
+class BatchItem(Generic[T]):
+    """Outcome of one item of a batch call; exactly one of result and error is set."""
+
+    index: int
+    result: T | None = None
+    error: Exception | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass(frozen=True)
+class StreamVerdict:
+    """Moderation of the window text[start:end] of a streamed text."""
+
+    start: int
+    end: int
+    response: TextModerationResponse
+    blocked: bool
+
+
+@dataclass(frozen=True)
+class BlocklistSyncResult:
+    """Changes sent by a blocklist sync; unchanged items are not sent."""
+
+    upserted: list[TextBlocklistItem]
+    removed: list[str]
+
+
+@dataclass(frozen=True, slots=True)
+class CompactModeration:
+    """Lightweight text or image moderation result for high-volume batch jobs, see
+    text_moderation_many(compact=True)."""
+
+    categories: tuple[tuple[str, int], ...]
+    """(category, severity) pairs."""
+    blocklist_matches: tuple[tuple[str, str], ...] = ()
+    """(blocklist name, blocklist item id) pairs."""
+
+    def severity(self, category: str) -> int:
+        for name, severity in self.categories:
+            if name == category:
+                return severity
+        return 0
+
+    @property
+    def max_severity(self) -> int:
+        return max((severity for _, severity in self.categories), default=0)
+
+
+@dataclass(frozen=True)
+class GuardrailCheckResult:
+    """Outcome of one check of a guardrail run. A check cancelled because another
+    one blocked has neither result nor error."""
+
+    name: str
+    duration_s: float
+    result: Any = None
+    error: Exception | None = None
+    blocked: bool = False
+    cancelled: bool = False
+
+
+@dataclass(frozen=True)
+class GuardrailVerdict:
+    """Combined verdict of a guardrail run; decided_by names the check that blocked."""
+
+    blocked: bool
+    decided_by: str | None
+    checks: dict[str, GuardrailCheckResult]
+    duration_s: float
+
+
+@dataclass(frozen=True)
+class CodeChunk:
+    """Lines start_line..end_line (1-based, inclusive) of a scanned file."""
+
+    path: str
+    start_line: int
+    end_line: int
+    text: str
+
+    @cached_property
+    def digest(self) -> str:
+        return hashlib.sha256(self.text.encode()).hexdigest()
+
+
+@dataclass(frozen=True)
+class CodeScanFinding:
+    """A chunk of code that matched the code of public repositories."""
+
+    path: str
+    start_line: int
+    end_line: int
+    codeCitations: list[dict[str, str | list[str]]]
+
+
+@dataclass(frozen=True)
+class CodeScanReport:
+    """Outcome of a code scan; cached chunks were answered from the scan index."""
+
+    findings: list[CodeScanFinding]
+    files: int
+    chunks: int
+    cached: int
+    errors: dict[str, Exception] = field(default_factory=dict)
+    """Errors by "path:start_line-end_line" of the chunks that could not be scanned."""
@@ -1,22 +1,76 @@
-from typing import Literal, Protocol
+import os
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncGenerator,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    BinaryIO,
+    Callable,
+    Iterable,
+    Literal,
+    Mapping,
+    Protocol,
+    overload,
+)
 
 from pydantic import BaseModel
 
 from azure_content_safety.models import (
+    BatchItem,
+    BlocklistSyncResult,
+    CompactModeration,
     DetectGroundednessResponse,
     DetectProtectedMaterialCodeResponse,
     DetectProtectedMaterialResponse,
+    GuardrailVerdict,
     ImageModerationResponse,
     PromptShieldResponse,
+    StreamVerdict,
+    TextBlocklist,
+    TextBlocklistItem,
     TextModerationResponse,
 )
 
+if TYPE_CHECKING:
+    from azure_content_safety.services.image_preprocessing import ImagePreprocessor
+
 
 class QnAQuery(BaseModel):
     query: str
 
 
+class BlocklistItemInput(BaseModel):
+    text: str
+    description: str = ""
+
+
+ImageSource = bytes | bytearray | memoryview | os.PathLike | BinaryIO
+"""A raw image given as bytes, a buffer, a file path or a binary file object."""
+
+GuardrailCheck = Literal[
+    "prompt_shield", "text_moderation", "detect_protected_materials"
+]
+
+
 class IContentSafety(Protocol):
+    async def start(self) -> None:
+        """
+        Opens the long-lived HTTP session and its connection pool. Connections are
+        kept alive between calls so that requests on the hot path only pay for one
+        round trip on a warm connection. Calling start on a started instance is a
+        no-op; the session is also started lazily by the first request.
+        """
+        ...
+
+    async def close(self) -> None:
+        """
+        Closes the HTTP session and releases the pooled connections. The instance
+        can be started again afterwards.
+        """
+        ...
+
     async def prompt_shield(
         self, user_prompt: str, documents: list[str]
     ) -> PromptShieldResponse:
@@ -71,6 +125,40 @@ class IContentSafety(Protocol):
         """
         ...
 
+    async def detect_groundedness_sharded(
+        self,
+        text: str,
+        groundingSources: list[str],
+        reasoning: bool = False,
+        domain: Literal["Medical", "Generic"] = "Generic",
+        task: Literal["QnA", "Summarization"] = "Summarization",
+        qna: QnAQuery | None = None,
+        max_sources_length: int = 55_000,
+        max_concurrency: int | None = None,
+    ) -> DetectGroundednessResponse:
+        """
+        Detects ungrounded text against grounding sources beyond the input limit of
+        one request. Sources are deduplicated and packed into shards of at most
+        max_sources_length characters (sources longer than that are split on
+        sentence boundaries), and the shards are checked concurrently. A sentence
+        grounded by any shard is grounded, so the merged ungroundedDetails are
+        those of every shard and ungroundedPercentage never exceeds that of a
+        shard. A claim that is only supported by combining sources of different
+        shards may be reported as ungrounded. detect_groundedness delegates here
+        when its sources exceed the limit.
+
+        :param max_sources_length: Maximum total characters of sources per request
+        (at most 55,000).
+        :type max_sources_length: int
+        :param max_concurrency: The maximum number of shards in flight, defaults to
+        AZURE_CONTENT_SAFETY_MAX_CONCURRENCY.
+        :type max_concurrency: int | None
+        :return: The merged response.
+        See detect_groundedness for the other parameters; text is limited to 7,500
+        characters and checked before any request is sent.
+        """
+        ...
+
     async def detect_protected_materials(
         self, text: str
     ) -> DetectProtectedMaterialResponse:
@@ -142,12 +230,91 @@ class IContentSafety(Protocol):
         Output severities in four or eight levels, the value can be 0,2,4,6 or
         0,1,2,3,4,5,6,7.
         :type output_type: Literal["FourSeverityLevels", "EightSeverityLevels"]
+
+        Texts longer than the 10,000 characters limit of the service are moderated
+        with text_moderation_long.
+        """
+        ...
+
+    async def text_moderation_long(
+        self,
+        text: str,
+        categories: list[str] | None = None,
+        blocklist_names: list[str] | None = None,
+        halt_on_blocklist_hit: bool = True,
+        output_type: Literal[
+            "FourSeverityLevels", "EightSeverityLevels"
+        ] = "FourSeverityLevels",
+        chunk_length: int = 10_000,
+        overlap: int = 0,
+        max_concurrency: int | None = None,
+    ) -> TextModerationResponse:
+        """
+        Moderates a text of any length up to AZURE_CONTENT_SAFETY_MAX_LONG_TEXT_LENGTH
+        characters. The text is split on sentence (or whitespace) boundaries into
+        chunks that are moderated concurrently, and the chunk responses are merged:
+        each category gets its maximum severity over the chunks and blocklist matches
+        are unioned. Longer texts are rejected before any request is sent.
+
+        :param text: The text to be moderated.
+        :type text: str
+        :param chunk_length: Maximum number of characters per chunk (at most 10,000).
+        :type chunk_length: int
+        :param overlap: Number of characters shared by consecutive chunks, so that
+        blocklist items spanning a chunk boundary are still matched.
+        :type overlap: int
+        :param max_concurrency: Maximum number of chunks in flight. Defaults to
+        AZURE_CONTENT_SAFETY_MAX_CONCURRENCY.
+        :type max_concurrency: int | None
+        :return: The merged response. See text_moderation for the other parameters.
+        """
+        ...
+
+    def text_moderation_stream(
+        self,
+        deltas: AsyncIterable[str],
+        categories: list[str] | None = None,
+        blocklist_names: list[str] | None = None,
+        halt_on_blocklist_hit: bool = True,
+        output_type: Literal[
+            "FourSeverityLevels", "EightSeverityLevels"
+        ] = "FourSeverityLevels",
+        severity_threshold: int = 4,
+        window_length: int = 2_000,
+        min_new_length: int = 400,
+        context_length: int = 100,
+    ) -> AsyncIterator[StreamVerdict]:
+        """
+        Moderates a streamed text, e.g. the deltas of an LLM completion, as it
+        arrives. Each request only carries the new text plus a little context of
+        the text before it, instead of the whole prefix, and the upstream keeps
+        being consumed while windows are moderated. As soon as a window is blocked
+        (a category reaches severity_threshold or a blocklist matched) its verdict
+        is yielded, the upstream iterator is closed and the iteration ends.
+
+        async for verdict in content_safety.text_moderation_stream(deltas):
+            if verdict.blocked:
+                ...
+
+        :param deltas: The text deltas (tokens) of the stream.
+        :type deltas: AsyncIterable[str]
+        :param severity_threshold: Minimum severity of a category that blocks.
+        :type severity_threshold: int
+        :param window_length: Maximum characters per request (at most 10,000).
+        :type window_length: int
+        :param min_new_length: Number of new characters that triggers a request.
+        :type min_new_length: int
+        :param context_length: Number of already moderated characters prefixed to
+        every window, so that content spanning windows is seen.
+        :type context_length: int
+        :return: The verdicts, in the order of the windows.
+        See text_moderation for the other parameters.
         """
         ...
 
     async def image_moderation(
         self,
-        image: str,
+        image: str | ImageSource,
         categories: list[str] | None = None,
         output_type: Literal[
             "FourSeverityLevels", "EightSeverityLevels"
@@ -160,8 +327,11 @@ class IContentSafety(Protocol):
         compliance with legal requirements, maintain brand reputation, and protect
         users from exposure to harmful content.
 
-        :param image: The image to be checked for protected materials (base64).
-        :type image: str
+        :param image: The image to be checked for protected materials, either
+        base64-encoded (str) or raw: bytes, a buffer (e.g. memoryview), a file path
+        or a binary file object. Raw images are base64-encoded incrementally while
+        the request is sent, so the peak memory stays near the raw image size.
+        :type image: str | ImageSource
         :param categories: an array of category names. See the Harm categories guide
         for a list of available category names. If no categories are specified, all
         four categories are used. We use multiple categories to get scores in a single
@@ -173,3 +343,316 @@ class IContentSafety(Protocol):
         :type output_type: Literal["FourSeverityLevels", "EightSeverityLevels"]
         """
         ...
+
+    async def guardrails(
+        self,
+        text: str,
+        documents: list[str] | None = None,
+        checks: Iterable[GuardrailCheck] = (
+            "prompt_shield",
+            "text_moderation",
+            "detect_protected_materials",
+        ),
+        blocklist_names: list[str] | None = None,
+        policy: Callable[[str, Any], bool] | None = None,
+        extra_checks: Mapping[str, Callable[[], Awaitable[Any]]] | None = None,
+    ) -> GuardrailVerdict:
+        """
+        Runs the checks of a chat turn concurrently instead of one after another,
+        and combines them into one verdict. As soon as a check blocks under the
+        policy the outstanding checks are cancelled. The verdict names the check
+        that decided and holds the result and duration of every check.
+
+        verdict = await content_safety.guardrails(user_prompt, documents)
+        if verdict.blocked:
+            print(verdict.decided_by, verdict.checks[verdict.decided_by].result)
+
+        :param text: The text of the turn, the user prompt of prompt_shield.
+        :type text: str
+        :param documents: The documents of prompt_shield.
+        :type documents: list[str] | None
+        :param checks: The checks to run on text.
+        :type checks: Iterable[GuardrailCheck]
+        :param blocklist_names: The blocklists of text_moderation.
+        :type blocklist_names: list[str] | None
+        :param policy: Called as policy(check name, result), where result is the
+        exception of a failed check, returns whether the result blocks. Defaults
+        to GuardrailPolicy(), which blocks from severity 4 and on failures.
+        :type policy: Callable[[str, Any], bool] | None
+        :param extra_checks: Additional named checks, e.g. image moderation.
+        :type extra_checks: Mapping[str, Callable[[], Awaitable[Any]]] | None
+        :return: The combined verdict.
+        """
+        ...
+
+    def invalidate_blocklist(self, blocklist_name: str) -> int:
+        """
+        Drops the cached text moderation responses of requests that referenced the
+        blocklist. Call this whenever the items of the blocklist change, otherwise
+        cached verdicts may be served for up to the cache TTL. No-op when the
+        response cache is disabled.
+
+        :param blocklist_name: The name of the blocklist that changed.
+        :type blocklist_name: str
+        :return: The number of invalidated cache entries.
+        """
+        ...
+
+    async def create_or_update_blocklist(
+        self, blocklist_name: str, description: str = ""
+    ) -> TextBlocklist:
+        """
+        Creates a text blocklist, or updates the description of an existing one.
+
+        :param blocklist_name: The name of the blocklist.
+        :type blocklist_name: str
+        :param description: The description of the blocklist.
+        :type description: str
+        :return: The blocklist.
+        """
+        ...
+
+    async def list_blocklists(self) -> list[TextBlocklist]:
+        """
+        Lists all the text blocklists of the resource, following the pages of the
+        service.
+
+        :return: The blocklists.
+        """
+        ...
+
+    async def delete_blocklist(self, blocklist_name: str) -> None:
+        """
+        Deletes a text blocklist and all its items.
+
+        :param blocklist_name: The name of the blocklist.
+        :type blocklist_name: str
+        """
+        ...
+
+    async def list_blocklist_items(
+        self, blocklist_name: str
+    ) -> list[TextBlocklistItem]:
+        """
+        Lists all the items of a text blocklist, following the pages of the service.
+
+        :param blocklist_name: The name of the blocklist.
+        :type blocklist_name: str
+        :return: The items of the blocklist.
+        """
+        ...
+
+    async def add_or_update_blocklist_items(
+        self,
+        blocklist_name: str,
+        items: Iterable[str | BlocklistItemInput],
+        max_concurrency: int | None = None,
+    ) -> list[TextBlocklistItem]:
+        """
+        Adds items to a blocklist, or updates the description of the items with the
+        same text. Items are sent in batches of the maximum size accepted by the
+        service (100), with at most max_concurrency batches in flight. Cached text
+        moderation responses of the blocklist are invalidated.
+
+        :param blocklist_name: The name of the blocklist.
+        :type blocklist_name: str
+        :param items: The items, given as text or BlocklistItemInput.
+        :type items: Iterable[str | BlocklistItemInput]
+        :param max_concurrency: The maximum number of batches in flight, defaults to
+            AZURE_CONTENT_SAFETY_MAX_CONCURRENCY.
+        :type max_concurrency: int | None
+        :return: The added or updated items, with their ids.
+        """
+        ...
+
+    async def remove_blocklist_items(
+        self,
+        blocklist_name: str,
+        item_ids: Iterable[str],
+        max_concurrency: int | None = None,
+    ) -> None:
+        """
+        Removes items from a blocklist, in batches like add_or_update_blocklist_items.
+
+        :param blocklist_name: The name of the blocklist.
+        :type blocklist_name: str
+        :param item_ids: The ids of the items to be removed.
+        :type item_ids: Iterable[str]
+        """
+        ...
+
+    async def sync_blocklist(
+        self,
+        blocklist_name: str,
+        items: Iterable[str | BlocklistItemInput],
+        description: str | None = None,
+        max_concurrency: int | None = None,
+    ) -> BlocklistSyncResult:
+        """
+        Makes the items of a blocklist equal to items. The current items are listed
+        and diffed by text, so that only new items, items with a changed description
+        and items to be removed are sent. The blocklist is created when it does not
+        exist, and mirrored locally afterwards so that text_moderation can match it
+        without a network round trip.
+
+        :param blocklist_name: The name of the blocklist.
+        :type blocklist_name: str
+        :param items: The desired items, given as text or BlocklistItemInput.
+        :type items: Iterable[str | BlocklistItemInput]
+        :param description: The description of the blocklist, left unchanged when
+            None.
+        :type description: str | None
+        :return: The upserted items and the ids of the removed items.
+        """
+        ...
+
+    def prompt_shield_many(
+        self,
+        items: Iterable[tuple[str, list[str]]] | AsyncIterable[tuple[str, list[str]]],
+        max_concurrency: int | None = None,
+        ordered: bool = True,
+    ) -> AsyncGenerator[BatchItem[PromptShieldResponse], None]:
+        """
+        Runs prompt_shield over many (user_prompt, documents) pairs with at most
+        max_concurrency requests in flight. The input is consumed lazily, and an
+        error of one item is returned as the error of its BatchItem instead of
+        aborting the batch.
+
+        async for item in content_safety.prompt_shield_many(pairs):
+            print(item.index, item.result or item.error)
+
+        :param items: The (user_prompt, documents) pairs to be shielded.
+        :type items: Iterable[tuple[str, list[str]]] | AsyncIterable[...]
+        :param max_concurrency: Maximum number of requests in flight. Defaults to
+        AZURE_CONTENT_SAFETY_MAX_CONCURRENCY.
+        :type max_concurrency: int | None
+        :param ordered: Yield results in input order (True) or as they complete.
+        :type ordered: bool
+        :return: An async iterator of BatchItem.
+        """
+        ...
+
+    @overload
+    def text_moderation_many(
+        self,
+        texts: Iterable[str] | AsyncIterable[str],
+        categories: list[str] | None = None,
+        blocklist_names: list[str] | None = None,
+        halt_on_blocklist_hit: bool = True,
+        output_type: Literal[
+            "FourSeverityLevels", "EightSeverityLevels"
+        ] = "FourSeverityLevels",
+        max_concurrency: int | None = None,
+        ordered: bool = True,
+        compact: Literal[False] = False,
+    ) -> AsyncGenerator[BatchItem[TextModerationResponse], None]: ...
+
+    @overload
+    def text_moderation_many(
+        self,
+        texts: Iterable[str] | AsyncIterable[str],
+        categories: list[str] | None = None,
+        blocklist_names: list[str] | None = None,
+        halt_on_blocklist_hit: bool = True,
+        output_type: Literal[
+            "FourSeverityLevels", "EightSeverityLevels"
+        ] = "FourSeverityLevels",
+        max_concurrency: int | None = None,
+        ordered: bool = True,
+        *,
+        compact: Literal[True],
+    ) -> AsyncGenerator[BatchItem[CompactModeration], None]: ...
+
+    def text_moderation_many(
+        self,
+        texts: Iterable[str] | AsyncIterable[str],
+        categories: list[str] | None = None,
+        blocklist_names: list[str] | None = None,
+        halt_on_blocklist_hit: bool = True,
+        output_type: Literal[
+            "FourSeverityLevels", "EightSeverityLevels"
+        ] = "FourSeverityLevels",
+        max_concurrency: int | None = None,
+        ordered: bool = True,
+        compact: bool = False,
+    ) -> (
+        AsyncGenerator[BatchItem[TextModerationResponse], None]
+        | AsyncGenerator[BatchItem[CompactModeration], None]
+    ):
+        """
+        Runs text_moderation over many texts with the same options and at most
+        max_concurrency requests in flight. See prompt_shield_many for the
+        semantics of max_concurrency, ordered and the returned BatchItem.
+
+        :param texts: The texts to be moderated.
+        :type texts: Iterable[str] | AsyncIterable[str]
+        :param compact: Returns CompactModeration results, decoded straight from
+            the response body without pydantic models, for batch jobs that keep
+            many results in memory.
+        :type compact: bool
+        :return: An async iterator of BatchItem.
+        """
+        ...
+
+    @overload
+    def image_moderation_many(
+        self,
+        images: Iterable[str | ImageSource] | AsyncIterable[str | ImageSource],
+        categories: list[str] | None = None,
+        output_type: Literal[
+            "FourSeverityLevels", "EightSeverityLevels"
+        ] = "FourSeverityLevels",
+        max_concurrency: int | None = None,
+        ordered: bool = True,
+        compact: Literal[False] = False,
+        preprocessor: "ImagePreprocessor | None" = None,
+    ) -> AsyncGenerator[BatchItem[ImageModerationResponse], None]: ...
+
+    @overload
+    def image_moderation_many(
+        self,
+        images: Iterable[str | ImageSource] | AsyncIterable[str | ImageSource],
+        categories: list[str] | None = None,
+        output_type: Literal[
+            "FourSeverityLevels", "EightSeverityLevels"
+        ] = "FourSeverityLevels",
+        max_concurrency: int | None = None,
+        ordered: bool = True,
+        *,
+        compact: Literal[True],
+        preprocessor: "ImagePreprocessor | None" = None,
+    ) -> AsyncGenerator[BatchItem[CompactModeration], None]: ...
+
+    def image_moderation_many(
+        self,
+        images: Iterable[str | ImageSource] | AsyncIterable[str | ImageSource],
+        categories: list[str] | None = None,
+        output_type: Literal[
+            "FourSeverityLevels", "EightSeverityLevels"
+        ] = "FourSeverityLevels",
+        max_concurrency: int | None = None,
+        ordered: bool = True,
+        compact: bool = False,
+        preprocessor: "ImagePreprocessor | None" = None,
+    ) -> (
+        AsyncGenerator[BatchItem[ImageModerationResponse], None]
+        | AsyncGenerator[BatchItem[CompactModeration], None]
+    ):
+        """
+        Runs image_moderation over many images with the same options and at most
+        max_concurrency requests in flight. See prompt_shield_many for the
+        semantics of max_concurrency, ordered and the returned BatchItem.
+
+        :param images: The images to be moderated, see image_moderation.
+        :type images: Iterable[str | ImageSource] | AsyncIterable[...]
+        :param compact: Returns CompactModeration results, see text_moderation_many.
+        :type compact: bool
+        :param preprocessor: Prepares the request bodies (resizing, hashing and
+            encoding) in a process pool and feeds them to the requests through a
+            bounded queue, so that batches of large images are not limited to the
+            one core of the event loop. Results share cache entries with
+            image_moderation.
+        :type preprocessor: ImagePreprocessor | None
+        :return: An async iterator of BatchItem.
+        """
+        ...
@@ -0,0 +1,83 @@
+from contextlib import AbstractContextManager
+from dataclasses import dataclass
+from typing import Protocol
+
+
+@dataclass(slots=True)
+class RequestTimings:
+    """Measurements of one HTTP attempt of an operation, in seconds and bytes."""
+
+    operation: str
+    attempt: int = 0
+    status: int | None = None
+    queue_wait_s: float = 0.0
+    request_start: float = 0.0
+    connection_ready: float = 0.0
+    connection_acquire_s: float = 0.0
+    ttfb_s: float = 0.0
+    body_read_s: float = 0.0
+    request_bytes: int = 0
+    response_bytes: int = 0
+    error: str | None = None
+
+
+class IInstrumentation(Protocol):
+    def record_request(self, timings: RequestTimings) -> None:
+        """
+        Records the timings of one HTTP attempt: time spent waiting for the rate
+        limiter, acquiring a pooled connection, until the response headers arrived
+        (time to first byte) and reading the body, as well as the payload sizes and
+        the status code.
+
+        :param timings: The measurements of the attempt.
+        :type timings: RequestTimings
+        """
+        ...
+
+    def record_validation(self, operation: str, seconds: float) -> None:
+        """
+        Records the time spent decoding and validating a raw response body into its
+        pydantic model.
+
+        :param operation: The name of the IContentSafety method.
+        :type operation: str
+        :param seconds: The validation time.
+        :type seconds: float
+        """
+        ...
+
+    def span(self, operation: str) -> AbstractContextManager[None]:
+        """
+        Returns a context manager wrapping one call of a public IContentSafety
+        method, used to record its duration and to open a tracing span.
+
+        :param operation: The name of the IContentSafety method.
+        :type operation: str
+        """
+        ...
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        """
+        Adds to a counter, e.g. of the decisions of the adaptive concurrency limiter.
+
+        :param name: The name of the counter.
+        :type name: str
+        :param value: The amount to add.
+        :type value: float
+        :param labels: The labels of the counter, e.g. operation.
+        :type labels: str
+        """
+        ...
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        """
+        Sets a gauge, a value that goes up and down such as a concurrency limit.
+
+        :param name: The name of the gauge.
+        :type name: str
+        :param value: The current value.
+        :type value: float
+        :param labels: The labels of the gauge, e.g. operation.
+        :type labels: str
+        """
+        ...
@@ -0,0 +1,44 @@
+from typing import Iterable, Protocol
+
+
+class IResponseCache(Protocol):
+    def get(self, key: str) -> bytes | None:
+        """
+        Returns the cached service response for the key, or None when the key is
+        unknown or its entry has expired.
+
+        :param key: The content address of the request, see make_cache_key.
+        :type key: str
+        :return: The cached raw response body.
+        """
+        ...
+
+    def set(self, key: str, value: bytes, tags: Iterable[str] = ()) -> None:
+        """
+        Stores a service response.
+
+        :param key: The content address of the request, see make_cache_key.
+        :type key: str
+        :param value: The raw response body returned by the service.
+        :type value: bytes
+        :param tags: Tags that the entry can later be invalidated by, e.g. the
+        blocklists that the request referenced.
+        :type tags: Iterable[str]
+        """
+        ...
+
+    def invalidate(self, tag: str) -> int:
+        """
+        Removes every entry stored with the tag.
+
+        :param tag: The tag to invalidate.
+        :type tag: str
+        :return: The number of removed entries.
+        """
+        ...
+
+    def clear(self) -> None:
+        """
+        Removes all entries.
+        """
+        ...
@@ -0,0 +1,220 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Iterator
+
+from azure_content_safety.errors import ContentSafetyHttpError
+from azure_content_safety.protocols.i_instrumentation import IInstrumentation
+from azure_content_safety.services.instrumentation import LATENCY_SMOOTHING
+
+THROTTLE_STATUSES = frozenset({429, 503})
+"""Statuses by which the service asks clients to send less."""
+
+BASELINE_DRIFT = 0.01
+"""Weight of a slower sample in the baseline, so that the baseline follows a
+lasting change of the latency instead of keeping its minimum forever."""
+
+
+def is_throttled(error: BaseException) -> bool:
+    """Whether an error means that too many requests are in flight: a throttling
+    status or a timeout."""
+    if isinstance(error, ContentSafetyHttpError):
+        return error.status in THROTTLE_STATUSES
+    return isinstance(error, asyncio.TimeoutError)
+
+
+@dataclass
+class LatencyGradient:
+    """Moving average of the latency of an operation against its baseline, the
+    latency it has when the service is not loaded."""
+
+    baseline_s: float
+    latency_s: float
+
+    @property
+    def gradient(self) -> float:
+        """baseline_s / latency_s: 1 at baseline, lower as requests queue up."""
+        return self.baseline_s / self.latency_s if self.latency_s > 0 else 1.0
+
+    def record(self, seconds: float) -> None:
+        self.latency_s += LATENCY_SMOOTHING * (seconds - self.latency_s)
+        if seconds < self.baseline_s:
+            self.baseline_s = seconds
+        else:
+            self.baseline_s += BASELINE_DRIFT * (seconds - self.baseline_s)
+
+
+@dataclass
+class AdaptiveConcurrencyLimiter:
+    """Limits the requests in flight, across all operations, to a limit adjusted
+    by additive increase and multiplicative decrease (AIMD).
+
+    While the latencies stay within tolerance times their baseline and the limit
+    is in use, every successful response raises the limit by increase / limit,
+    i.e. by about increase per round trip. A throttling response (429, 503), a
+    timeout, or a latency above tolerance times the baseline multiplies the limit
+    by backoff, at most once per round trip so that the responses to one burst
+    cut it once. Latencies are tracked per operation, as image and text requests
+    take very different times. Requests over the limit wait in FIFO order.
+
+    With instrumentation, the limit, the requests in flight and queued and the
+    latency, baseline and gradient of each operation are published as gauges, and
+    the increases, decreases and throttled responses as counters.
+    """
+
+    initial_limit: float = 8.0
+    min_limit: float = 1.0
+    max_limit: float = 256.0
+    increase: float = 1.0
+    backoff: float = 0.5
+    tolerance: float = 2.0
+    clock: Callable[[], float] = time.perf_counter
+    instrumentation: IInstrumentation | None = None
+    limit: float = field(init=False)
+    in_flight: int = field(default=0, init=False)
+    increases: int = field(default=0, init=False)
+    decreases: int = field(default=0, init=False)
+    throttled: int = field(default=0, init=False)
+    _gradients: dict[str, LatencyGradient] = field(default_factory=dict, init=False)
+    _waiters: deque[asyncio.Future[None]] = field(default_factory=deque, init=False)
+    _decreased_at: float | None = field(default=None, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if not 1 <= self.min_limit <= self.max_limit:
+            raise ValueError("limits must satisfy 1 <= min_limit <= max_limit")
+        if not 0 < self.backoff < 1:
+            raise ValueError("backoff must be between 0 and 1")
+        if self.tolerance <= 1:
+            raise ValueError("tolerance must be greater than 1")
+        self.limit = min(self.max_limit, max(self.min_limit, self.initial_limit))
+
+    def _has_slot(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    def _wake(self) -> None:
+        while self._waiters and self._has_slot():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    async def acquire(self) -> float:
+        """Takes a slot, waiting for one to be free; it is released by request.
+
+        :return: The number of seconds waited.
+        """
+        if not self._waiters and self._has_slot():
+            self.in_flight += 1
+            self._publish()
+            return 0.0
+
+        started = self.clock()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._publish()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # granted while being cancelled, pass the slot on
+                self.in_flight -= 1
+                self._wake()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            self._publish()
+            raise
+        return self.clock() - started
+
+    @contextmanager
+    def request(self, operation: str) -> Iterator[None]:
+        """Releases the slot taken by acquire when the request ends, adjusting the
+        limit to its outcome. Errors of the caller and cancellations release the
+        slot without adjusting the limit."""
+        started = self.clock()
+        try:
+            yield
+        except Exception as e:
+            if is_throttled(e):
+                self.throttled += 1
+                if self.instrumentation is not None:
+                    self.instrumentation.increment("concurrency_throttled_total")
+                self._decrease()
+            raise
+        else:
+            self._record(operation, self.clock() - started)
+        finally:
+            self.in_flight -= 1
+            self._wake()
+            self._publish()
+
+    def _record(self, operation: str, seconds: float) -> None:
+        gradient = self._gradients.get(operation)
+        if gradient is None:
+            gradient = self._gradients[operation] = LatencyGradient(seconds, seconds)
+        else:
+            gradient.record(seconds)
+
+        if self.instrumentation is not None:
+            self.instrumentation.set_gauge(
+                "concurrency_latency_seconds", gradient.latency_s, operation=operation
+            )
+            self.instrumentation.set_gauge(
+                "concurrency_baseline_seconds",
+                gradient.baseline_s,
+                operation=operation,
+            )
+            self.instrumentation.set_gauge(
+                "concurrency_gradient", gradient.gradient, operation=operation
+            )
+
+        if gradient.latency_s > self.tolerance * gradient.baseline_s:
+            self._decrease()
+        elif 2 * self.in_flight >= self.limit and self.limit < self.max_limit:
+            # only grow a limit that is in use; in_flight includes this request
+            self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+            self.increases += 1
+            if self.instrumentation is not None:
+                self.instrumentation.increment("concurrency_increases_total")
+
+    def _round_trip_s(self) -> float:
+        return max((g.latency_s for g in self._gradients.values()), default=0.0)
+
+    def _decrease(self) -> None:
+        now = self.clock()
+        if (
+            self._decreased_at is not None
+            and now - self._decreased_at < self._round_trip_s()
+        ):
+            return
+        self._decreased_at = now
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+        self.decreases += 1
+        if self.instrumentation is not None:
+            self.instrumentation.increment("concurrency_decreases_total")
+
+    def _publish(self) -> None:
+        if self.instrumentation is None:
+            return
+        self.instrumentation.set_gauge("concurrency_limit", self.limit)
+        self.instrumentation.set_gauge("concurrency_in_flight", self.in_flight)
+        self.instrumentation.set_gauge("concurrency_queued", len(self._waiters))
+
+    def snapshot(self) -> dict[str, float | int | dict[str, dict[str, float]]]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "throttled": self.throttled,
+            "operations": {
+                operation: {
+                    "latency_s": gradient.latency_s,
+                    "baseline_s": gradient.baseline_s,
+                    "gradient": gradient.gradient,
+                }
+                for operation, gradient in self._gradients.items()
+            },
+        }
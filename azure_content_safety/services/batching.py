@@ -0,0 +1,99 @@
+import asyncio
+from typing import (
+    AsyncGenerator,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    TypeVar,
+)
+
+from azure_content_safety.models import BatchItem
+
+ItemT = TypeVar("ItemT")
+ResultT = TypeVar("ResultT")
+
+
+async def aiterate(
+    items: Iterable[ItemT] | AsyncIterable[ItemT],
+) -> AsyncIterator[ItemT]:
+    """Iterates a sync or async iterable asynchronously."""
+    if isinstance(items, AsyncIterable):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def bounded_map(
+    fn: Callable[[ItemT], Awaitable[ResultT]],
+    items: Iterable[ItemT] | AsyncIterable[ItemT],
+    max_concurrency: int,
+    ordered: bool = True,
+) -> AsyncGenerator[BatchItem[ResultT], None]:
+    """Applies fn to every item with at most max_concurrency calls in flight.
+
+    Items are pulled from the input only when a slot is free, so arbitrarily long
+    (async) iterables are consumed lazily. Errors raised by fn are returned as the
+    error of the item instead of aborting the batch. With ordered, results are
+    yielded in input order; a slot is only released once its result is yielded, so
+    at most max_concurrency results are buffered. Otherwise results are yielded as
+    they complete.
+    """
+    if max_concurrency < 1:
+        raise ValueError("max_concurrency must be at least 1")
+
+    slots = asyncio.Semaphore(max_concurrency)
+    done: asyncio.Queue[BatchItem[ResultT] | None] = asyncio.Queue()
+    tasks: set[asyncio.Task] = set()
+
+    async def run(index: int, item: ItemT) -> None:
+        try:
+            result = await fn(item)
+        except Exception as e:
+            done.put_nowait(BatchItem(index=index, error=e))
+        else:
+            done.put_nowait(BatchItem(index=index, result=result))
+
+    async def feed() -> int:
+        count = 0
+        try:
+            async for item in aiterate(items):
+                await slots.acquire()
+                task = asyncio.create_task(run(count, item))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                count += 1
+        finally:
+            done.put_nowait(None)
+        return count
+
+    feeder = asyncio.create_task(feed())
+    buffered: dict[int, BatchItem[ResultT]] = {}
+    total: int | None = None
+    yielded = 0
+    try:
+        while total is None or yielded < total:
+            entry = await done.get()
+            if entry is None:
+                total = await feeder
+                continue
+
+            if not ordered:
+                slots.release()
+                yielded += 1
+                yield entry
+                continue
+
+            buffered[entry.index] = entry
+            while yielded in buffered:
+                slots.release()
+                yielded += 1
+                yield buffered.pop(yielded - 1)
+    finally:
+        feeder.cancel()
+        for task in list(tasks):
+            task.cancel()
+        await asyncio.gather(feeder, *tasks, return_exceptions=True)
@@ -0,0 +1,172 @@
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Generic, Hashable, Iterable, Iterator, Mapping, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+
+
+class AhoCorasick(Generic[K]):
+    """Multi-pattern automaton finding every occurrence of a set of patterns in one
+    pass over a text, in time linear in the text plus the number of matches."""
+
+    def __init__(self, patterns: Mapping[K, str]):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[list[K]] = [[]]
+        for key, pattern in patterns.items():
+            if pattern:
+                self._add(key, pattern)
+        self._link()
+
+    def _add(self, key: K, pattern: str) -> None:
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append(key)
+
+    def _link(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                # outputs of the longest proper suffix are outputs of this state too
+                self._out[next_state] += self._out[self._fail[next_state]]
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def iter_matches(self, text: str) -> Iterator[tuple[int, K]]:
+        """Yields (end offset, key) for every occurrence of a pattern."""
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for key in out[state]:
+                yield i + 1, key
+
+
+@dataclass
+class _Blocklist:
+    items: dict[str, str] = field(default_factory=dict)
+    regex_items: set[str] = field(default_factory=set)
+    automaton: AhoCorasick[str] | None = None
+
+
+@dataclass
+class LocalBlocklists:
+    """Local mirror of text blocklists, matched case-insensitively as substrings.
+
+    Every blocklist compiles into its own automaton, rebuilt lazily on the first
+    scan after one of its items changed, so that a change only recompiles that
+    blocklist. Blocklists with regex items cannot be mirrored and are reported as
+    not covered. on_change callbacks receive the name of a changed blocklist.
+    """
+
+    on_change: list[Callable[[str], object]] = field(default_factory=list)
+    _blocklists: dict[str, _Blocklist] = field(default_factory=dict, init=False)
+
+    def names(self) -> list[str]:
+        return list(self._blocklists)
+
+    def items(self, blocklist_name: str) -> dict[str, str]:
+        blocklist = self._blocklists.get(blocklist_name)
+        return dict(blocklist.items) if blocklist else {}
+
+    def set_items(
+        self,
+        blocklist_name: str,
+        items: Mapping[str, str],
+        regex_item_ids: Iterable[str] = (),
+    ) -> None:
+        """Replaces the items (id -> text) of a blocklist."""
+        self._blocklists[blocklist_name] = _Blocklist(
+            items=dict(items), regex_items=set(regex_item_ids)
+        )
+        self._changed(blocklist_name)
+
+    def upsert_items(
+        self,
+        blocklist_name: str,
+        items: Mapping[str, str],
+        regex_item_ids: Iterable[str] = (),
+    ) -> None:
+        blocklist = self._blocklists.setdefault(blocklist_name, _Blocklist())
+        blocklist.items.update(items)
+        blocklist.regex_items.difference_update(items)
+        blocklist.regex_items.update(regex_item_ids)
+        blocklist.automaton = None
+        self._changed(blocklist_name)
+
+    def remove_items(self, blocklist_name: str, item_ids: Iterable[str]) -> None:
+        blocklist = self._blocklists.get(blocklist_name)
+        if blocklist is None:
+            return
+
+        for item_id in item_ids:
+            blocklist.items.pop(item_id, None)
+            blocklist.regex_items.discard(item_id)
+        blocklist.automaton = None
+        self._changed(blocklist_name)
+
+    def delete(self, blocklist_name: str) -> None:
+        if self._blocklists.pop(blocklist_name, None) is not None:
+            self._changed(blocklist_name)
+
+    def covers(self, blocklist_names: Iterable[str]) -> bool:
+        """True when every blocklist is mirrored and can be matched locally."""
+        for name in blocklist_names:
+            blocklist = self._blocklists.get(name)
+            if blocklist is None or blocklist.regex_items:
+                return False
+        return True
+
+    def match(self, text: str, blocklist_names: Iterable[str]) -> list[dict[str, str]]:
+        """Returns the items of the blocklists found in text, in the format of the
+        blocklistsMatch of text:analyze."""
+        folded = text.lower()
+        matches: list[dict[str, str]] = []
+        for name in blocklist_names:
+            blocklist = self._blocklists.get(name)
+            if blocklist is None:
+                continue
+
+            if blocklist.automaton is None:
+                blocklist.automaton = AhoCorasick(
+                    {
+                        item_id: item_text.lower()
+                        for item_id, item_text in blocklist.items.items()
+                        if item_id not in blocklist.regex_items
+                    }
+                )
+
+            seen: set[str] = set()
+            for _, item_id in blocklist.automaton.iter_matches(folded):
+                if item_id in seen:
+                    continue
+                seen.add(item_id)
+                matches.append(
+                    {
+                        "blocklistName": name,
+                        "blocklistItemId": item_id,
+                        "blocklistItemText": blocklist.items[item_id],
+                    }
+                )
+        return matches
+
+    def _changed(self, blocklist_name: str) -> None:
+        for callback in self.on_change:
+            callback(blocklist_name)
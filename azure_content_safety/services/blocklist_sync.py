@@ -0,0 +1,61 @@
+from itertools import islice
+from typing import Iterable, Iterator, TypeVar
+
+from azure_content_safety.models import TextBlocklistItem
+from azure_content_safety.protocols.i_content_safety import BlocklistItemInput
+
+T = TypeVar("T")
+
+BLOCKLIST_ITEMS_PER_REQUEST = 100
+"""Maximum number of items of one addOrUpdate or remove request."""
+
+BLOCKLIST_ITEM_TEXT_LIMIT = 128
+"""Maximum number of characters of the text of a blocklist item."""
+
+
+def batched(items: Iterable[T], size: int) -> Iterator[list[T]]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def to_blocklist_items(
+    items: Iterable[str | BlocklistItemInput],
+) -> list[BlocklistItemInput]:
+    """Normalizes items to BlocklistItemInput, keeping the last item of each text,
+    and rejects texts the service would reject before any request is sent."""
+    by_text: dict[str, BlocklistItemInput] = {}
+    for item in items:
+        if isinstance(item, str):
+            item = BlocklistItemInput(text=item)
+        if not 0 < len(item.text) <= BLOCKLIST_ITEM_TEXT_LIMIT:
+            raise ValueError(
+                f"blocklist item text must have 1 to {BLOCKLIST_ITEM_TEXT_LIMIT}"
+                f" characters: {item.text[:BLOCKLIST_ITEM_TEXT_LIMIT]!r}"
+            )
+        by_text.pop(item.text, None)
+        by_text[item.text] = item
+    return list(by_text.values())
+
+
+def diff_blocklist_items(
+    current: Iterable[TextBlocklistItem], desired: Iterable[BlocklistItemInput]
+) -> tuple[list[BlocklistItemInput], list[str]]:
+    """Returns the items to add or update and the ids of the items to remove so
+    that the current items of a blocklist become the desired ones. Items are
+    identified by text; duplicate and regex items of the server are removed."""
+    wanted = {item.text: item for item in desired}
+    kept: dict[str, TextBlocklistItem] = {}
+    removed: list[str] = []
+    for item in current:
+        if item.text not in wanted or item.text in kept or item.isRegex:
+            removed.append(item.blocklistItemId)
+        else:
+            kept[item.text] = item
+
+    upserts = [
+        item
+        for text, item in wanted.items()
+        if text not in kept or kept[text].description != item.description
+    ]
+    return upserts, removed
@@ -0,0 +1,157 @@
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, Literal
+
+from azure_content_safety.errors import CircuitOpenError, ContentSafetyHttpError
+from azure_content_safety.protocols.i_instrumentation import IInstrumentation
+from azure_content_safety.services.retry import is_service_failure
+
+CircuitState = Literal["closed", "open", "half_open"]
+
+STATE_VALUES: dict[CircuitState, int] = {"closed": 0, "half_open": 1, "open": 2}
+"""Values of the circuit_state gauge."""
+
+
+@dataclass
+class Circuit:
+    state: CircuitState = "closed"
+    failures: int = 0
+    """Consecutive failures."""
+    opened_at: float = 0.0
+    probes: int = 0
+    """Calls in flight while half open."""
+    calls: int = 0
+    failures_total: int = 0
+    rejected: int = 0
+    opened: int = 0
+
+
+@dataclass
+class CircuitBreaker:
+    """Circuit breaker per operation.
+
+    A closed circuit opens after failure_threshold consecutive failures (429, 5xx,
+    transport errors and timeouts; errors of the caller do not count). While open,
+    calls fail immediately with CircuitOpenError instead of waiting on a slow or
+    failing backend. After recovery_s the circuit is half open and lets up to
+    half_open_max_calls probes through: a successful probe closes it, a failed one
+    opens it again.
+
+    With instrumentation, the state of each circuit is published as the
+    circuit_state gauge (see STATE_VALUES), and its calls, failures, rejected calls
+    and openings as counters.
+    """
+
+    failure_threshold: int = 5
+    recovery_s: float = 30.0
+    half_open_max_calls: int = 1
+    fail_open: bool = False
+    """Verdict carried by CircuitOpenError. When set, the analysis methods of
+    ContentSafety return a non-blocking response instead of raising it, and
+    GuardrailPolicy lets the content through."""
+    clock: Callable[[], float] = time.monotonic
+    instrumentation: IInstrumentation | None = None
+    _circuits: dict[str, Circuit] = field(default_factory=dict, init=False)
+
+    def __post_init__(self) -> None:
+        if self.failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1")
+        if self.half_open_max_calls < 1:
+            raise ValueError("half_open_max_calls must be at least 1")
+
+    def circuit(self, operation: str) -> Circuit:
+        circuit = self._circuits.get(operation)
+        if circuit is None:
+            circuit = self._circuits[operation] = Circuit()
+        return circuit
+
+    def state(self, operation: str) -> CircuitState:
+        circuit = self.circuit(operation)
+        if (
+            circuit.state == "open"
+            and self.clock() - circuit.opened_at >= self.recovery_s
+        ):
+            self._set_state(operation, circuit, "half_open")
+            circuit.probes = 0
+        return circuit.state
+
+    def _set_state(self, operation: str, circuit: Circuit, state: CircuitState) -> None:
+        circuit.state = state
+        if self.instrumentation is not None:
+            self.instrumentation.set_gauge(
+                "circuit_state", STATE_VALUES[state], operation=operation
+            )
+
+    def _count(self, name: str, operation: str) -> None:
+        if self.instrumentation is not None:
+            self.instrumentation.increment(name, operation=operation)
+
+    def acquire(self, operation: str) -> None:
+        """Admits a call, raising CircuitOpenError when the circuit is open or all
+        the probes of the half open circuit are in flight."""
+        circuit = self.circuit(operation)
+        state = self.state(operation)
+        if state == "half_open" and circuit.probes < self.half_open_max_calls:
+            circuit.probes += 1
+        elif state != "closed":
+            circuit.rejected += 1
+            self._count("circuit_rejected_total", operation)
+            retry_in = max(0.0, circuit.opened_at + self.recovery_s - self.clock())
+            raise CircuitOpenError(operation, retry_in, self.fail_open)
+        circuit.calls += 1
+        self._count("circuit_calls_total", operation)
+
+    def record_success(self, operation: str) -> None:
+        circuit = self.circuit(operation)
+        circuit.failures = 0
+        if circuit.state == "half_open":
+            self._set_state(operation, circuit, "closed")
+
+    def record_failure(self, operation: str) -> None:
+        circuit = self.circuit(operation)
+        circuit.failures += 1
+        circuit.failures_total += 1
+        self._count("circuit_failures_total", operation)
+        if circuit.state == "half_open" or circuit.failures >= self.failure_threshold:
+            if circuit.state != "open":
+                circuit.opened += 1
+                self._count("circuit_opened_total", operation)
+            self._set_state(operation, circuit, "open")
+            circuit.opened_at = self.clock()
+
+    def release(self, operation: str) -> None:
+        """Ends a half open probe without an outcome, e.g. when it was cancelled."""
+        circuit = self.circuit(operation)
+        if circuit.state == "half_open":
+            circuit.probes = max(0, circuit.probes - 1)
+
+    @contextmanager
+    def call(self, operation: str) -> Iterator[None]:
+        self.acquire(operation)
+        try:
+            yield
+        except BaseException as e:
+            if is_service_failure(e):
+                self.record_failure(operation)
+            elif isinstance(e, ContentSafetyHttpError):
+                # the service answered, the caller was wrong
+                self.record_success(operation)
+            else:
+                self.release(operation)
+            raise
+        else:
+            self.record_success(operation)
+
+    def snapshot(self) -> dict[str, dict[str, int | float | str]]:
+        return {
+            operation: {
+                "state": self.state(operation),
+                "failures": circuit.failures,
+                "calls": circuit.calls,
+                "failures_total": circuit.failures_total,
+                "rejected": circuit.rejected,
+                "opened": circuit.opened,
+            }
+            for operation, circuit in self._circuits.items()
+        }
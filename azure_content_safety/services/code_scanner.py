@@ -0,0 +1,314 @@
+import asyncio
+import json
+import os
+import re
+from contextlib import aclosing
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Iterator, Sequence
+
+from azure_content_safety.models import (
+    CodeChunk,
+    CodeScanFinding,
+    CodeScanReport,
+    DetectProtectedMaterialCodeResponseItem,
+)
+from azure_content_safety.protocols.i_content_safety import IContentSafety
+from azure_content_safety.services.batching import bounded_map
+
+CODE_CHUNK_LINES = 80
+"""Maximum number of lines of a scanned chunk."""
+
+VENDORED_DIRS = frozenset(
+    {
+        ".git",
+        ".hg",
+        ".svn",
+        ".tox",
+        ".venv",
+        "__pycache__",
+        "build",
+        "dist",
+        "node_modules",
+        "site-packages",
+        "third_party",
+        "vendor",
+        "venv",
+    }
+)
+"""Names of directories that are not scanned."""
+
+BINARY_SNIFF_BYTES = 8192
+"""Files with a NUL byte in their first bytes are binary."""
+
+INDEX_VERSION = 1
+
+_HUNK_HEADER = re.compile(r"^@@ -\d+(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+def is_vendored(path: str) -> bool:
+    return any(part in VENDORED_DIRS for part in Path(path).parts[:-1])
+
+
+def read_text(data: bytes) -> str | None:
+    """Returns the content of a UTF-8 text file, or None for binary content."""
+    if b"\0" in data[:BINARY_SNIFF_BYTES]:
+        return None
+    try:
+        return data.decode()
+    except UnicodeDecodeError:
+        return None
+
+
+def iter_source_files(root: Path) -> Iterator[Path]:
+    """Walks root in sorted order, skipping vendored directories."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(name for name in dirnames if name not in VENDORED_DIRS)
+        for filename in sorted(filenames):
+            yield Path(dirpath, filename)
+
+
+def _is_boundary(lines: Sequence[str], index: int) -> bool:
+    """Whether a top-level definition starts at lines[index]: an unindented line
+    after a blank line, so that decorators and leading comments stay attached."""
+    line = lines[index]
+    return (
+        index > 0
+        and not lines[index - 1].strip()
+        and bool(line.strip())
+        and not line[0].isspace()
+        and line[0] not in ")]}"
+    )
+
+
+def chunk_lines(
+    path: str,
+    lines: Sequence[str],
+    first_line: int = 1,
+    max_lines: int = CODE_CHUNK_LINES,
+) -> Iterator[CodeChunk]:
+    """Splits lines (with line endings) into chunks of at most max_lines lines.
+
+    Where possible a chunk ends before a top-level definition in the second half of
+    its window, so that functions are scanned whole; otherwise it is cut at
+    max_lines. Blank chunks are skipped.
+    """
+    if max_lines < 1:
+        raise ValueError("max_lines must be at least 1")
+
+    start = 0
+    while start < len(lines):
+        end = min(start + max_lines, len(lines))
+        if end < len(lines):
+            for cut in range(end, start + max_lines // 2, -1):
+                if _is_boundary(lines, cut):
+                    end = cut
+                    break
+
+        text = "".join(lines[start:end])
+        if text.strip():
+            yield CodeChunk(
+                path=path,
+                start_line=first_line + start,
+                end_line=first_line + end - 1,
+                text=text,
+            )
+        start = end
+
+
+def parse_unified_diff(diff: str) -> dict[str, list[tuple[int, list[str]]]]:
+    """Returns the runs of added lines of a unified diff as (first line, lines) by
+    path of the new file. Deleted and binary files have no runs."""
+    added: dict[str, list[tuple[int, list[str]]]] = {}
+    path: str | None = None
+    old_left = new_left = line_no = 0
+    run: list[str] = []
+
+    def flush() -> None:
+        if run and path is not None:
+            added.setdefault(path, []).append((line_no - len(run), run.copy()))
+        run.clear()
+
+    for line in diff.splitlines(keepends=True):
+        if old_left > 0 or new_left > 0:
+            if line.startswith("+"):
+                run.append(line[1:])
+                new_left -= 1
+                line_no += 1
+                continue
+            flush()
+            if line.startswith("-"):
+                old_left -= 1
+            elif line.startswith(" ") or line in ("\n", "\r\n"):
+                old_left -= 1
+                new_left -= 1
+                line_no += 1
+            continue
+
+        flush()
+        if line.startswith("+++ "):
+            name = line[4:].rstrip("\r\n").split("\t")[0]
+            path = None if name == "/dev/null" else name.removeprefix("b/")
+        elif match := _HUNK_HEADER.match(line):
+            old_count, new_start, new_count = match.groups()
+            old_left = 1 if old_count is None else int(old_count)
+            new_left = 1 if new_count is None else int(new_count)
+            line_no = int(new_start)
+
+    flush()
+    return added
+
+
+@dataclass
+class CodeScanIndex:
+    """Results of scanned chunks by content hash, so that re-scans only send the
+    chunks that changed. The index is stored as a JSON file at path (replaced
+    atomically on save); without a path it lives as long as the object."""
+
+    path: Path | None = None
+    _entries: dict[str, dict] = field(default_factory=dict, init=False, repr=False)
+    _dirty: bool = field(default=False, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.path is not None and self.path.exists():
+            data = json.loads(self.path.read_text())
+            if data.get("version") == INDEX_VERSION:
+                self._entries = data["entries"]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, digest: str) -> DetectProtectedMaterialCodeResponseItem | None:
+        entry = self._entries.get(digest)
+        if entry is None:
+            return None
+        return DetectProtectedMaterialCodeResponseItem.model_validate(entry)
+
+    def set(self, digest: str, item: DetectProtectedMaterialCodeResponseItem) -> None:
+        self._entries[digest] = item.model_dump()
+        self._dirty = True
+
+    def save(self) -> None:
+        if self.path is None or not self._dirty:
+            return
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps({"version": INDEX_VERSION, "entries": self._entries}))
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+
+@dataclass
+class CodeScanner:
+    """Scans directory trees and unified diffs with
+    detect_protected_material_for_code.
+
+    Text files are split into chunks of whole functions where possible, binary
+    files and vendored directories are skipped, and chunks whose content was
+    already scanned are answered from the index. The remaining chunks are sent
+    concurrently, once per distinct content.
+
+        index = CodeScanIndex(Path(".code-scan-index.json"))
+        report = await container[CodeScanner].scan_directory(Path("src"), index)
+    """
+
+    content_safety: IContentSafety
+    max_lines: int = CODE_CHUNK_LINES
+    max_concurrency: int = 8
+
+    async def scan_directory(
+        self, root: Path, index: CodeScanIndex | None = None
+    ) -> CodeScanReport:
+        """Scans the text files under root; paths are reported relative to root.
+        The tree is walked and read in a worker thread."""
+        files, chunks = await asyncio.to_thread(self._chunk_directory, root)
+        return await self.scan_chunks(chunks, files, index)
+
+    def _chunk_directory(self, root: Path) -> tuple[int, list[CodeChunk]]:
+        files = 0
+        chunks: list[CodeChunk] = []
+        for file in iter_source_files(root):
+            text = read_text(file.read_bytes())
+            if text is None:
+                continue
+            files += 1
+            path = file.relative_to(root).as_posix()
+            chunks.extend(
+                chunk_lines(path, text.splitlines(keepends=True), 1, self.max_lines)
+            )
+        return files, chunks
+
+    async def scan_diff(
+        self, diff: str, index: CodeScanIndex | None = None
+    ) -> CodeScanReport:
+        """Scans the lines added by a unified diff (e.g. git diff output)."""
+        files = 0
+        chunks: list[CodeChunk] = []
+        for path, runs in parse_unified_diff(diff).items():
+            if is_vendored(path):
+                continue
+            files += 1
+            for first_line, lines in runs:
+                chunks.extend(chunk_lines(path, lines, first_line, self.max_lines))
+        return await self.scan_chunks(chunks, files, index)
+
+    async def scan_chunks(
+        self,
+        chunks: Iterable[CodeChunk],
+        files: int = 0,
+        index: CodeScanIndex | None = None,
+    ) -> CodeScanReport:
+        index = index if index is not None else CodeScanIndex()
+        chunks = list(chunks)
+        pending: dict[str, str] = {}
+        cached = 0
+        for chunk in chunks:
+            if index.get(chunk.digest) is not None:
+                cached += 1
+            else:
+                pending.setdefault(chunk.digest, chunk.text)
+
+        failed: dict[str, Exception] = {}
+
+        async def scan(digest: str) -> None:
+            response = await self.content_safety.detect_protected_material_for_code(
+                pending[digest]
+            )
+            index.set(digest, response.protectedMaterialAnalysis)
+
+        digests = list(pending)
+        try:
+            async with aclosing(
+                bounded_map(scan, digests, self.max_concurrency)
+            ) as items:
+                async for item in items:
+                    if item.error is not None:
+                        failed[digests[item.index]] = item.error
+        finally:
+            # no scan is left to update the index while it is written
+            await asyncio.to_thread(index.save)
+
+        findings: list[CodeScanFinding] = []
+        errors: dict[str, Exception] = {}
+        for chunk in chunks:
+            location = f"{chunk.path}:{chunk.start_line}-{chunk.end_line}"
+            if chunk.digest in failed:
+                errors[location] = failed[chunk.digest]
+                continue
+            result = index.get(chunk.digest)
+            if result is not None and result.detected:
+                findings.append(
+                    CodeScanFinding(
+                        path=chunk.path,
+                        start_line=chunk.start_line,
+                        end_line=chunk.end_line,
+                        codeCitations=result.codeCitations,
+                    )
+                )
+
+        return CodeScanReport(
+            findings=findings,
+            files=files,
+            chunks=len(chunks),
+            cached=cached,
+            errors=errors,
+        )
@@ -0,0 +1,64 @@
+import functools
+import sys
+from typing import NotRequired, TypedDict
+
+from pydantic import TypeAdapter
+
+from azure_content_safety.models import (
+    CompactModeration,
+    ImageModerationResponse,
+    TextModerationResponse,
+)
+
+
+class _AnalysisItem(TypedDict):
+    category: str
+    severity: int
+
+
+class _BlocklistMatch(TypedDict):
+    blocklistName: str
+    blocklistItemId: str
+
+
+class _ModerationBody(TypedDict):
+    blocklistsMatch: NotRequired[list[_BlocklistMatch]]
+    categoriesAnalysis: list[_AnalysisItem]
+
+
+@functools.cache
+def _moderation_body() -> TypeAdapter[_ModerationBody]:
+    return TypeAdapter(_ModerationBody)
+
+
+def decode_compact_moderation(content: bytes) -> CompactModeration:
+    """Validates the raw body of text:analyze or image:analyze into a
+    CompactModeration. Category and blocklist names are interned, so that many
+    results share one string per name."""
+    body = _moderation_body().validate_json(content)
+    return CompactModeration(
+        categories=tuple(
+            (sys.intern(item["category"]), item["severity"])
+            for item in body["categoriesAnalysis"]
+        ),
+        blocklist_matches=tuple(
+            (sys.intern(match["blocklistName"]), match["blocklistItemId"])
+            for match in body.get("blocklistsMatch", [])
+        ),
+    )
+
+
+def compact_moderation(
+    response: TextModerationResponse | ImageModerationResponse,
+) -> CompactModeration:
+    matches = getattr(response, "blocklistsMatch", [])
+    return CompactModeration(
+        categories=tuple(
+            (sys.intern(item.category), item.severity)
+            for item in response.categoriesAnalysis
+        ),
+        blocklist_matches=tuple(
+            (sys.intern(match["blocklistName"]), match["blocklistItemId"])
+            for match in matches
+        ),
+    )
@@ -1,62 +1,937 @@
+import asyncio
+import json
 import logging
-from dataclasses import dataclass
-from typing import Any, Literal
+import time
+from contextlib import contextmanager, nullcontext, suppress
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncGenerator,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterable,
+    Iterator,
+    Literal,
+    Mapping,
+    TypeVar,
+    overload,
+)
+from urllib.parse import quote, urljoin
 
-import aiohttp
 from lagom.environment import Env
+from pydantic import BaseModel
 
+from azure_content_safety.errors import CircuitOpenError, ContentSafetyHttpError
 from azure_content_safety.models import (
+    AddOrUpdateBlocklistItemsResponse,
+    BatchItem,
+    BlocklistSyncResult,
+    CompactModeration,
     DetectGroundednessResponse,
     DetectProtectedMaterialCodeResponse,
     DetectProtectedMaterialResponse,
+    GuardrailVerdict,
     ImageModerationResponse,
+    Page,
     PromptShieldResponse,
+    StreamVerdict,
+    TextBlocklist,
+    TextBlocklistItem,
     TextModerationResponse,
 )
-from azure_content_safety.protocols.i_content_safety import IContentSafety, QnAQuery
+from azure_content_safety.protocols.i_content_safety import (
+    BlocklistItemInput,
+    GuardrailCheck,
+    IContentSafety,
+    ImageSource,
+    QnAQuery,
+)
+from azure_content_safety.protocols.i_instrumentation import (
+    IInstrumentation,
+    RequestTimings,
+)
+from azure_content_safety.protocols.i_response_cache import IResponseCache
+from azure_content_safety.services.adaptive_concurrency import (
+    AdaptiveConcurrencyLimiter,
+)
+from azure_content_safety.services.batching import bounded_map
+from azure_content_safety.services.blocklist_matcher import LocalBlocklists
+from azure_content_safety.services.blocklist_sync import (
+    BLOCKLIST_ITEMS_PER_REQUEST,
+    batched,
+    diff_blocklist_items,
+    to_blocklist_items,
+)
+from azure_content_safety.services.circuit_breaker import CircuitBreaker
+from azure_content_safety.services.compact_results import (
+    compact_moderation,
+    decode_compact_moderation,
+)
+from azure_content_safety.services.disk_cache import DiskResponseCache
+from azure_content_safety.services.endpoint_pool import (
+    Endpoint,
+    EndpointPool,
+    Routing,
+    parse_endpoints,
+)
+from azure_content_safety.services.grounding_shards import (
+    GROUNDEDNESS_TEXT_LIMIT,
+    GROUNDING_SOURCES_LIMIT,
+    merge_groundedness,
+    shard_sources,
+)
+from azure_content_safety.services.guardrails import GuardrailPolicy, run_guardrails
+from azure_content_safety.services.hedging import Hedging
+from azure_content_safety.services.image_payload import ImagePayload
+from azure_content_safety.services.image_preprocessing import (
+    ImagePreprocessor,
+    PreparedImage,
+)
+from azure_content_safety.services.instrumentation import (
+    Instrumentation,
+    instrumented,
+    trace_config,
+)
+from azure_content_safety.services.rate_limiter import TokenBucket
+from azure_content_safety.services.response_cache import (
+    ResponseCache,
+    blocklist_tag,
+    make_cache_key,
+)
+from azure_content_safety.services.retry import RetryPolicy, is_transport_error
+from azure_content_safety.services.single_flight import SingleFlight
+from azure_content_safety.services.stream_moderation import moderate_stream
+from azure_content_safety.services.text_chunking import (
+    TEXT_MODERATION_CHARACTER_LIMIT,
+    merge_text_moderation,
+    split_text,
+)
+
+if TYPE_CHECKING:
+    import aiohttp
+
+M = TypeVar("M", bound=BaseModel)
+ItemT = TypeVar("ItemT")
+ResultT = TypeVar("ResultT")
+
+HEDGED_OPERATIONS = frozenset(
+    {
+        "prompt_shield",
+        "detect_groundedness",
+        "detect_protected_materials",
+        "detect_protected_material_for_code",
+        "text_moderation",
+        "image_moderation",
+    }
+)
+"""Analysis calls, which are idempotent; blocklist management is never hedged."""
+
+FAIL_OPEN_RESPONSES: dict[str, bytes] = {
+    "prompt_shield": (
+        b'{"userPromptAnalysis":{"attackDetected":false},"documentsAnalysis":[]}'
+    ),
+    "detect_groundedness": (
+        b'{"ungroundedDetected":false,"ungroundedPercentage":0,"ungroundedDetails":[]}'
+    ),
+    "detect_protected_materials": b'{"protectedMaterialAnalysis":{"detected":false}}',
+    "detect_protected_material_for_code": (
+        b'{"protectedMaterialAnalysis":{"detected":false,"codeCitations":[]}}'
+    ),
+    "text_moderation": b'{"blocklistsMatch":[],"categoriesAnalysis":[]}',
+    "image_moderation": b'{"categoriesAnalysis":[]}',
+}
+"""Non-blocking bodies returned by the analysis calls while their circuit is open
+and the breaker fails open. They are never cached."""
 
 
 class ContentSafetyEnv(Env):
     azure_content_safety_endpoint: str
     azure_content_safety_key: str
     azure_content_safety_api_version: str
+    azure_content_safety_pool_limit: int = 100
+    azure_content_safety_pool_limit_per_host: int = 32
+    azure_content_safety_keepalive_timeout: float = 30.0
+    azure_content_safety_dns_cache_ttl: int = 300
+    azure_content_safety_cache_max_entries: int = 0
+    azure_content_safety_cache_ttl: float = 300.0
+    azure_content_safety_disk_cache_path: str = ""
+    azure_content_safety_disk_cache_max_entries: int = 100_000
+    azure_content_safety_max_concurrency: int = 8
+    azure_content_safety_max_long_text_length: int = 1_000_000
+    azure_content_safety_rate_limit_tps: float = 0.0
+    azure_content_safety_rate_limit_burst: float = 0.0
+    azure_content_safety_max_retries: int = 3
+    azure_content_safety_retry_backoff_base: float = 0.5
+    azure_content_safety_retry_backoff_max: float = 30.0
+    azure_content_safety_retry_budget_ratio: float = 0.2
+    azure_content_safety_instrumentation: bool = False
+    azure_content_safety_coalesce_requests: bool = True
+    azure_content_safety_endpoints: str = ""
+    azure_content_safety_routing: Routing = "least_outstanding"
+    azure_content_safety_eject_after_failures: int = 3
+    azure_content_safety_eject_s: float = 30.0
+    azure_content_safety_eject_latency_s: float = 0.0
+    azure_content_safety_request_timeout_s: float = 0.0
+    azure_content_safety_circuit_failures: int = 0
+    azure_content_safety_circuit_recovery_s: float = 30.0
+    azure_content_safety_circuit_fail_open: bool = False
+    azure_content_safety_hedge_percentile: float = 0.0
+    azure_content_safety_hedge_max_ratio: float = 0.1
+    azure_content_safety_adaptive_concurrency: bool = False
+    azure_content_safety_adaptive_min_concurrency: int = 1
+    azure_content_safety_adaptive_max_concurrency: int = 256
+    azure_content_safety_adaptive_latency_tolerance: float = 2.0
 
 
 @dataclass
 class ContentSafety(IContentSafety):
     logger: logging.Logger
     env: ContentSafetyEnv
+    cache: IResponseCache | None = None
+    instrumentation: IInstrumentation | None = None
+    rate_limiter: TokenBucket | None = field(default=None, init=False)
+    retry_policy: RetryPolicy = field(init=False)
+    single_flight: SingleFlight | None = field(default=None, init=False)
+    endpoint_pool: EndpointPool | None = field(default=None, init=False)
+    circuit_breaker: CircuitBreaker | None = field(default=None, init=False)
+    hedging: Hedging | None = field(default=None, init=False)
+    concurrency_limiter: AdaptiveConcurrencyLimiter | None = field(
+        default=None, init=False
+    )
+    local_blocklists: LocalBlocklists = field(init=False)
+    _session: "aiohttp.ClientSession | None" = field(
+        default=None, init=False, repr=False
+    )
+    _loop: asyncio.AbstractEventLoop | None = field(
+        default=None, init=False, repr=False
+    )
+    _updating_mirror: bool = field(default=False, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        max_entries = self.env.azure_content_safety_cache_max_entries
+        if self.cache is None and self.env.azure_content_safety_disk_cache_path:
+            self.cache = DiskResponseCache(
+                Path(self.env.azure_content_safety_disk_cache_path),
+                max_entries=self.env.azure_content_safety_disk_cache_max_entries,
+                ttl=self.env.azure_content_safety_cache_ttl,
+                namespace=self.env.azure_content_safety_api_version,
+                logger=self.logger,
+            )
+        elif self.cache is None and max_entries > 0:
+            self.cache = ResponseCache(
+                max_entries=max_entries, ttl=self.env.azure_content_safety_cache_ttl
+            )
+
+        if (
+            self.instrumentation is None
+            and self.env.azure_content_safety_instrumentation
+        ):
+            self.instrumentation = Instrumentation()
+
+        tps = self.env.azure_content_safety_rate_limit_tps
+        if tps > 0:
+            burst = self.env.azure_content_safety_rate_limit_burst or tps
+            self.rate_limiter = TokenBucket(rate=tps, capacity=max(1.0, burst))
+
+        self.retry_policy = RetryPolicy(
+            max_retries=self.env.azure_content_safety_max_retries,
+            backoff_base=self.env.azure_content_safety_retry_backoff_base,
+            backoff_max=self.env.azure_content_safety_retry_backoff_max,
+            budget_ratio=self.env.azure_content_safety_retry_budget_ratio,
+        )
+
+        if self.env.azure_content_safety_coalesce_requests:
+            self.single_flight = SingleFlight()
+
+        if self.env.azure_content_safety_circuit_failures > 0:
+            self.circuit_breaker = CircuitBreaker(
+                failure_threshold=self.env.azure_content_safety_circuit_failures,
+                recovery_s=self.env.azure_content_safety_circuit_recovery_s,
+                fail_open=self.env.azure_content_safety_circuit_fail_open,
+                instrumentation=self.instrumentation,
+            )
+
+        if self.env.azure_content_safety_hedge_percentile > 0:
+            self.hedging = Hedging(
+                percentile=self.env.azure_content_safety_hedge_percentile,
+                max_ratio=self.env.azure_content_safety_hedge_max_ratio,
+                instrumentation=self.instrumentation,
+            )
+
+        if self.env.azure_content_safety_adaptive_concurrency:
+            self.concurrency_limiter = AdaptiveConcurrencyLimiter(
+                initial_limit=self.env.azure_content_safety_max_concurrency,
+                min_limit=self.env.azure_content_safety_adaptive_min_concurrency,
+                max_limit=self.env.azure_content_safety_adaptive_max_concurrency,
+                tolerance=self.env.azure_content_safety_adaptive_latency_tolerance,
+                instrumentation=self.instrumentation,
+            )
+
+        if self.env.azure_content_safety_endpoints:
+            self.endpoint_pool = EndpointPool.from_configs(
+                parse_endpoints(self.env.azure_content_safety_endpoints),
+                base_url=self.env.azure_content_safety_endpoint,
+                routing=self.env.azure_content_safety_routing,
+                failure_threshold=self.env.azure_content_safety_eject_after_failures,
+                eject_s=self.env.azure_content_safety_eject_s,
+                latency_threshold_s=self.env.azure_content_safety_eject_latency_s,
+            )
+
+        self.local_blocklists = LocalBlocklists(on_change=[self._mirror_changed])
+
+    async def start(self) -> None:
+        """Opens the pooled session on the running event loop. A session opened on
+        another loop, e.g. by a previous asyncio.run, is closed and replaced."""
+        loop = asyncio.get_running_loop()
+        if self._session is not None and not self._session.closed:
+            if self._loop is loop:
+                return
+            await self._close_stale_session()
+
+        self.logger.debug("execute: start")
+        # imported on first use, it is the bulk of the import time of this module
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(
+            limit=self.env.azure_content_safety_pool_limit,
+            limit_per_host=self.env.azure_content_safety_pool_limit_per_host,
+            keepalive_timeout=self.env.azure_content_safety_keepalive_timeout,
+            ttl_dns_cache=self.env.azure_content_safety_dns_cache_ttl,
+        )
+        trace_configs = [] if self.instrumentation is None else [trace_config()]
+        self._session = aiohttp.ClientSession(
+            connector=connector, trace_configs=trace_configs
+        )
+        self._loop = loop
+
+    async def _close_stale_session(self) -> None:
+        self.logger.debug("execute: close session of another event loop")
+        session, self._session = self._session, None
+        loop, self._loop = self._loop, None
+        if session is None:
+            return
+        if loop is not None and loop.is_running() and not loop.is_closed():
+            # still in use by another thread, close it there
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+            return
+        # the connections died with their loop, release what is left
+        with suppress(RuntimeError):
+            await session.close()
+
+    async def close(self) -> None:
+        if self._session is None:
+            return
+
+        if self._loop is not asyncio.get_running_loop():
+            await self._close_stale_session()
+            return
+
+        self.logger.debug("execute: close")
+        session, self._session = self._session, None
+        self._loop = None
+        await session.close()
+
+    async def __aenter__(self) -> "ContentSafety":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.close()
+
+    async def get_session(self) -> "aiohttp.ClientSession":
+        await self.start()
+        assert self._session is not None
+        return self._session
 
     def get_service_url(self, service: str) -> str:
+        """Builds the URL of a service on azure_content_safety_endpoint; with an
+        endpoint pool, _send rebases it on the endpoint that the request is routed
+        to."""
         endpoint = self.env.azure_content_safety_endpoint
         version = self.env.azure_content_safety_api_version
         return f"{endpoint}/contentsafety/{service}?api-version={version}"
 
-    async def http_post(self, fn_name: str, url: str, json: dict) -> dict:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                url,
-                headers={
-                    "Ocp-Apim-Subscription-Key": self.env.azure_content_safety_key,
-                    "Content-Type": "application/json",
-                },
-                json=json,
-            ) as response:
-                result = await response.json()
-                if response.status != 200:
-                    raise ValueError(f"Failed to {fn_name}: {result}")
+    async def http_post(
+        self, fn_name: str, url: str, json: dict, pinned: bool = False
+    ) -> bytes:
+        return await self.http_send(fn_name, url, _dumps(json), pinned=pinned)
+
+    async def http_request(
+        self,
+        fn_name: str,
+        method: Literal["GET", "POST", "PATCH", "DELETE"],
+        url: str,
+        json: dict | None = None,
+        content_type: str = "application/json",
+    ) -> bytes:
+        body = None if json is None else _dumps(json)
+        return await self.http_send(fn_name, url, body, method, content_type)
+
+    async def http_send(
+        self,
+        fn_name: str,
+        url: str,
+        body: bytes | ImagePayload | None,
+        method: Literal["GET", "POST", "PATCH", "DELETE"] = "POST",
+        content_type: str = "application/json",
+        pinned: bool = False,
+    ) -> bytes:
+        """Sends the request with retries and failover; a pinned request always
+        goes to the first endpoint of the pool. While the circuit of an analysis
+        call is open and the breaker fails open, its FAIL_OPEN_RESPONSES body is
+        returned instead of raising CircuitOpenError."""
+        if self.circuit_breaker is None:
+            return await self._send_with_retries(
+                fn_name, url, body, method, content_type, pinned
+            )
+        try:
+            with self.circuit_breaker.call(fn_name):
+                return await self._send_with_retries(
+                    fn_name, url, body, method, content_type, pinned
+                )
+        except CircuitOpenError as e:
+            if not e.fail_open or fn_name not in FAIL_OPEN_RESPONSES:
+                raise
+            self.logger.warning(f"{e}, failing open")
+            return FAIL_OPEN_RESPONSES[fn_name]
+
+    async def _send_with_retries(
+        self,
+        fn_name: str,
+        url: str,
+        body: bytes | ImagePayload | None,
+        method: Literal["GET", "POST", "PATCH", "DELETE"],
+        content_type: str,
+        pinned: bool = False,
+    ) -> bytes:
+        self.retry_policy.record_request(fn_name)
+        replayable = not isinstance(body, ImagePayload) or body.replayable
+        hedged = (
+            self.hedging is not None
+            and fn_name in HEDGED_OPERATIONS
+            and (not isinstance(body, ImagePayload) or body.shareable)
+        )
+        pool = self.endpoint_pool
+        tried: set[str] = set()
+        attempt = 0
+        delay = 0.0
+        while True:
+            timings = None
+            if self.instrumentation is not None:
+                timings = RequestTimings(
+                    fn_name, attempt, request_bytes=_content_length(body)
+                )
+
+            endpoint = None if pool is None else pool.pick(url, tried, pinned)
+            failover = False
+            try:
+                if not hedged:
+                    return await self._attempt(
+                        fn_name, method, url, body, content_type, timings, endpoint
+                    )
+                return await self._hedged_attempt(
+                    fn_name, method, url, body, content_type, timings, endpoint, pinned
+                )
+            except ContentSafetyHttpError as e:
+                retryable = replayable and self.retry_policy.is_retryable(e.status)
+                if retryable and self._can_fail_over(url, endpoint, tried, pinned):
+                    failover = True
+                elif not retryable or not self.retry_policy.try_acquire_retry(
+                    fn_name, attempt
+                ):
+                    raise
+                else:
+                    tried.clear()
+                    delay = self.retry_policy.backoff(attempt, e.retry_after)
+            except Exception as e:
+                if timings is not None:
+                    timings.error = type(e).__name__
+                if not (
+                    replayable
+                    and is_transport_error(e)
+                    and self._can_fail_over(url, endpoint, tried, pinned)
+                ):
+                    raise
+                failover = True
+            finally:
+                if self.instrumentation is not None and timings is not None:
+                    self.instrumentation.record_request(timings)
+
+            if failover:
+                self.logger.debug(f"failover: {fn_name}")
+                continue
+            attempt += 1
+            self.logger.debug(f"retry: {fn_name} attempt {attempt} in {delay:.3f}s")
+            await asyncio.sleep(delay)
+
+    async def _hedged_attempt(
+        self,
+        fn_name: str,
+        method: str,
+        url: str,
+        body: bytes | ImagePayload | None,
+        content_type: str,
+        timings: RequestTimings | None,
+        endpoint: Endpoint | None,
+        pinned: bool = False,
+    ) -> bytes:
+        assert self.hedging is not None
+
+        async def send(hedge: bool) -> bytes:
+            if not hedge:
+                return await self._attempt(
+                    fn_name, method, url, body, content_type, timings, endpoint
+                )
+            # the duplicate goes to another endpoint of the pool when possible
+            other = endpoint
+            if self.endpoint_pool is not None and endpoint is not None:
+                other = self.endpoint_pool.pick(url, {endpoint.name}, pinned)
+            return await self._attempt(
+                fn_name, method, url, body, content_type, None, other
+            )
+
+        return await self.hedging.run(fn_name, send)
+
+    async def _attempt(
+        self,
+        fn_name: str,
+        method: str,
+        url: str,
+        body: bytes | ImagePayload | None,
+        content_type: str,
+        timings: RequestTimings | None,
+        endpoint: Endpoint | None,
+    ) -> bytes:
+        """One HTTP attempt: waits for the rate limiters and a slot of the adaptive
+        concurrency limit, then sends the request to the endpoint within
+        azure_content_safety_request_timeout_s."""
+        waited = 0.0
+        if self.rate_limiter is not None:
+            waited += await self.rate_limiter.acquire()
+        if endpoint is not None and endpoint.rate_limiter is not None:
+            waited += await endpoint.rate_limiter.acquire()
+        limiter = self.concurrency_limiter
+        if limiter is not None:
+            waited += await limiter.acquire()
+        if timings is not None:
+            timings.queue_wait_s = waited
+
+        timeout = self.env.azure_content_safety_request_timeout_s or None
+        slot = nullcontext() if limiter is None else limiter.request(fn_name)
+        with slot:
+            async with asyncio.timeout(timeout):
+                if self.endpoint_pool is None or endpoint is None:
+                    return await self._send(
+                        fn_name, method, url, body, content_type, timings
+                    )
+                with self.endpoint_pool.request(endpoint):
+                    return await self._send(
+                        fn_name,
+                        method,
+                        self.endpoint_pool.url_for(endpoint, url),
+                        body,
+                        content_type,
+                        timings,
+                        endpoint.key,
+                    )
+
+    def _can_fail_over(
+        self, url: str, endpoint: Endpoint | None, tried: set[str], pinned: bool
+    ) -> bool:
+        """Marks endpoint as tried by the request and returns whether another healthy
+        endpoint of the pool can take it, without waiting or spending retry budget.
+        """
+        if self.endpoint_pool is None or endpoint is None:
+            return False
+        tried.add(endpoint.name)
+        return self.endpoint_pool.can_fail_over(url, tried, pinned)
+
+    async def _send(
+        self,
+        fn_name: str,
+        method: str,
+        url: str,
+        body: bytes | ImagePayload | None,
+        content_type: str,
+        timings: RequestTimings | None,
+        key: str | None = None,
+    ) -> bytes:
+        """Returns the raw response body, which validate decodes straight into its
+        model without an intermediate dict."""
+        key = key or self.env.azure_content_safety_key
+        headers = {"Ocp-Apim-Subscription-Key": key}
+        data: bytes | AsyncIterator[bytes] | None = None
+        if isinstance(body, bytes):
+            data = body
+            headers["Content-Type"] = content_type
+        elif body is not None:
+            data = body.stream()
+            headers["Content-Type"] = content_type
+            if body.content_length is not None:
+                headers["Content-Length"] = str(body.content_length)
+
+        session = await self.get_session()
+        request = getattr(session, method.lower())
+        async with request(
+            url, headers=headers, data=data, trace_request_ctx=timings
+        ) as response:
+            if timings is None:
+                content = await response.read()
+            else:
+                timings.status = response.status
+                started = time.perf_counter()
+                content = await response.read()
+                timings.body_read_s = time.perf_counter() - started
+                timings.response_bytes = len(content)
+
+            if not 200 <= response.status < 300:
+                try:
+                    result = json.loads(content)
+                except ValueError:
+                    result = content.decode("utf-8", errors="replace")
+                raise ContentSafetyHttpError(
+                    fn_name,
+                    response.status,
+                    result,
+                    response.headers.get("Retry-After"),
+                )
+
+            return content
+
+    def validate(self, fn_name: str, model: type[M], content: bytes) -> M:
+        if self.instrumentation is None:
+            return model.model_validate_json(content)
+
+        started = time.perf_counter()
+        response = model.model_validate_json(content)
+        self.instrumentation.record_validation(fn_name, time.perf_counter() - started)
+        return response
+
+    async def shared_post(
+        self,
+        fn_name: str,
+        url: str,
+        json: dict,
+        tags: Iterable[str] = (),
+        pinned: bool = False,
+    ) -> bytes:
+        return await self._shared(
+            fn_name,
+            lambda: make_cache_key(fn_name, json),
+            lambda: self.http_post(fn_name=fn_name, url=url, json=json, pinned=pinned),
+            tags,
+        )
+
+    async def _shared(
+        self,
+        fn_name: str,
+        make_key: Callable[[], str],
+        post: Callable[[], Awaitable[bytes]],
+        tags: Iterable[str] = (),
+    ) -> bytes:
+        if self.cache is None and self.single_flight is None:
+            return await post()
+
+        key = make_key()
+        cache = self.cache
+        # the disk cache does blocking I/O, it must not stall the event loop
+        blocking = isinstance(cache, DiskResponseCache)
+        if cache is not None:
+            if blocking:
+                cached = await asyncio.to_thread(cache.get, key)
+            else:
+                cached = cache.get(key)
+            if cached is not None:
+                self.logger.debug(f"cache hit: {fn_name}")
+                return cached
+
+        async def post_and_store() -> bytes:
+            result = await post()
+            if result is FAIL_OPEN_RESPONSES.get(fn_name):
+                # the verdict of an open circuit, not of the service
                 return result
+            if cache is not None and blocking:
+                await asyncio.to_thread(cache.set, key, result, tags)
+            elif cache is not None:
+                cache.set(key, result, tags)
+            return result
+
+        if self.single_flight is None:
+            return await post_and_store()
+        return await self.single_flight.do(key, post_and_store)
+
+    @instrumented("guardrails")
+    async def guardrails(
+        self,
+        text: str,
+        documents: list[str] | None = None,
+        checks: Iterable[GuardrailCheck] = (
+            "prompt_shield",
+            "text_moderation",
+            "detect_protected_materials",
+        ),
+        blocklist_names: list[str] | None = None,
+        policy: Callable[[str, Any], bool] | None = None,
+        extra_checks: Mapping[str, Callable[[], Awaitable[Any]]] | None = None,
+    ) -> GuardrailVerdict:
+        self.logger.debug("execute: guardrails")
+        available: dict[str, Callable[[], Awaitable[Any]]] = {
+            "prompt_shield": lambda: self.prompt_shield(text, documents or []),
+            "text_moderation": lambda: self.text_moderation(
+                text, blocklist_names=blocklist_names
+            ),
+            "detect_protected_materials": lambda: self.detect_protected_materials(text),
+        }
+        selected = {name: available[name] for name in checks}
+        selected.update(extra_checks or {})
+        return await run_guardrails(selected, policy or GuardrailPolicy())
+
+    def invalidate_blocklist(self, blocklist_name: str) -> int:
+        if self.cache is None:
+            return 0
+
+        self.logger.debug(f"execute: invalidate_blocklist {blocklist_name}")
+        return self.cache.invalidate(blocklist_tag(blocklist_name))
+
+    async def _invalidate_blocklist(self, blocklist_name: str) -> int:
+        # the disk cache does blocking I/O, it must not stall the event loop
+        if isinstance(self.cache, DiskResponseCache):
+            return await asyncio.to_thread(self.invalidate_blocklist, blocklist_name)
+        return self.invalidate_blocklist(blocklist_name)
+
+    def _mirror_changed(self, blocklist_name: str) -> None:
+        # changes made by the blocklist methods are invalidated by their caller
+        if not self._updating_mirror:
+            self.invalidate_blocklist(blocklist_name)
+
+    @contextmanager
+    def _update_mirror(self) -> Iterator[LocalBlocklists]:
+        """Yields local_blocklists for an update whose invalidation the caller
+        awaits through _invalidate_blocklist, off the event loop."""
+        self._updating_mirror = True
+        try:
+            yield self.local_blocklists
+        finally:
+            self._updating_mirror = False
+
+    def get_blocklist_url(self, blocklist_name: str, action: str = "") -> str:
+        return self.get_service_url(
+            f"text/blocklists/{quote(blocklist_name, safe='')}{action}"
+        )
+
+    async def get_pages(self, fn_name: str, url: str, model: type[M]) -> list[M]:
+        values: list[M] = []
+        next_url: str | None = url
+        while next_url is not None:
+            content = await self.http_request(fn_name, "GET", next_url)
+            page = self.validate(fn_name, Page[model], content)  # type: ignore[valid-type]
+            values.extend(page.value)
+            next_url = urljoin(next_url, page.nextLink) if page.nextLink else None
+        return values
+
+    async def gather_batches(
+        self,
+        fn: Callable[[ItemT], Awaitable[ResultT]],
+        batches: Iterable[ItemT],
+        max_concurrency: int | None,
+    ) -> list[ResultT]:
+        """Runs fn over batches with bounded concurrency, raising the first error."""
+        items = bounded_map(
+            fn,
+            batches,
+            max_concurrency or self.env.azure_content_safety_max_concurrency,
+        )
+        results: list[ResultT] = []
+        async for item in items:
+            if item.error is not None:
+                await items.aclose()
+                raise item.error
+            results.append(item.result)  # type: ignore[arg-type]
+        return results
+
+    async def _blocklist_changed(
+        self,
+        blocklist_name: str,
+        upserted: Iterable[TextBlocklistItem] = (),
+        removed: Iterable[str] = (),
+    ) -> None:
+        if blocklist_name in self.local_blocklists.names():
+            upserted = list(upserted)
+            with self._update_mirror() as mirror:
+                mirror.remove_items(blocklist_name, removed)
+                mirror.upsert_items(
+                    blocklist_name,
+                    {item.blocklistItemId: item.text for item in upserted},
+                    [item.blocklistItemId for item in upserted if item.isRegex],
+                )
+        await self._invalidate_blocklist(blocklist_name)
+
+    @instrumented("create_or_update_blocklist")
+    async def create_or_update_blocklist(
+        self, blocklist_name: str, description: str = ""
+    ) -> TextBlocklist:
+        self.logger.debug("execute: create_or_update_blocklist")
+        result = await self.http_request(
+            "create_or_update_blocklist",
+            "PATCH",
+            self.get_blocklist_url(blocklist_name),
+            {"description": description},
+            content_type="application/merge-patch+json",
+        )
+        return self.validate("create_or_update_blocklist", TextBlocklist, result)
+
+    @instrumented("list_blocklists")
+    async def list_blocklists(self) -> list[TextBlocklist]:
+        self.logger.debug("execute: list_blocklists")
+        return await self.get_pages(
+            "list_blocklists", self.get_service_url("text/blocklists"), TextBlocklist
+        )
+
+    @instrumented("delete_blocklist")
+    async def delete_blocklist(self, blocklist_name: str) -> None:
+        self.logger.debug("execute: delete_blocklist")
+        await self.http_request(
+            "delete_blocklist", "DELETE", self.get_blocklist_url(blocklist_name)
+        )
+        with self._update_mirror() as mirror:
+            mirror.delete(blocklist_name)
+        await self._invalidate_blocklist(blocklist_name)
 
+    @instrumented("list_blocklist_items")
+    async def list_blocklist_items(
+        self, blocklist_name: str
+    ) -> list[TextBlocklistItem]:
+        self.logger.debug("execute: list_blocklist_items")
+        return await self.get_pages(
+            "list_blocklist_items",
+            self.get_blocklist_url(blocklist_name, "/blocklistItems"),
+            TextBlocklistItem,
+        )
+
+    @instrumented("add_or_update_blocklist_items")
+    async def add_or_update_blocklist_items(
+        self,
+        blocklist_name: str,
+        items: Iterable[str | BlocklistItemInput],
+        max_concurrency: int | None = None,
+    ) -> list[TextBlocklistItem]:
+        self.logger.debug("execute: add_or_update_blocklist_items")
+        url = self.get_blocklist_url(blocklist_name, ":addOrUpdateBlocklistItems")
+
+        async def send(batch: list[BlocklistItemInput]) -> list[TextBlocklistItem]:
+            result = await self.http_post(
+                "add_or_update_blocklist_items",
+                url,
+                {"blocklistItems": [item.model_dump() for item in batch]},
+            )
+            return self.validate(
+                "add_or_update_blocklist_items",
+                AddOrUpdateBlocklistItemsResponse,
+                result,
+            ).blocklistItems
+
+        try:
+            results = await self.gather_batches(
+                send,
+                batched(to_blocklist_items(items), BLOCKLIST_ITEMS_PER_REQUEST),
+                max_concurrency,
+            )
+        except Exception:
+            # the batches sent before the failure were applied
+            await self._invalidate_blocklist(blocklist_name)
+            raise
+
+        upserted = [item for batch in results for item in batch]
+        await self._blocklist_changed(blocklist_name, upserted=upserted)
+        return upserted
+
+    @instrumented("remove_blocklist_items")
+    async def remove_blocklist_items(
+        self,
+        blocklist_name: str,
+        item_ids: Iterable[str],
+        max_concurrency: int | None = None,
+    ) -> None:
+        self.logger.debug("execute: remove_blocklist_items")
+        url = self.get_blocklist_url(blocklist_name, ":removeBlocklistItems")
+        removed: list[str] = []
+
+        async def send(batch: list[str]) -> None:
+            await self.http_post(
+                "remove_blocklist_items", url, {"blocklistItemIds": batch}
+            )
+            removed.extend(batch)
+
+        try:
+            await self.gather_batches(
+                send, batched(item_ids, BLOCKLIST_ITEMS_PER_REQUEST), max_concurrency
+            )
+        finally:
+            await self._blocklist_changed(blocklist_name, removed=removed)
+
+    @instrumented("sync_blocklist")
+    async def sync_blocklist(
+        self,
+        blocklist_name: str,
+        items: Iterable[str | BlocklistItemInput],
+        description: str | None = None,
+        max_concurrency: int | None = None,
+    ) -> BlocklistSyncResult:
+        self.logger.debug("execute: sync_blocklist")
+        desired = to_blocklist_items(items)
+        if description is not None:
+            await self.create_or_update_blocklist(blocklist_name, description)
+
+        try:
+            current = await self.list_blocklist_items(blocklist_name)
+        except ContentSafetyHttpError as e:
+            if e.status != 404 or description is not None:
+                raise
+            await self.create_or_update_blocklist(blocklist_name)
+            current = []
+
+        upserts, removals = diff_blocklist_items(current, desired)
+        self.logger.debug(
+            f"sync_blocklist: {blocklist_name} {len(upserts)} upserts,"
+            f" {len(removals)} removals, {len(current)} current items"
+        )
+        upserted: list[TextBlocklistItem] = []
+        if upserts:
+            upserted = await self.add_or_update_blocklist_items(
+                blocklist_name, upserts, max_concurrency
+            )
+        if removals:
+            await self.remove_blocklist_items(blocklist_name, removals, max_concurrency)
+
+        state = {item.blocklistItemId: item for item in current}
+        for item_id in removals:
+            state.pop(item_id, None)
+        state.update((item.blocklistItemId, item) for item in upserted)
+        with self._update_mirror() as mirror:
+            mirror.set_items(
+                blocklist_name,
+                {item_id: item.text for item_id, item in state.items()},
+                [item_id for item_id, item in state.items() if item.isRegex],
+            )
+        await self._invalidate_blocklist(blocklist_name)
+        return BlocklistSyncResult(upserted=upserted, removed=removals)
+
+    @instrumented("prompt_shield")
     async def prompt_shield(
         self, user_prompt: str, documents: list[str]
     ) -> PromptShieldResponse:
         self.logger.debug("execute: prompt_shield")
         url = self.get_service_url("text:shieldPrompt")
-        result = await self.http_post(
+        result = await self.shared_post(
             "prompt_shield", url, {"userPrompt": user_prompt, "documents": documents}
         )
-        return PromptShieldResponse(**result)
+        return self.validate("prompt_shield", PromptShieldResponse, result)
 
+    @instrumented("detect_groundedness")
     async def detect_groundedness(
         self,
         text: str,
@@ -67,9 +942,30 @@ class ContentSafety(IContentSafety):
         qna: QnAQuery | None = None,
     ) -> DetectGroundednessResponse:
         self.logger.debug("execute: detect_groundedness")
-        if task == "QnA" and qna is None:
-            raise ValueError("QnA data is required when task is QnA")
+        _check_groundedness_input(text, task, qna)
+        if sum(len(source) for source in groundingSources) > GROUNDING_SOURCES_LIMIT:
+            return await self.detect_groundedness_sharded(
+                text=text,
+                groundingSources=groundingSources,
+                reasoning=reasoning,
+                domain=domain,
+                task=task,
+                qna=qna,
+            )
+
+        return await self._detect_groundedness(
+            text, groundingSources, reasoning, domain, task, qna
+        )
 
+    async def _detect_groundedness(
+        self,
+        text: str,
+        groundingSources: list[str],
+        reasoning: bool,
+        domain: str,
+        task: str,
+        qna: QnAQuery | None,
+    ) -> DetectGroundednessResponse:
         input = {
             "text": text,
             "groundingSources": groundingSources,
@@ -83,16 +979,54 @@ class ContentSafety(IContentSafety):
 
         url = self.get_service_url("text:detectGroundedness")
         result = await self.http_post("detect_groundedness", url, input)
-        return DetectGroundednessResponse(**result)
+        return self.validate("detect_groundedness", DetectGroundednessResponse, result)
+
+    @instrumented("detect_groundedness_sharded")
+    async def detect_groundedness_sharded(
+        self,
+        text: str,
+        groundingSources: list[str],
+        reasoning: bool = False,
+        domain: Literal["Medical", "Generic"] = "Generic",
+        task: Literal["QnA", "Summarization"] = "Summarization",
+        qna: QnAQuery | None = None,
+        max_sources_length: int = GROUNDING_SOURCES_LIMIT,
+        max_concurrency: int | None = None,
+    ) -> DetectGroundednessResponse:
+        self.logger.debug("execute: detect_groundedness_sharded")
+        _check_groundedness_input(text, task, qna)
+        if not 0 < max_sources_length <= GROUNDING_SOURCES_LIMIT:
+            raise ValueError(
+                f"max_sources_length must be between 1 and {GROUNDING_SOURCES_LIMIT}"
+            )
+
+        shards = shard_sources(groundingSources, max_sources_length)
+        if not shards:
+            raise ValueError("groundingSources must contain at least one source")
+
+        responses = await self.gather_batches(
+            lambda sources: self._detect_groundedness(
+                text, sources, reasoning, domain, task, qna
+            ),
+            shards,
+            max_concurrency,
+        )
+        return merge_groundedness(text, responses)
 
+    @instrumented("detect_protected_materials")
     async def detect_protected_materials(
         self, text: str
     ) -> DetectProtectedMaterialResponse:
         self.logger.debug("execute: detect_protected_materials")
         url = self.get_service_url("text:detectProtectedMaterial")
-        result = await self.http_post("detect_protected_materials", url, {"text": text})
-        return DetectProtectedMaterialResponse(**result)
+        result = await self.shared_post(
+            "detect_protected_materials", url, {"text": text}
+        )
+        return self.validate(
+            "detect_protected_materials", DetectProtectedMaterialResponse, result
+        )
 
+    @instrumented("detect_protected_material_for_code")
     async def detect_protected_material_for_code(
         self, code: str
     ) -> DetectProtectedMaterialCodeResponse:
@@ -101,8 +1035,13 @@ class ContentSafety(IContentSafety):
         result = await self.http_post(
             "detect_protected_material_for_code", url, {"code": code}
         )
-        return DetectProtectedMaterialCodeResponse(**result)
+        return self.validate(
+            "detect_protected_material_for_code",
+            DetectProtectedMaterialCodeResponse,
+            result,
+        )
 
+    @instrumented("text_moderation")
     async def text_moderation(
         self,
         text: str,
@@ -114,6 +1053,53 @@ class ContentSafety(IContentSafety):
         ] = "FourSeverityLevels",
     ) -> TextModerationResponse:
         self.logger.debug("execute: text_moderation")
+        if len(text) > TEXT_MODERATION_CHARACTER_LIMIT:
+            return await self.text_moderation_long(
+                text=text,
+                categories=categories,
+                blocklist_names=blocklist_names,
+                halt_on_blocklist_hit=halt_on_blocklist_hit,
+                output_type=output_type,
+            )
+
+        local = self._match_local_blocklists(
+            text, blocklist_names, halt_on_blocklist_hit
+        )
+        if local is not None:
+            return local
+
+        result = await self._text_moderation_content(
+            text, categories, blocklist_names, halt_on_blocklist_hit, output_type
+        )
+        return self.validate("text_moderation", TextModerationResponse, result)
+
+    def _match_local_blocklists(
+        self,
+        text: str,
+        blocklist_names: list[str] | None,
+        halt_on_blocklist_hit: bool,
+    ) -> TextModerationResponse | None:
+        if not (
+            blocklist_names
+            and halt_on_blocklist_hit
+            and self.local_blocklists.covers(blocklist_names)
+        ):
+            return None
+
+        matches = self.local_blocklists.match(text, blocklist_names)
+        if not matches:
+            return None
+        # the service skips the category analysis on a blocklist hit
+        return TextModerationResponse(blocklistsMatch=matches, categoriesAnalysis=[])
+
+    async def _text_moderation_content(
+        self,
+        text: str,
+        categories: list[str] | None,
+        blocklist_names: list[str] | None,
+        halt_on_blocklist_hit: bool,
+        output_type: str,
+    ) -> bytes:
         url = self.get_service_url("text:analyze")
 
         input: dict[str, str | list[str] | bool] = {
@@ -127,19 +1113,149 @@ class ContentSafety(IContentSafety):
             input["blocklistNames"] = blocklist_names
             input["haltOnBlocklistHit"] = halt_on_blocklist_hit
 
-        result = await self.http_post(fn_name="text_moderation", url=url, json=input)
-        return TextModerationResponse(**result)
+        return await self.shared_post(
+            fn_name="text_moderation",
+            url=url,
+            json=input,
+            tags=[blocklist_tag(name) for name in blocklist_names or []],
+            # the blocklists live on the first endpoint only
+            pinned=bool(blocklist_names),
+        )
+
+    async def _text_moderation_compact(
+        self,
+        text: str,
+        categories: list[str] | None,
+        blocklist_names: list[str] | None,
+        halt_on_blocklist_hit: bool,
+        output_type: str,
+    ) -> CompactModeration:
+        if len(text) <= TEXT_MODERATION_CHARACTER_LIMIT:
+            local = self._match_local_blocklists(
+                text, blocklist_names, halt_on_blocklist_hit
+            )
+            if local is not None:
+                return compact_moderation(local)
+
+            content = await self._text_moderation_content(
+                text, categories, blocklist_names, halt_on_blocklist_hit, output_type
+            )
+            return decode_compact_moderation(content)
+
+        response = await self.text_moderation_long(
+            text=text,
+            categories=categories,
+            blocklist_names=blocklist_names,
+            halt_on_blocklist_hit=halt_on_blocklist_hit,
+            output_type=output_type,  # type: ignore[arg-type]
+        )
+        return compact_moderation(response)
 
+    @instrumented("text_moderation_long")
+    async def text_moderation_long(
+        self,
+        text: str,
+        categories: list[str] | None = None,
+        blocklist_names: list[str] | None = None,
+        halt_on_blocklist_hit: bool = True,
+        output_type: Literal[
+            "FourSeverityLevels", "EightSeverityLevels"
+        ] = "FourSeverityLevels",
+        chunk_length: int = TEXT_MODERATION_CHARACTER_LIMIT,
+        overlap: int = 0,
+        max_concurrency: int | None = None,
+    ) -> TextModerationResponse:
+        self.logger.debug("execute: text_moderation_long")
+        max_length = self.env.azure_content_safety_max_long_text_length
+        if len(text) > max_length:
+            raise ValueError(
+                f"text has {len(text)} characters, the maximum is {max_length}"
+            )
+        if chunk_length > TEXT_MODERATION_CHARACTER_LIMIT:
+            raise ValueError(
+                f"chunk_length must be at most {TEXT_MODERATION_CHARACTER_LIMIT}"
+            )
+
+        chunks = split_text(text, chunk_length, overlap)
+        items = self.text_moderation_many(
+            [chunk.text for chunk in chunks],
+            categories=categories,
+            blocklist_names=blocklist_names,
+            halt_on_blocklist_hit=halt_on_blocklist_hit,
+            output_type=output_type,
+            max_concurrency=max_concurrency,
+        )
+        responses: list[TextModerationResponse] = []
+        async for item in items:
+            if item.error is not None:
+                await items.aclose()
+                raise item.error
+            assert item.result is not None
+            responses.append(item.result)
+
+        return merge_text_moderation(chunks, responses)
+
+    def text_moderation_stream(
+        self,
+        deltas: AsyncIterable[str],
+        categories: list[str] | None = None,
+        blocklist_names: list[str] | None = None,
+        halt_on_blocklist_hit: bool = True,
+        output_type: Literal[
+            "FourSeverityLevels", "EightSeverityLevels"
+        ] = "FourSeverityLevels",
+        severity_threshold: int = 4,
+        window_length: int = 2_000,
+        min_new_length: int = 400,
+        context_length: int = 100,
+    ) -> AsyncIterator[StreamVerdict]:
+        self.logger.debug("execute: text_moderation_stream")
+        if window_length > TEXT_MODERATION_CHARACTER_LIMIT:
+            raise ValueError(
+                f"window_length must be at most {TEXT_MODERATION_CHARACTER_LIMIT}"
+            )
+
+        async def moderate(text: str) -> TextModerationResponse:
+            return await self.text_moderation(
+                text=text,
+                categories=categories,
+                blocklist_names=blocklist_names,
+                halt_on_blocklist_hit=halt_on_blocklist_hit,
+                output_type=output_type,
+            )
+
+        return moderate_stream(
+            moderate,
+            deltas,
+            severity_threshold=severity_threshold,
+            window_length=window_length,
+            min_new_length=min_new_length,
+            context_length=context_length,
+        )
+
+    @instrumented("image_moderation")
     async def image_moderation(
         self,
-        image: str,
+        image: str | ImageSource,
         categories: list[str] | None = None,
         output_type: Literal[
             "FourSeverityLevels", "EightSeverityLevels"
         ] = "FourSeverityLevels",
     ) -> ImageModerationResponse:
         self.logger.debug("execute: image_moderation")
+        result = await self._image_moderation_content(image, categories, output_type)
+        return self.validate("image_moderation", ImageModerationResponse, result)
+
+    async def _image_moderation_content(
+        self,
+        image: str | ImageSource,
+        categories: list[str] | None,
+        output_type: str,
+    ) -> bytes:
         url = self.get_service_url("image:analyze")
+        if not isinstance(image, str):
+            return await self._image_moderation_raw(url, image, categories, output_type)
+
         input: dict[str, Any] = {
             "image": {"content": image},
             "outputType": output_type,
@@ -147,5 +1263,249 @@ class ContentSafety(IContentSafety):
         if categories is not None:
             input["categories"] = categories
 
-        result = await self.http_post(fn_name="image_moderation", url=url, json=input)
-        return ImageModerationResponse(**result)
+        return await self.shared_post(fn_name="image_moderation", url=url, json=input)
+
+    async def _image_moderation_raw(
+        self,
+        url: str,
+        image: ImageSource,
+        categories: list[str] | None,
+        output_type: str,
+    ) -> bytes:
+        options: dict[str, Any] = {"outputType": output_type}
+        if categories is not None:
+            options["categories"] = categories
+
+        payload = ImagePayload(image, options)
+        if not payload.replayable:
+            return await self.http_send("image_moderation", url, payload)
+
+        return await self._shared(
+            "image_moderation",
+            lambda: make_cache_key(
+                "image_moderation", {**options, "image": {"sha256": payload.digest()}}
+            ),
+            lambda: self.http_send("image_moderation", url, payload),
+        )
+
+    def prompt_shield_many(
+        self,
+        items: Iterable[tuple[str, list[str]]] | AsyncIterable[tuple[str, list[str]]],
+        max_concurrency: int | None = None,
+        ordered: bool = True,
+    ) -> AsyncGenerator[BatchItem[PromptShieldResponse], None]:
+        self.logger.debug("execute: prompt_shield_many")
+
+        async def fn(item: tuple[str, list[str]]) -> PromptShieldResponse:
+            user_prompt, documents = item
+            return await self.prompt_shield(user_prompt, documents)
+
+        return bounded_map(
+            fn,
+            items,
+            max_concurrency or self.env.azure_content_safety_max_concurrency,
+            ordered,
+        )
+
+    @overload
+    def text_moderation_many(
+        self,
+        texts: Iterable[str] | AsyncIterable[str],
+        categories: list[str] | None = None,
+        blocklist_names: list[str] | None = None,
+        halt_on_blocklist_hit: bool = True,
+        output_type: Literal[
+            "FourSeverityLevels", "EightSeverityLevels"
+        ] = "FourSeverityLevels",
+        max_concurrency: int | None = None,
+        ordered: bool = True,
+        compact: Literal[False] = False,
+    ) -> AsyncGenerator[BatchItem[TextModerationResponse], None]: ...
+
+    @overload
+    def text_moderation_many(
+        self,
+        texts: Iterable[str] | AsyncIterable[str],
+        categories: list[str] | None = None,
+        blocklist_names: list[str] | None = None,
+        halt_on_blocklist_hit: bool = True,
+        output_type: Literal[
+            "FourSeverityLevels", "EightSeverityLevels"
+        ] = "FourSeverityLevels",
+        max_concurrency: int | None = None,
+        ordered: bool = True,
+        *,
+        compact: Literal[True],
+    ) -> AsyncGenerator[BatchItem[CompactModeration], None]: ...
+
+    def text_moderation_many(
+        self,
+        texts: Iterable[str] | AsyncIterable[str],
+        categories: list[str] | None = None,
+        blocklist_names: list[str] | None = None,
+        halt_on_blocklist_hit: bool = True,
+        output_type: Literal[
+            "FourSeverityLevels", "EightSeverityLevels"
+        ] = "FourSeverityLevels",
+        max_concurrency: int | None = None,
+        ordered: bool = True,
+        compact: bool = False,
+    ) -> (
+        AsyncGenerator[BatchItem[TextModerationResponse], None]
+        | AsyncGenerator[BatchItem[CompactModeration], None]
+    ):
+        self.logger.debug("execute: text_moderation_many")
+
+        async def moderate(text: str) -> TextModerationResponse:
+            return await self.text_moderation(
+                text=text,
+                categories=categories,
+                blocklist_names=blocklist_names,
+                halt_on_blocklist_hit=halt_on_blocklist_hit,
+                output_type=output_type,
+            )
+
+        async def moderate_compact(text: str) -> CompactModeration:
+            return await self._text_moderation_compact(
+                text,
+                categories,
+                blocklist_names,
+                halt_on_blocklist_hit,
+                output_type,
+            )
+
+        max_concurrency = (
+            max_concurrency or self.env.azure_content_safety_max_concurrency
+        )
+        if compact:
+            return bounded_map(moderate_compact, texts, max_concurrency, ordered)
+        return bounded_map(moderate, texts, max_concurrency, ordered)
+
+    @overload
+    def image_moderation_many(
+        self,
+        images: Iterable[str | ImageSource] | AsyncIterable[str | ImageSource],
+        categories: list[str] | None = None,
+        output_type: Literal[
+            "FourSeverityLevels", "EightSeverityLevels"
+        ] = "FourSeverityLevels",
+        max_concurrency: int | None = None,
+        ordered: bool = True,
+        compact: Literal[False] = False,
+        preprocessor: ImagePreprocessor | None = None,
+    ) -> AsyncGenerator[BatchItem[ImageModerationResponse], None]: ...
+
+    @overload
+    def image_moderation_many(
+        self,
+        images: Iterable[str | ImageSource] | AsyncIterable[str | ImageSource],
+        categories: list[str] | None = None,
+        output_type: Literal[
+            "FourSeverityLevels", "EightSeverityLevels"
+        ] = "FourSeverityLevels",
+        max_concurrency: int | None = None,
+        ordered: bool = True,
+        *,
+        compact: Literal[True],
+        preprocessor: ImagePreprocessor | None = None,
+    ) -> AsyncGenerator[BatchItem[CompactModeration], None]: ...
+
+    def image_moderation_many(
+        self,
+        images: Iterable[str | ImageSource] | AsyncIterable[str | ImageSource],
+        categories: list[str] | None = None,
+        output_type: Literal[
+            "FourSeverityLevels", "EightSeverityLevels"
+        ] = "FourSeverityLevels",
+        max_concurrency: int | None = None,
+        ordered: bool = True,
+        compact: bool = False,
+        preprocessor: ImagePreprocessor | None = None,
+    ) -> (
+        AsyncGenerator[BatchItem[ImageModerationResponse], None]
+        | AsyncGenerator[BatchItem[CompactModeration], None]
+    ):
+        self.logger.debug("execute: image_moderation_many")
+
+        async def moderate(image: str | ImageSource) -> ImageModerationResponse:
+            return await self.image_moderation(
+                image=image, categories=categories, output_type=output_type
+            )
+
+        async def moderate_compact(image: str | ImageSource) -> CompactModeration:
+            content = await self._image_moderation_content(
+                image, categories, output_type
+            )
+            return decode_compact_moderation(content)
+
+        max_concurrency = (
+            max_concurrency or self.env.azure_content_safety_max_concurrency
+        )
+        if preprocessor is not None:
+            return self._image_moderation_prepared(
+                images,
+                categories,
+                output_type,
+                max_concurrency,
+                ordered,
+                compact,
+                preprocessor,
+            )
+
+        if compact:
+            return bounded_map(moderate_compact, images, max_concurrency, ordered)
+        return bounded_map(moderate, images, max_concurrency, ordered)
+
+    def _image_moderation_prepared(
+        self,
+        images: Iterable[str | ImageSource] | AsyncIterable[str | ImageSource],
+        categories: list[str] | None,
+        output_type: str,
+        max_concurrency: int,
+        ordered: bool,
+        compact: bool,
+        preprocessor: ImagePreprocessor,
+    ) -> AsyncGenerator[BatchItem[Any], None]:
+        url = self.get_service_url("image:analyze")
+        options: dict[str, Any] = {"outputType": output_type}
+        if categories is not None:
+            options["categories"] = categories
+
+        async def fn(
+            item: PreparedImage | Exception,
+        ) -> ImageModerationResponse | CompactModeration:
+            if isinstance(item, Exception):
+                raise item
+            content = await self._shared(
+                "image_moderation",
+                lambda: item.cache_key,
+                lambda: self.http_send("image_moderation", url, item.body),
+            )
+            if compact:
+                return decode_compact_moderation(content)
+            return self.validate("image_moderation", ImageModerationResponse, content)
+
+        return bounded_map(
+            fn, preprocessor.prepare_many(images, options), max_concurrency, ordered
+        )
+
+
+def _check_groundedness_input(text: str, task: str, qna: QnAQuery | None) -> None:
+    if task == "QnA" and qna is None:
+        raise ValueError("QnA data is required when task is QnA")
+    if len(text) > GROUNDEDNESS_TEXT_LIMIT:
+        raise ValueError(
+            f"text has {len(text)} characters, the maximum is {GROUNDEDNESS_TEXT_LIMIT}"
+        )
+
+
+def _dumps(payload: dict) -> bytes:
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def _content_length(body: bytes | ImagePayload | None) -> int:
+    if body is None:
+        return 0
+    if isinstance(body, bytes):
+        return len(body)
+    return body.content_length or 0
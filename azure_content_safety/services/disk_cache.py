@@ -0,0 +1,206 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+from azure_content_safety.protocols.i_response_cache import IResponseCache
+from azure_content_safety.services.response_cache import CacheStats
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at);
+CREATE TABLE IF NOT EXISTS tags (
+    tag TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (tag, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS tags_key ON tags (key);
+"""
+
+
+@dataclass
+class DiskResponseCache(IResponseCache):
+    """Response cache in a SQLite database, shared by every process of a host and
+    kept across restarts.
+
+    The database runs in WAL mode, so readers never wait for writers and a hit is
+    a single indexed lookup of a few microseconds. set is best effort: it waits up
+    to write_timeout_s for concurrent writers, then drops the entry, and database
+    errors of get and set are logged and treated as a miss or a dropped entry, so
+    that the cache never fails a request. Invalidation and eviction wait up to
+    busy_timeout_s. The calls block, so async code runs them in a worker thread.
+    Entries expire after ttl seconds of wall clock time. Every evict_every writes,
+    a process deletes the expired entries and then the entries closest to expiry
+    beyond max_entries. Keys are prefixed with namespace (e.g. the API version) so
+    that clients of different versions can share a file.
+    """
+
+    path: Path
+    max_entries: int = 100_000
+    ttl: float = 300.0
+    namespace: str = ""
+    busy_timeout_s: float = 5.0
+    write_timeout_s: float = 0.1
+    evict_every: int = 100
+    clock: Callable[[], float] = time.time
+    logger: logging.Logger = field(
+        default_factory=lambda: logging.getLogger(__name__), repr=False
+    )
+    hits: int = field(default=0, init=False)
+    misses: int = field(default=0, init=False)
+    evictions: int = field(default=0, init=False)
+    dropped: int = field(default=0, init=False)
+    """Entries that set could not store."""
+    _writes: int = field(default=0, init=False, repr=False)
+    _connection: sqlite3.Connection | None = field(default=None, init=False, repr=False)
+    _pid: int = field(default=0, init=False, repr=False)
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False
+    )
+
+    def __post_init__(self) -> None:
+        if self.max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.path = Path(self.path)
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        # a connection must not be shared with a forked child
+        if self._connection is None or self._pid != os.getpid():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout_s,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            with connection:
+                connection.executescript(_SCHEMA)
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}" if self.namespace else key
+
+    def get(self, key: str) -> bytes | None:
+        try:
+            with self._lock:
+                row = self.connection.execute(
+                    "SELECT value, expires_at FROM entries WHERE key = ?",
+                    (self._key(key),),
+                ).fetchone()
+        except sqlite3.OperationalError as e:
+            self.logger.warning(f"disk cache: read failed: {e}")
+            row = None
+        if row is None or row[1] <= self.clock():
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return row[0]
+
+    @contextmanager
+    def _transaction(
+        self, busy_timeout_s: float | None = None
+    ) -> Iterator[sqlite3.Connection]:
+        # BEGIN IMMEDIATE takes the write lock up front, so that concurrent writers
+        # wait on busy_timeout instead of failing to upgrade a read transaction
+        timeout_ms = round(1000 * (busy_timeout_s or self.busy_timeout_s))
+        with self._lock:
+            connection = self.connection
+            connection.execute(f"PRAGMA busy_timeout = {timeout_ms}")
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def set(self, key: str, value: bytes, tags: Iterable[str] = ()) -> None:
+        key = self._key(key)
+        try:
+            with self._transaction(self.write_timeout_s) as connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?)",
+                    (key, value, self.clock() + self.ttl),
+                )
+                connection.execute("DELETE FROM tags WHERE key = ?", (key,))
+                connection.executemany(
+                    "INSERT OR IGNORE INTO tags VALUES (?, ?)",
+                    [(tag, key) for tag in tags],
+                )
+                self._writes += 1
+                if self._writes % self.evict_every == 0:
+                    self._evict(connection)
+        except sqlite3.OperationalError as e:
+            self.dropped += 1
+            self.logger.warning(f"disk cache: dropped an entry: {e}")
+
+    def _evict(self, connection: sqlite3.Connection) -> None:
+        expired = connection.execute(
+            "DELETE FROM entries WHERE expires_at <= ?", (self.clock(),)
+        ).rowcount
+        (size,) = connection.execute("SELECT COUNT(*) FROM entries").fetchone()
+        excess = max(0, size - self.max_entries)
+        if excess:
+            connection.execute(
+                "DELETE FROM entries WHERE key IN "
+                "(SELECT key FROM entries ORDER BY expires_at LIMIT ?)",
+                (excess,),
+            )
+        if expired or excess:
+            connection.execute(
+                "DELETE FROM tags WHERE key NOT IN (SELECT key FROM entries)"
+            )
+        self.evictions += expired + excess
+
+    def evict(self) -> None:
+        """Deletes the expired entries and the entries beyond max_entries now."""
+        with self._transaction() as connection:
+            self._evict(connection)
+
+    def invalidate(self, tag: str) -> int:
+        with self._transaction() as connection:
+            removed = connection.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM tags WHERE tag = ?)",
+                (tag,),
+            ).rowcount
+            connection.execute(
+                "DELETE FROM tags WHERE key IN (SELECT key FROM tags WHERE tag = ?)",
+                (tag,),
+            )
+        return removed
+
+    def clear(self) -> None:
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM entries")
+            connection.execute("DELETE FROM tags")
+
+    def stats(self) -> CacheStats:
+        return CacheStats(self.hits, self.misses, self.evictions, len(self))
+
+    def __len__(self) -> int:
+        with self._lock:
+            (size,) = self.connection.execute(
+                "SELECT COUNT(*) FROM entries WHERE expires_at > ?", (self.clock(),)
+            ).fetchone()
+        return size
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,221 @@
+import itertools
+import json
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Collection, Iterator, Literal, Sequence
+from urllib.parse import urlsplit
+
+from pydantic import BaseModel, TypeAdapter
+
+from azure_content_safety.services.instrumentation import LATENCY_SMOOTHING
+from azure_content_safety.services.rate_limiter import TokenBucket
+from azure_content_safety.services.retry import is_service_failure
+
+Routing = Literal["least_outstanding", "weighted_round_robin"]
+
+PINNED_PATHS = ("/contentsafety/text/blocklists",)
+"""Blocklists (and their item ids) belong to one resource, so their management
+requests always go to the first endpoint of the pool, as do the requests pinned
+by the caller, e.g. text:analyze with blocklistNames."""
+
+
+class EndpointConfig(BaseModel):
+    url: str
+    key: str
+    weight: float = 1.0
+    tps: float = 0.0
+    """Quota of the resource in requests per second, 0 for unlimited."""
+    burst: float = 0.0
+    name: str = ""
+    """Defaults to the host of url."""
+
+
+def parse_endpoints(value: str) -> list[EndpointConfig]:
+    """Parses the JSON list of AZURE_CONTENT_SAFETY_ENDPOINTS."""
+    return TypeAdapter(list[EndpointConfig]).validate_python(json.loads(value))
+
+
+@dataclass
+class Endpoint:
+    name: str
+    url: str
+    key: str
+    weight: float = 1.0
+    rate_limiter: TokenBucket | None = None
+    outstanding: int = 0
+    failures: int = 0
+    """Consecutive failures."""
+    latency_s: float | None = None
+    """Moving average of the latency of successful requests."""
+    ejected_until: float = 0.0
+    ejections: int = 0
+    _current_weight: float = field(default=0.0, repr=False)
+
+
+@dataclass
+class EndpointPool:
+    """Routes requests over several Content Safety resources.
+
+    Requests go to the healthy endpoint with the fewest outstanding requests per
+    unit of weight, or by smooth weighted round-robin. An endpoint is ejected for
+    eject_s after failure_threshold consecutive failures (429, 5xx or transport
+    errors), or when the moving average of its latency exceeds latency_threshold_s
+    while another endpoint is healthy. After the ejection it is on probation: one
+    more failure ejects it again. When every endpoint is ejected, requests go to
+    the one that recovers first rather than failing.
+    """
+
+    endpoints: list[Endpoint]
+    base_url: str
+    """Endpoint that service URLs are built with; it is replaced by the routed one."""
+    routing: Routing = "least_outstanding"
+    failure_threshold: int = 3
+    eject_s: float = 30.0
+    latency_threshold_s: float = 0.0
+    clock: Callable[[], float] = time.monotonic
+    _counter: Iterator[int] = field(default_factory=itertools.count, repr=False)
+
+    def __post_init__(self) -> None:
+        if not self.endpoints:
+            raise ValueError("endpoints must not be empty")
+        if self.routing not in ("least_outstanding", "weighted_round_robin"):
+            raise ValueError(f"unknown routing {self.routing!r}")
+        if any(endpoint.weight <= 0 for endpoint in self.endpoints):
+            raise ValueError("weights must be positive")
+        if len({endpoint.name for endpoint in self.endpoints}) < len(self.endpoints):
+            raise ValueError("endpoint names must be unique")
+
+    @classmethod
+    def from_configs(
+        cls, configs: Sequence[EndpointConfig], base_url: str, **kwargs
+    ) -> "EndpointPool":
+        endpoints = []
+        for config in configs:
+            rate_limiter = None
+            if config.tps > 0:
+                burst = config.burst or config.tps
+                rate_limiter = TokenBucket(rate=config.tps, capacity=max(1.0, burst))
+            endpoints.append(
+                Endpoint(
+                    name=config.name or urlsplit(config.url).netloc or config.url,
+                    url=config.url.rstrip("/"),
+                    key=config.key,
+                    weight=config.weight,
+                    rate_limiter=rate_limiter,
+                )
+            )
+        return cls(endpoints, base_url.rstrip("/"), **kwargs)
+
+    def url_for(self, endpoint: Endpoint, url: str) -> str:
+        if url.startswith(self.base_url):
+            return endpoint.url + url[len(self.base_url) :]
+        return url
+
+    def is_pinned(self, url: str, pinned: bool = False) -> bool:
+        return pinned or urlsplit(url).path.startswith(PINNED_PATHS)
+
+    def is_healthy(self, endpoint: Endpoint) -> bool:
+        if endpoint.ejected_until == 0.0:
+            return True
+        if self.clock() < endpoint.ejected_until:
+            return False
+
+        # back from ejection, on probation
+        endpoint.ejected_until = 0.0
+        endpoint.failures = max(0, self.failure_threshold - 1)
+        endpoint.latency_s = None
+        return True
+
+    def can_fail_over(
+        self, url: str, tried: Collection[str], pinned: bool = False
+    ) -> bool:
+        if self.is_pinned(url, pinned):
+            return False
+        return any(
+            endpoint.name not in tried and self.is_healthy(endpoint)
+            for endpoint in self.endpoints
+        )
+
+    def pick(
+        self, url: str, tried: Collection[str] = (), pinned: bool = False
+    ) -> Endpoint:
+        """Returns the endpoint for the next request to url, skipping the endpoints
+        already tried by the request; pinned requests go to the first endpoint."""
+        if self.is_pinned(url, pinned):
+            return self.endpoints[0]
+
+        candidates = [e for e in self.endpoints if e.name not in tried]
+        if not candidates:
+            candidates = self.endpoints
+        healthy = [e for e in candidates if self.is_healthy(e)]
+        if not healthy:
+            return min(candidates, key=lambda e: e.ejected_until)
+
+        if self.routing == "weighted_round_robin":
+            total = sum(e.weight for e in healthy)
+            for endpoint in healthy:
+                endpoint._current_weight += endpoint.weight
+            chosen = max(healthy, key=lambda e: e._current_weight)
+            chosen._current_weight -= total
+            return chosen
+
+        # rotate the start so that ties are spread over the endpoints
+        start = next(self._counter) % len(healthy)
+        rotated = healthy[start:] + healthy[:start]
+        return min(rotated, key=lambda e: (e.outstanding + 1) / e.weight)
+
+    @contextmanager
+    def request(self, endpoint: Endpoint) -> Iterator[None]:
+        """Tracks an outstanding request and its outcome for the health of the
+        endpoint. Errors of the caller (4xx) and cancellations are not failures."""
+        endpoint.outstanding += 1
+        started = self.clock()
+        try:
+            yield
+        except Exception as e:
+            if is_service_failure(e):
+                self.record_failure(endpoint)
+            raise
+        else:
+            self.record_success(endpoint, self.clock() - started)
+        finally:
+            endpoint.outstanding -= 1
+
+    def record_success(self, endpoint: Endpoint, latency_s: float) -> None:
+        endpoint.failures = 0
+        if endpoint.latency_s is None:
+            endpoint.latency_s = latency_s
+        else:
+            endpoint.latency_s += LATENCY_SMOOTHING * (latency_s - endpoint.latency_s)
+
+        if (
+            self.latency_threshold_s > 0
+            and endpoint.latency_s > self.latency_threshold_s
+            and any(
+                other is not endpoint and self.is_healthy(other)
+                for other in self.endpoints
+            )
+        ):
+            self._eject(endpoint)
+
+    def record_failure(self, endpoint: Endpoint) -> None:
+        endpoint.failures += 1
+        if endpoint.failures >= self.failure_threshold:
+            self._eject(endpoint)
+
+    def _eject(self, endpoint: Endpoint) -> None:
+        endpoint.ejected_until = self.clock() + self.eject_s
+        endpoint.ejections += 1
+
+    def snapshot(self) -> dict[str, dict[str, float | int | bool | None]]:
+        return {
+            endpoint.name: {
+                "healthy": self.is_healthy(endpoint),
+                "outstanding": endpoint.outstanding,
+                "failures": endpoint.failures,
+                "latency_s": endpoint.latency_s,
+                "ejections": endpoint.ejections,
+            }
+            for endpoint in self.endpoints
+        }
@@ -0,0 +1,88 @@
+from typing import Sequence
+
+from azure_content_safety.models import (
+    DetectedGroundednessResponseDetails,
+    DetectGroundednessResponse,
+)
+from azure_content_safety.services.text_chunking import split_text
+
+GROUNDEDNESS_TEXT_LIMIT = 7_500
+"""Maximum number of characters of the text of text:detectGroundedness."""
+
+GROUNDING_SOURCES_LIMIT = 55_000
+"""Maximum total number of characters of the grounding sources of one request."""
+
+
+def shard_sources(sources: Sequence[str], max_length: int) -> list[list[str]]:
+    """Packs the grounding sources into as few shards of at most max_length total
+    characters as possible (first fit decreasing). Duplicate and blank sources are
+    dropped, sources longer than max_length are split on sentence boundaries, and
+    every shard keeps the sources in their original order."""
+    unique: dict[str, None] = {}
+    for source in sources:
+        if source.strip():
+            unique.setdefault(source, None)
+
+    pieces: list[str] = []
+    for source in unique:
+        if len(source) <= max_length:
+            pieces.append(source)
+        else:
+            pieces.extend(chunk.text for chunk in split_text(source, max_length))
+
+    shards: list[list[int]] = []
+    lengths: list[int] = []
+    for index in sorted(range(len(pieces)), key=lambda i: -len(pieces[i])):
+        length = len(pieces[index])
+        for shard, used in enumerate(lengths):
+            if used + length <= max_length:
+                shards[shard].append(index)
+                lengths[shard] += length
+                break
+        else:
+            shards.append([index])
+            lengths.append(length)
+
+    return [[pieces[i] for i in sorted(shard)] for shard in shards]
+
+
+def merge_groundedness(
+    text: str, responses: Sequence[DetectGroundednessResponse]
+) -> DetectGroundednessResponse:
+    """Merges the responses of the shards of the grounding sources of one text.
+
+    A sentence is grounded when any shard grounds it, so the ungrounded details are
+    those reported by every shard, and the text is ungrounded only when every
+    shard detected ungrounded text. The percentage is the share of the text held
+    by the remaining details, at most the smallest percentage of the shards.
+    """
+    if not responses or not all(r.ungroundedDetected for r in responses):
+        return DetectGroundednessResponse(
+            ungroundedDetected=False, ungroundedPercentage=0.0, ungroundedDetails=[]
+        )
+
+    common = set.intersection(
+        *({detail.text for detail in r.ungroundedDetails} for r in responses)
+    )
+    details: list[DetectedGroundednessResponseDetails] = []
+    for detail in responses[0].ungroundedDetails:
+        if detail.text in common:
+            common.discard(detail.text)
+            details.append(detail)
+
+    percentage = min(r.ungroundedPercentage for r in responses)
+    if any(r.ungroundedDetails for r in responses):
+        if not details:
+            return DetectGroundednessResponse(
+                ungroundedDetected=False,
+                ungroundedPercentage=0.0,
+                ungroundedDetails=[],
+            )
+        share = sum(len(detail.text) for detail in details) / max(len(text), 1)
+        percentage = min(percentage, round(share, 4))
+
+    return DetectGroundednessResponse(
+        ungroundedDetected=True,
+        ungroundedPercentage=percentage,
+        ungroundedDetails=details,
+    )
@@ -0,0 +1,124 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Mapping
+
+from azure_content_safety.errors import CircuitOpenError
+from azure_content_safety.models import (
+    DetectGroundednessResponse,
+    DetectProtectedMaterialCodeResponse,
+    DetectProtectedMaterialResponse,
+    GuardrailCheckResult,
+    GuardrailVerdict,
+    ImageModerationResponse,
+    PromptShieldResponse,
+    TextModerationResponse,
+)
+from azure_content_safety.services.stream_moderation import is_blocking
+
+
+@dataclass(frozen=True)
+class GuardrailPolicy:
+    """Decides whether the result of a check blocks; called as policy(name, result).
+
+    Moderation results block from severity_threshold on or on a blocklist hit,
+    prompt shield results on a detected attack, protected material results when
+    material is detected and groundedness results when ungrounded text is
+    detected. rules override the decision per check name. A failed check, whose
+    result is its exception, blocks when block_on_error is set (fail closed),
+    except while its circuit is open, where the fail_open setting of the circuit
+    breaker decides.
+    """
+
+    severity_threshold: int = 4
+    block_on_error: bool = True
+    rules: Mapping[str, Callable[[Any], bool]] = field(default_factory=dict)
+
+    def __call__(self, name: str, result: Any) -> bool:
+        rule = self.rules.get(name)
+        if rule is not None:
+            return rule(result)
+
+        match result:
+            case CircuitOpenError():
+                return not result.fail_open
+            case Exception():
+                return self.block_on_error
+            case TextModerationResponse():
+                return is_blocking(result, self.severity_threshold)
+            case ImageModerationResponse():
+                return any(
+                    item.severity >= self.severity_threshold
+                    for item in result.categoriesAnalysis
+                )
+            case PromptShieldResponse():
+                return result.userPromptAnalysis.attackDetected or any(
+                    document.attackDetected for document in result.documentsAnalysis
+                )
+            case DetectProtectedMaterialResponse():
+                return any(result.protectedMaterialAnalysis.values())
+            case DetectProtectedMaterialCodeResponse():
+                return result.protectedMaterialAnalysis.detected
+            case DetectGroundednessResponse():
+                return result.ungroundedDetected
+            case _:
+                return False
+
+
+async def run_guardrails(
+    checks: Mapping[str, Callable[[], Awaitable[Any]]],
+    policy: Callable[[str, Any], bool],
+) -> GuardrailVerdict:
+    """Runs the checks concurrently. As soon as policy(name, result) blocks, where
+    result is the exception of a failed check, the outstanding checks are
+    cancelled and awaited, so the verdict takes as long as the first blocking
+    check, or as the slowest check when none blocks."""
+    started = time.perf_counter()
+    tasks = {
+        asyncio.ensure_future(_timed(check)): name for name, check in checks.items()
+    }
+    results: dict[str, GuardrailCheckResult] = {}
+    decided_by: str | None = None
+    try:
+        pending = set(tasks)
+        while pending and decided_by is None:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            # in the order of checks, when several finish together
+            for task, name in tasks.items():
+                if task not in done:
+                    continue
+                result, error, duration = task.result()
+                blocked = policy(name, result if error is None else error)
+                results[name] = GuardrailCheckResult(
+                    name, duration, result, error, blocked
+                )
+                if blocked and decided_by is None:
+                    decided_by = name
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    cancelled_after = time.perf_counter() - started
+    for name in checks:
+        if name not in results:
+            results[name] = GuardrailCheckResult(name, cancelled_after, cancelled=True)
+    return GuardrailVerdict(
+        blocked=decided_by is not None,
+        decided_by=decided_by,
+        checks={name: results[name] for name in checks},
+        duration_s=time.perf_counter() - started,
+    )
+
+
+async def _timed(
+    check: Callable[[], Awaitable[Any]],
+) -> tuple[Any, Exception | None, float]:
+    started = time.perf_counter()
+    try:
+        result = await check()
+    except Exception as e:
+        return None, e, time.perf_counter() - started
+    return result, None, time.perf_counter() - started
@@ -0,0 +1,167 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, TypeVar
+
+from azure_content_safety.protocols.i_instrumentation import IInstrumentation
+from azure_content_safety.services.instrumentation import nearest_rank
+
+T = TypeVar("T")
+
+
+@dataclass
+class LatencyWindow:
+    """The latest latencies of an operation, with a percentile recomputed every
+    refresh_every samples rather than on every call."""
+
+    size: int = 512
+    refresh_every: int = 16
+    samples: deque[float] = field(init=False)
+    _percentiles: dict[float, float] = field(default_factory=dict, init=False)
+    _stale: int = field(default=0, init=False)
+
+    def __post_init__(self) -> None:
+        self.samples = deque(maxlen=self.size)
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self._stale += 1
+        if self._stale >= self.refresh_every:
+            self._percentiles.clear()
+            self._stale = 0
+
+    def percentile(self, q: float) -> float:
+        """Nearest-rank percentile, q in [0, 100]."""
+        value = self._percentiles.get(q)
+        if value is None:
+            value = self._percentiles[q] = nearest_rank(sorted(self.samples), q)
+        return value
+
+
+@dataclass
+class HedgeStats:
+    requests: int = 0
+    hedged: int = 0
+    """Requests that sent a duplicate."""
+    won: int = 0
+    """Requests answered by the duplicate first."""
+
+
+@dataclass
+class Hedging:
+    """Hedged requests: when a request is still pending after the percentile of
+    the recent latencies of its operation, a duplicate is sent and the first
+    answer wins; the other request is cancelled.
+
+    Duplicates are limited by a budget: every request deposits max_ratio tokens
+    (up to budget_max) and every duplicate withdraws one, so that hedging adds at
+    most about max_ratio of the traffic, even when the whole backend is slow.
+
+    With instrumentation, the requests, duplicates and duplicates that won of each
+    operation are published as counters, and its hedge delay as a gauge.
+    """
+
+    percentile: float = 95.0
+    min_samples: int = 20
+    min_delay_s: float = 0.005
+    max_ratio: float = 0.1
+    budget_max: float = 10.0
+    window: int = 512
+    clock: Callable[[], float] = time.perf_counter
+    instrumentation: IInstrumentation | None = None
+    _windows: dict[str, LatencyWindow] = field(default_factory=dict, init=False)
+    _stats: dict[str, HedgeStats] = field(default_factory=dict, init=False)
+    _budget: float = field(default=0.0, init=False)
+
+    def __post_init__(self) -> None:
+        if not 0 < self.percentile < 100:
+            raise ValueError("percentile must be between 0 and 100")
+
+    def delay(self, operation: str) -> float | None:
+        """Seconds after which a request of the operation is hedged, None until
+        enough latencies are known."""
+        window = self._windows.get(operation)
+        if window is None or len(window.samples) < self.min_samples:
+            return None
+        return max(self.min_delay_s, window.percentile(self.percentile))
+
+    def record(self, operation: str, seconds: float) -> None:
+        window = self._windows.get(operation)
+        if window is None:
+            window = self._windows[operation] = LatencyWindow(self.window)
+        window.record(seconds)
+
+    def stats(self, operation: str) -> HedgeStats:
+        stats = self._stats.get(operation)
+        if stats is None:
+            stats = self._stats[operation] = HedgeStats()
+        return stats
+
+    def _try_spend(self) -> bool:
+        if self._budget < 1:
+            return False
+        self._budget -= 1
+        return True
+
+    async def run(self, operation: str, send: Callable[[bool], Awaitable[T]]) -> T:
+        """Calls send(False), and send(True) for the duplicate when hedged."""
+        stats = self.stats(operation)
+        stats.requests += 1
+        self._budget = min(self.budget_max, self._budget + self.max_ratio)
+        delay = self.delay(operation)
+        started = self.clock()
+        instrumentation = self.instrumentation
+        if instrumentation is not None:
+            instrumentation.increment("hedge_requests_total", operation=operation)
+            if delay is not None:
+                instrumentation.set_gauge(
+                    "hedge_delay_seconds", delay, operation=operation
+                )
+
+        primary = asyncio.ensure_future(send(False))
+        tasks = [primary]
+        try:
+            if delay is not None:
+                await asyncio.wait(tasks, timeout=delay)
+            if primary.done() or delay is None or not self._try_spend():
+                result = await primary
+                self.record(operation, self.clock() - started)
+                return result
+
+            stats.hedged += 1
+            if instrumentation is not None:
+                instrumentation.increment("hedged_total", operation=operation)
+            hedge = asyncio.ensure_future(send(True))
+            tasks.append(hedge)
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            stats.won += 1
+                            if instrumentation is not None:
+                                instrumentation.increment(
+                                    "hedge_won_total", operation=operation
+                                )
+                        self.record(operation, self.clock() - started)
+                        return task.result()
+            return await primary  # both failed, raise the error of the primary
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def snapshot(self) -> dict[str, dict[str, int | float | None]]:
+        return {
+            operation: {
+                "requests": stats.requests,
+                "hedged": stats.hedged,
+                "won": stats.won,
+                "delay_s": self.delay(operation),
+            }
+            for operation, stats in self._stats.items()
+        }
@@ -0,0 +1,109 @@
+import base64
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Iterator
+
+from azure_content_safety.protocols.i_content_safety import ImageSource
+
+CHUNK_SIZE = 3 * 64 * 1024
+"""Raw bytes encoded at a time; a multiple of 3 so that chunks encode on their own."""
+
+_PREFIX = b'{"image":{"content":"'
+
+
+def _encoded_length(size: int) -> int:
+    return 4 * ((size + 2) // 3)
+
+
+@dataclass
+class ImagePayload:
+    """JSON body of image:analyze for a raw image, base64-encoded chunk by chunk
+    while it is sent, so that no full base64 copy of the image is ever built.
+
+    Buffers and paths can be sent (and hashed) any number of times, seekable file
+    objects are rewound to their initial position, other file objects can only be
+    sent once (see replayable).
+    """
+
+    source: ImageSource
+    options: dict[str, Any] = field(default_factory=dict)
+    chunk_size: int = CHUNK_SIZE
+    size: int | None = field(default=None, init=False)
+    _start: int = field(default=0, init=False, repr=False)
+    _suffix: bytes = field(default=b"", init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        source = self.source
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            self.size = memoryview(source).nbytes
+        elif isinstance(source, os.PathLike):
+            self.size = os.path.getsize(source)
+        elif source.seekable():
+            self._start = source.tell()
+            self.size = source.seek(0, os.SEEK_END) - self._start
+            source.seek(self._start)
+
+        options = json.dumps(self.options, separators=(",", ":"), ensure_ascii=False)
+        self._suffix = b'"}' + (b"," + options[1:-1].encode() if self.options else b"")
+        self._suffix += b"}"
+
+    @property
+    def replayable(self) -> bool:
+        return self.size is not None
+
+    @property
+    def shareable(self) -> bool:
+        """Whether the payload can be sent by concurrent requests, e.g. hedged ones:
+        buffers and paths are read anew by each send, a file object is shared."""
+        return isinstance(self.source, (bytes, bytearray, memoryview, os.PathLike))
+
+    @property
+    def content_length(self) -> int | None:
+        if self.size is None:
+            return None
+        return len(_PREFIX) + _encoded_length(self.size) + len(self._suffix)
+
+    def raw_chunks(self) -> Iterator[bytes | memoryview]:
+        source = self.source
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            view = memoryview(source).cast("B")
+            for i in range(0, len(view), self.chunk_size):
+                yield view[i : i + self.chunk_size]
+        elif isinstance(source, os.PathLike):
+            with open(source, "rb") as f:
+                while chunk := f.read(self.chunk_size):
+                    yield chunk
+        else:
+            if self.replayable:
+                source.seek(self._start)
+            while chunk := source.read(self.chunk_size):
+                yield chunk
+
+    def chunks(self) -> Iterator[bytes]:
+        yield _PREFIX
+        carry = b""
+        for chunk in self.raw_chunks():
+            data = carry + chunk if carry else chunk
+            cut = len(data) - len(data) % 3
+            if cut:
+                yield base64.b64encode(data[:cut])
+            carry = bytes(data[cut:])
+        if carry:
+            yield base64.b64encode(carry)
+        yield self._suffix
+
+    async def stream(self) -> AsyncIterator[bytes]:
+        for chunk in self.chunks():
+            yield chunk
+
+    def digest(self) -> str:
+        """SHA-256 of the raw image; requires a replayable source."""
+        if not self.replayable:
+            raise ValueError("cannot hash an image that can only be read once")
+
+        digest = hashlib.sha256()
+        for chunk in self.raw_chunks():
+            digest.update(chunk)
+        return digest.hexdigest()
@@ -0,0 +1,172 @@
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, AsyncGenerator, AsyncIterable, Iterable
+
+from azure_content_safety.protocols.i_content_safety import ImageSource
+from azure_content_safety.services.batching import aiterate
+from azure_content_safety.services.image_payload import ImagePayload
+from azure_content_safety.services.response_cache import make_cache_key
+
+
+@dataclass(frozen=True)
+class PreparedImage:
+    """Ready-to-send JSON body of image:analyze and its cache key."""
+
+    body: bytes
+    cache_key: str
+    resized: bool = False
+
+
+def resize_image(data: bytes, max_side: int) -> bytes | None:
+    """Scales the image down so that its longest side is at most max_side, keeping
+    its format; None when it is already small enough. Requires Pillow."""
+    try:
+        from PIL import Image  # type: ignore[import-not-found]
+    except ImportError as e:  # pragma: no cover - depends on the environment
+        raise ImportError("resizing images requires Pillow: pip install pillow") from e
+
+    with Image.open(io.BytesIO(data)) as image:
+        if max(image.size) <= max_side:
+            return None
+        image_format = image.format or "PNG"
+        image.thumbnail((max_side, max_side))
+        output = io.BytesIO()
+        image.save(output, format=image_format)
+        return output.getvalue()
+
+
+def prepare_image(
+    image: str | bytes | os.PathLike, options: dict[str, Any], max_side: int | None
+) -> PreparedImage:
+    """Builds the body and cache key of one image; runs in a worker process.
+
+    The cache keys are those of image_moderation, so prepared and direct calls
+    share cache entries: base64 strings are keyed by their content, raw images by
+    the SHA-256 of the bytes that are sent.
+    """
+    data: bytes | None = None
+    if isinstance(image, os.PathLike):
+        with open(image, "rb") as f:
+            data = f.read()
+    elif not isinstance(image, str):
+        data = bytes(image)
+
+    resized = None
+    if max_side is not None:
+        resized = resize_image(
+            base64.b64decode(image) if isinstance(image, str) else data,  # type: ignore[arg-type]
+            max_side,
+        )
+
+    if resized is None and isinstance(image, str):
+        input = {"image": {"content": image}, **options}
+        body = json.dumps(input, separators=(",", ":"), ensure_ascii=False).encode()
+        return PreparedImage(body, make_cache_key("image_moderation", input))
+
+    raw = resized if resized is not None else data
+    assert raw is not None
+    digest = hashlib.sha256(raw).hexdigest()
+    return PreparedImage(
+        body=b"".join(ImagePayload(raw, options).chunks()),
+        cache_key=make_cache_key(
+            "image_moderation", {**options, "image": {"sha256": digest}}
+        ),
+        resized=resized is not None,
+    )
+
+
+@dataclass
+class ImagePreprocessor:
+    """Prepares the images of a batch in a process pool, off the event loop.
+
+    Decoding and resizing (with max_side, requires Pillow), hashing, base64 and
+    JSON encoding are CPU bound and would otherwise run on the event loop, capping
+    a batch at one core. prepare_many submits the images to the pool as they are
+    read and hands the payloads to the sender in input order through a queue of
+    queue_size entries: when the sender falls behind, no more images are read.
+
+        preprocessor = ImagePreprocessor(max_side=2048)
+        async for item in content_safety.image_moderation_many(
+            paths, preprocessor=preprocessor
+        ):
+            ...
+        preprocessor.close()
+    """
+
+    max_workers: int | None = None
+    max_side: int | None = None
+    queue_size: int = 16
+    executor: Executor | None = None
+    """Defaults to a ProcessPoolExecutor (spawn) created on first use."""
+    _owned: bool = field(default=False, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.queue_size < 1:
+            raise ValueError("queue_size must be at least 1")
+
+    def get_executor(self) -> Executor:
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            self._owned = True
+        return self.executor
+
+    def close(self) -> None:
+        if self._owned and self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+            self._owned = False
+
+    async def prepare(
+        self, image: str | ImageSource, options: dict[str, Any]
+    ) -> PreparedImage:
+        if not isinstance(image, (str, bytes, os.PathLike)):
+            if isinstance(image, (bytearray, memoryview)):
+                image = bytes(image)
+            else:
+                # file objects cannot be sent to another process
+                image = await asyncio.to_thread(image.read)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.get_executor(), prepare_image, image, options, self.max_side
+        )
+
+    async def prepare_many(
+        self,
+        images: Iterable[str | ImageSource] | AsyncIterable[str | ImageSource],
+        options: dict[str, Any],
+    ) -> AsyncGenerator[PreparedImage | Exception, None]:
+        """Yields the prepared images, or the error of an image, in input order."""
+        queue: asyncio.Queue[asyncio.Future[PreparedImage] | None] = asyncio.Queue(
+            self.queue_size
+        )
+
+        async def produce() -> None:
+            try:
+                async for image in aiterate(images):
+                    await queue.put(asyncio.ensure_future(self.prepare(image, options)))
+            finally:
+                await queue.put(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while (future := await queue.get()) is not None:
+                try:
+                    yield await future
+                except Exception as e:
+                    yield e
+            await producer  # raises the error of the input iterable, if any
+        finally:
+            producer.cancel()
+            while not queue.empty():
+                if (future := queue.get_nowait()) is not None:
+                    future.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
@@ -0,0 +1,291 @@
+import bisect
+import functools
+import math
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from types import CoroutineType, SimpleNamespace
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Concatenate,
+    Iterator,
+    ParamSpec,
+    Protocol,
+    Sequence,
+    TypeVar,
+)
+
+from azure_content_safety.protocols.i_instrumentation import (
+    IInstrumentation,
+    RequestTimings,
+)
+
+if TYPE_CHECKING:
+    import aiohttp
+
+T = TypeVar("T")
+
+LATENCY_SMOOTHING = 0.2
+"""Weight of the latest sample in the moving averages of the latency kept by the
+endpoint pool and the adaptive concurrency limiter."""
+
+
+def percentile_rank(q: float, count: int) -> int:
+    """Nearest rank (1-based) of the q-th percentile, q in [0, 100], among count
+    ordered values."""
+    return min(count, max(1, math.ceil(q * count / 100)))
+
+
+def nearest_rank(ordered: Sequence[float], q: float) -> float:
+    """Nearest-rank q-th percentile of values sorted in ascending order, 0 when
+    there are none."""
+    if not ordered:
+        return 0.0
+    return ordered[percentile_rank(q, len(ordered)) - 1]
+
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _exponential_buckets(start: float, factor: float, count: int) -> list[float]:
+    return [start * factor**i for i in range(count)]
+
+
+DEFAULT_BUCKETS = _exponential_buckets(0.0001, 2, 20)
+"""Upper bounds from 100µs to ~52s, suitable for latencies in seconds."""
+
+BYTES_BUCKETS = _exponential_buckets(64, 4, 12)
+"""Upper bounds from 64B to ~268MB."""
+
+
+@dataclass(slots=True)
+class Histogram:
+    buckets: list[float] = field(default_factory=lambda: DEFAULT_BUCKETS)
+    counts: list[int] = field(init=False)
+    count: int = 0
+    sum: float = 0.0
+    min: float = math.inf
+    max: float = -math.inf
+
+    def __post_init__(self) -> None:
+        self.counts = [0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def percentile(self, q: float) -> float:
+        """Estimates the q-th percentile as the upper bound of the bucket of its
+        nearest rank, clamped to the observed maximum."""
+        if self.count == 0:
+            return 0.0
+
+        rank = percentile_rank(q, self.count)
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                bound = self.buckets[i] if i < len(self.buckets) else self.max
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else 0.0,
+            "max": self.max if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+        }
+
+
+@dataclass
+class MetricsRegistry:
+    """In-process registry of counters, gauges and histograms, identified by a
+    name and labels."""
+
+    histograms: dict[tuple[str, Labels], Histogram] = field(default_factory=dict)
+    counters: dict[tuple[str, Labels], float] = field(default_factory=dict)
+    gauges: dict[tuple[str, Labels], float] = field(default_factory=dict)
+
+    def histogram(
+        self, name: str, buckets: list[float] | None = None, **labels: str
+    ) -> Histogram:
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(buckets or DEFAULT_BUCKETS)
+        return histogram
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        self.histogram(name, None, **labels).observe(value)
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def counter(self, name: str, **labels: str) -> float:
+        return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def gauge(self, name: str, **labels: str) -> float | None:
+        return self.gauges.get((name, tuple(sorted(labels.items()))))
+
+    def snapshot(self) -> dict[str, list[dict[str, Any]]]:
+        result: dict[str, list[dict[str, Any]]] = {}
+        for (name, labels), value in self.counters.items():
+            result.setdefault(name, []).append({"labels": dict(labels), "value": value})
+        for (name, labels), value in self.gauges.items():
+            result.setdefault(name, []).append({"labels": dict(labels), "value": value})
+        for (name, labels), histogram in self.histograms.items():
+            result.setdefault(name, []).append(
+                {"labels": dict(labels), **histogram.snapshot()}
+            )
+        return result
+
+
+@dataclass
+class Instrumentation(IInstrumentation):
+    """Records request timings into a MetricsRegistry and reports the calls of the
+    public methods to optional tracing callbacks: on_span_start(operation) returns
+    a span handle that is passed to on_span_end(span, seconds, error)."""
+
+    registry: MetricsRegistry = field(default_factory=MetricsRegistry)
+    on_span_start: Callable[[str], Any] | None = None
+    on_span_end: Callable[[Any, float, BaseException | None], None] | None = None
+
+    def record_request(self, timings: RequestTimings) -> None:
+        registry = self.registry
+        operation = timings.operation
+        registry.increment(
+            "requests_total", operation=operation, status=str(timings.status)
+        )
+        if timings.attempt:
+            registry.increment("retries_total", operation=operation)
+        registry.observe(
+            "queue_wait_seconds", timings.queue_wait_s, operation=operation
+        )
+        registry.observe(
+            "connection_acquire_seconds",
+            timings.connection_acquire_s,
+            operation=operation,
+        )
+        registry.observe("ttfb_seconds", timings.ttfb_s, operation=operation)
+        registry.observe("body_read_seconds", timings.body_read_s, operation=operation)
+        registry.histogram("request_bytes", BYTES_BUCKETS, operation=operation).observe(
+            timings.request_bytes
+        )
+        registry.histogram(
+            "response_bytes", BYTES_BUCKETS, operation=operation
+        ).observe(timings.response_bytes)
+
+    def record_validation(self, operation: str, seconds: float) -> None:
+        self.registry.observe("validation_seconds", seconds, operation=operation)
+
+    def increment(self, name: str, value: float = 1, **labels: str) -> None:
+        self.registry.increment(name, value, **labels)
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        self.registry.set_gauge(name, value, **labels)
+
+    @contextmanager
+    def span(self, operation: str) -> Iterator[None]:
+        handle = self.on_span_start(operation) if self.on_span_start else None
+        error: BaseException | None = None
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            seconds = time.perf_counter() - started
+            self.registry.observe("call_seconds", seconds, operation=operation)
+            if error is not None:
+                self.registry.increment(
+                    "call_errors_total", operation=operation, error=type(error).__name__
+                )
+            if self.on_span_end is not None:
+                self.on_span_end(handle, seconds, error)
+
+
+class _Instrumented(Protocol):
+    @property
+    def instrumentation(self) -> IInstrumentation | None: ...
+
+
+S = TypeVar("S", bound=_Instrumented)
+P = ParamSpec("P")
+
+
+# types.CoroutineType is not subscriptable at runtime, hence the quotes
+def instrumented(
+    operation: str,
+) -> Callable[
+    [Callable[Concatenate[S, P], Awaitable[T]]],
+    Callable[Concatenate[S, P], "CoroutineType[Any, Any, T]"],
+]:
+    """Wraps a public method of a client with an instrumentation attribute in a
+    span; a single attribute check when instrumentation is disabled."""
+
+    def decorate(
+        fn: Callable[Concatenate[S, P], Awaitable[T]],
+    ) -> Callable[Concatenate[S, P], "CoroutineType[Any, Any, T]"]:
+        @functools.wraps(fn)
+        async def wrapper(self: S, *args: P.args, **kwargs: P.kwargs) -> T:
+            if self.instrumentation is None:
+                return await fn(self, *args, **kwargs)
+            with self.instrumentation.span(operation):
+                return await fn(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def trace_config() -> "aiohttp.TraceConfig":
+    """aiohttp tracing hooks filling the connection and time to first byte fields
+    of the RequestTimings passed as trace_request_ctx of a request."""
+    import aiohttp
+
+    def timings_of(context: SimpleNamespace) -> RequestTimings | None:
+        timings = context.trace_request_ctx
+        return timings if isinstance(timings, RequestTimings) else None
+
+    async def on_request_start(
+        session: "aiohttp.ClientSession", context: SimpleNamespace, params: Any
+    ) -> None:
+        if timings := timings_of(context):
+            timings.request_start = time.perf_counter()
+
+    async def on_connection_ready(
+        session: "aiohttp.ClientSession", context: SimpleNamespace, params: Any
+    ) -> None:
+        if timings := timings_of(context):
+            timings.connection_ready = time.perf_counter()
+            timings.connection_acquire_s = (
+                timings.connection_ready - timings.request_start
+            )
+
+    async def on_request_end(
+        session: "aiohttp.ClientSession", context: SimpleNamespace, params: Any
+    ) -> None:
+        if timings := timings_of(context):
+            timings.ttfb_s = time.perf_counter() - timings.request_start
+
+    config = aiohttp.TraceConfig()
+    config.on_request_start.append(on_request_start)
+    config.on_connection_create_end.append(on_connection_ready)
+    config.on_connection_reuseconn.append(on_connection_ready)
+    config.on_request_end.append(on_request_end)
+    return config
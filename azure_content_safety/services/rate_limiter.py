@@ -0,0 +1,52 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+
+@dataclass
+class TokenBucket:
+    """Token bucket shared by all the calls of a client: tokens refill at rate per
+    second up to capacity, and every request takes one. A request reserves its
+    token on arrival, going into debt when none is left, and sleeps until the debt
+    up to its token is repaid, so waiters are served in FIFO order without a lock
+    bound to an event loop."""
+
+    rate: float
+    capacity: float
+    clock: Callable[[], float] = time.monotonic
+    _tokens: float = field(init=False)
+    _updated: float = field(init=False)
+
+    def __post_init__(self) -> None:
+        if self.rate <= 0:
+            raise ValueError("rate must be positive")
+        if self.capacity < 1:
+            raise ValueError("capacity must be at least 1")
+
+        self._tokens = self.capacity
+        self._updated = self.clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    async def acquire(self) -> float:
+        """Takes a token, waiting for one to be available.
+
+        :return: The number of seconds waited.
+        """
+        self._refill()
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0.0
+
+        waited = -self._tokens / self.rate
+        try:
+            await asyncio.sleep(waited)
+        except asyncio.CancelledError:
+            self._tokens += 1  # hand the reservation back
+            raise
+        return waited
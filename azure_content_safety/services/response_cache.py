@@ -0,0 +1,124 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, NamedTuple
+
+from azure_content_safety.protocols.i_response_cache import IResponseCache
+
+UNORDERED_FIELDS = frozenset({"categories", "blocklistNames"})
+"""Payload fields whose lists are sets: their order and duplicates do not change
+the result, so they are sorted in the key."""
+
+
+def make_cache_key(fn_name: str, payload: dict) -> str:
+    """Content address of a request: a hash of the operation and of its canonical
+    JSON payload, so every option that changes the result is part of the key and
+    equivalent requests share it."""
+    payload = {
+        key: sorted(set(value))
+        if key in UNORDERED_FIELDS and isinstance(value, list)
+        else value
+        for key, value in payload.items()
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    digest = hashlib.sha256(fn_name.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(canonical.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def blocklist_tag(blocklist_name: str) -> str:
+    return f"blocklist:{blocklist_name}"
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+
+
+class _Entry(NamedTuple):
+    expires_at: float
+    value: bytes
+    tags: tuple[str, ...]
+
+
+@dataclass
+class ResponseCache(IResponseCache):
+    """In-memory LRU cache whose entries also expire after ttl seconds."""
+
+    max_entries: int = 1024
+    ttl: float = 300.0
+    clock: Callable[[], float] = time.monotonic
+    hits: int = field(default=0, init=False)
+    misses: int = field(default=0, init=False)
+    evictions: int = field(default=0, init=False)
+    _entries: OrderedDict[str, _Entry] = field(
+        default_factory=OrderedDict, init=False, repr=False
+    )
+    _tags: dict[str, set[str]] = field(default_factory=dict, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+
+    def get(self, key: str) -> bytes | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        if entry.expires_at <= self.clock():
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def set(self, key: str, value: bytes, tags: Iterable[str] = ()) -> None:
+        if key in self._entries:
+            self._remove(key)
+
+        entry = _Entry(self.clock() + self.ttl, value, tuple(tags))
+        self._entries[key] = entry
+        for tag in entry.tags:
+            self._tags.setdefault(tag, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, tag: str) -> int:
+        keys = self._tags.pop(tag, set())
+        for key in keys:
+            self._remove(key)
+        return len(keys)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._tags.clear()
+
+    def stats(self) -> CacheStats:
+        return CacheStats(self.hits, self.misses, self.evictions, len(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+
+        for tag in entry.tags:
+            keys = self._tags.get(tag)
+            if keys is None:
+                continue
+            keys.discard(key)
+            if not keys:
+                del self._tags[tag]
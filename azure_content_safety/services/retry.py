@@ -0,0 +1,94 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Callable
+
+from azure_content_safety.errors import ContentSafetyHttpError
+
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+def is_transport_error(error: BaseException) -> bool:
+    """Whether the request failed before the endpoint answered (connection reset,
+    DNS failure, timeout), as opposed to an error of the caller."""
+    if isinstance(error, (OSError, asyncio.TimeoutError)):
+        return True
+
+    import aiohttp
+
+    return isinstance(error, aiohttp.ClientConnectionError)
+
+
+def is_service_failure(error: BaseException) -> bool:
+    """Whether an error means that the service is unavailable or overloaded: a
+    retryable status or a transport error. Errors of the caller (4xx) are not."""
+    if isinstance(error, ContentSafetyHttpError):
+        return error.status in RETRYABLE_STATUSES
+    return isinstance(error, Exception) and is_transport_error(error)
+
+
+def parse_retry_after(value: str | None, now: float | None = None) -> float | None:
+    """Parses a Retry-After header, either delay-seconds or an HTTP date."""
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at - (time.time() if now is None else now))
+
+
+@dataclass
+class RetryPolicy:
+    """Exponential backoff with full jitter, bounded by a retry budget per operation.
+
+    Every request of an operation deposits budget_ratio tokens into the budget of the
+    operation (up to budget_max) and every retry withdraws one, so that retries are
+    at most about budget_ratio of the traffic and cannot amplify an outage.
+    """
+
+    max_retries: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 30.0
+    budget_ratio: float = 0.2
+    budget_max: float = 10.0
+    random: Callable[[], float] = random.random
+    _budgets: dict[str, float] = field(default_factory=dict, init=False, repr=False)
+
+    def is_retryable(self, status: int) -> bool:
+        return status in RETRYABLE_STATUSES
+
+    def record_request(self, fn_name: str) -> None:
+        budget = self._budgets.get(fn_name, self.budget_max)
+        self._budgets[fn_name] = min(self.budget_max, budget + self.budget_ratio)
+
+    def budget(self, fn_name: str) -> float:
+        return self._budgets.get(fn_name, self.budget_max)
+
+    def try_acquire_retry(self, fn_name: str, attempt: int) -> bool:
+        """Returns True when a retry after the given (0-based) attempt is allowed,
+        withdrawing it from the budget of the operation."""
+        if attempt >= self.max_retries:
+            return False
+
+        budget = self.budget(fn_name)
+        if budget < 1:
+            return False
+
+        self._budgets[fn_name] = budget - 1
+        return True
+
+    def backoff(self, attempt: int, retry_after: str | None = None) -> float:
+        delay = parse_retry_after(retry_after)
+        if delay is not None:
+            return min(delay, self.backoff_max)
+
+        return self.random() * min(self.backoff_max, self.backoff_base * 2**attempt)
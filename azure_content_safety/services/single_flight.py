@@ -0,0 +1,58 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class _Call:
+    future: asyncio.Future
+    waiters: int = 0
+
+
+@dataclass
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one in-flight call whose
+    result, or exception, is shared by all callers.
+
+    The call runs in its own task, so a caller that is cancelled does not cancel
+    the call for the other callers; the call is cancelled with its last caller.
+    """
+
+    coalesced: int = 0
+    _calls: dict[str, _Call] = field(default_factory=dict, init=False, repr=False)
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        call = self._calls.get(key)
+        if call is not None:
+            self.coalesced += 1
+        else:
+            call = self._calls[key] = _Call(asyncio.ensure_future(fn()))
+            call.future.add_done_callback(lambda done: self._done(key, done))
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.future)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.future.done():
+                # nobody waits for the result anymore
+                self._forget(key, call.future)
+                call.future.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _forget(self, key: str, future: asyncio.Future) -> None:
+        call = self._calls.get(key)
+        if call is not None and call.future is future:
+            del self._calls[key]
+
+    def _done(self, key: str, future: asyncio.Future) -> None:
+        self._forget(key, future)
+        if not future.cancelled():
+            # mark the exception as retrieved when every caller went away
+            future.exception()
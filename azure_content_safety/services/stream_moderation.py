@@ -0,0 +1,104 @@
+import asyncio
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable
+
+from azure_content_safety.models import StreamVerdict, TextModerationResponse
+
+
+def is_blocking(response: TextModerationResponse, severity_threshold: int) -> bool:
+    return bool(response.blocklistsMatch) or any(
+        item.severity >= severity_threshold for item in response.categoriesAnalysis
+    )
+
+
+async def moderate_stream(
+    moderate: Callable[[str], Awaitable[TextModerationResponse]],
+    deltas: AsyncIterable[str],
+    severity_threshold: int,
+    window_length: int,
+    min_new_length: int,
+    context_length: int,
+    max_in_flight: int = 2,
+) -> AsyncIterator[StreamVerdict]:
+    """Moderates a streamed text incrementally.
+
+    Whenever min_new_length characters arrived, the new text, prefixed with the
+    last context_length characters already moderated, is sent as one window of at
+    most window_length characters. While max_in_flight windows are being moderated
+    new text keeps accumulating into the next window, so a fast stream is not
+    stalled and is sent in fewer, larger requests. Verdicts are yielded in window
+    order; on the first blocking verdict the upstream iterator is closed and no
+    further windows are sent.
+    """
+    if not 0 <= context_length < window_length:
+        raise ValueError("context_length must be between 0 and window_length")
+    if not 0 < min_new_length <= window_length - context_length:
+        raise ValueError("min_new_length must be between 1 and the new text per window")
+
+    windows: asyncio.Queue[asyncio.Task[StreamVerdict] | None] = asyncio.Queue()
+    slots = asyncio.Semaphore(max_in_flight)
+    max_new = window_length - context_length
+
+    async def check(start: int, text: str) -> StreamVerdict:
+        try:
+            response = await moderate(text)
+        finally:
+            slots.release()
+        return StreamVerdict(
+            start=start,
+            end=start + len(text),
+            response=response,
+            blocked=is_blocking(response, severity_threshold),
+        )
+
+    context = ""
+    new: list[str] = []
+    new_length = 0
+    offset = 0  # offset of the first new character in the text
+
+    async def send(length: int) -> None:
+        nonlocal context, new, new_length, offset
+        await slots.acquire()
+        pending = "".join(new)
+        sent, rest = pending[:length], pending[length:]
+        window = context + sent
+        windows.put_nowait(asyncio.create_task(check(offset - len(context), window)))
+        context = window[len(window) - context_length :] if context_length else ""
+        offset += len(sent)
+        new, new_length = ([rest], len(rest)) if rest else ([], 0)
+
+    async def pump() -> None:
+        nonlocal new_length
+        try:
+            async for delta in deltas:
+                new.append(delta)
+                new_length += len(delta)
+                while new_length >= max_new:
+                    await send(max_new)
+                if new_length >= min_new_length and not slots.locked():
+                    await send(new_length)
+            while new_length:
+                await send(min(new_length, max_new))
+        finally:
+            windows.put_nowait(None)
+
+    pumping = asyncio.create_task(pump())
+    blocked = False
+    try:
+        while (window := await windows.get()) is not None:
+            verdict = await window
+            yield verdict
+            if verdict.blocked:
+                blocked = True
+                return
+        await pumping
+    finally:
+        pumping.cancel()
+        while not windows.empty():
+            window = windows.get_nowait()
+            if window is not None:
+                window.cancel()
+        await asyncio.gather(pumping, return_exceptions=True)
+        if blocked:
+            aclose = getattr(deltas, "aclose", None)
+            if aclose is not None:
+                await aclose()
@@ -0,0 +1,634 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Coroutine,
+    Iterable,
+    Iterator,
+    Literal,
+    Mapping,
+    ParamSpec,
+    TypeVar,
+    cast,
+)
+
+from azure_content_safety.models import (
+    BatchItem,
+    BlocklistSyncResult,
+    DetectGroundednessResponse,
+    DetectProtectedMaterialCodeResponse,
+    DetectProtectedMaterialResponse,
+    GuardrailVerdict,
+    ImageModerationResponse,
+    PromptShieldResponse,
+    StreamVerdict,
+    TextBlocklist,
+    TextBlocklistItem,
+    TextModerationResponse,
+)
+from azure_content_safety.protocols.i_content_safety import (
+    BlocklistItemInput,
+    GuardrailCheck,
+    IContentSafety,
+    ImageSource,
+    QnAQuery,
+)
+from azure_content_safety.services.grounding_shards import GROUNDING_SOURCES_LIMIT
+from azure_content_safety.services.image_preprocessing import ImagePreprocessor
+from azure_content_safety.services.text_chunking import TEXT_MODERATION_CHARACTER_LIMIT
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+_END = object()
+
+
+@dataclass
+class SyncContentSafety:
+    """Thread-safe blocking client for sync code (Celery tasks, thread pools).
+
+    All calls run on one background event loop thread, started on first use, so
+    that the requests of every worker thread share the session and connection pool
+    of content_safety. The wrapped instance must not be used from another event
+    loop at the same time, nor wrapped by a second SyncContentSafety: the container
+    registers one as a singleton. Every method has a *_future variant that returns
+    a concurrent.futures.Future instead of blocking.
+
+        client = container[SyncContentSafety]
+        result = client.text_moderation("text")
+        future = client.prompt_shield_future(prompt, [])
+        client.close()
+    """
+
+    content_safety: IContentSafety
+    _loop: asyncio.AbstractEventLoop | None = field(
+        default=None, init=False, repr=False
+    )
+    _thread: threading.Thread | None = field(default=None, init=False, repr=False)
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False
+    )
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(
+                    target=_run_loop,
+                    args=(loop,),
+                    name="content-safety-loop",
+                    daemon=True,
+                )
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    def submit(
+        self,
+        fn: Callable[P, Coroutine[Any, Any, T]],
+        /,
+        *args: P.args,
+        **kwargs: P.kwargs,
+    ) -> Future[T]:
+        """Schedules fn(*args, **kwargs), an async method of content_safety, on the
+        background loop and returns its concurrent.futures.Future."""
+        loop = self.loop
+        if threading.current_thread() is self._thread:
+            raise RuntimeError(
+                "blocking call from the event loop thread would deadlock"
+            )
+        return asyncio.run_coroutine_threadsafe(fn(*args, **kwargs), loop)
+
+    def run(
+        self,
+        fn: Callable[P, Coroutine[Any, Any, T]],
+        /,
+        *args: P.args,
+        **kwargs: P.kwargs,
+    ) -> T:
+        return self.submit(fn, *args, **kwargs).result()
+
+    def iterate(self, iterator: AsyncIterator[T]) -> Iterator[T]:
+        """Iterates an async iterator of content_safety (e.g. of text_moderation_many)
+        from the calling thread, one item per round trip to the background loop.
+        Closing the returned iterator closes the async one."""
+
+        async def next_item() -> Any:
+            return await anext(iterator, _END)
+
+        async def aclose() -> None:
+            close = getattr(iterator, "aclose", None)
+            if close is not None:
+                await close()
+
+        try:
+            while (item := self.run(next_item)) is not _END:
+                yield item
+        finally:
+            if self._loop is not None:
+                self.run(aclose)
+
+    def start(self) -> None:
+        self.run(self.content_safety.start)
+
+    def close(self) -> None:
+        """Closes content_safety and stops the background loop thread. The client
+        can be used again afterwards, it then starts a new loop."""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None or thread is None:
+            return
+
+        try:
+            asyncio.run_coroutine_threadsafe(self.content_safety.close(), loop).result()
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+
+    def __enter__(self) -> "SyncContentSafety":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def prompt_shield(
+        self, user_prompt: str, documents: list[str]
+    ) -> PromptShieldResponse:
+        return self.prompt_shield_future(user_prompt, documents).result()
+
+    def prompt_shield_future(
+        self, user_prompt: str, documents: list[str]
+    ) -> Future[PromptShieldResponse]:
+        return self.submit(self.content_safety.prompt_shield, user_prompt, documents)
+
+    def detect_groundedness(
+        self,
+        text: str,
+        groundingSources: list[str],
+        reasoning: bool = False,
+        domain: Literal["Medical", "Generic"] = "Generic",
+        task: Literal["QnA", "Summarization"] = "Summarization",
+        qna: QnAQuery | None = None,
+    ) -> DetectGroundednessResponse:
+        return self.detect_groundedness_future(
+            text, groundingSources, reasoning, domain, task, qna
+        ).result()
+
+    def detect_groundedness_future(
+        self,
+        text: str,
+        groundingSources: list[str],
+        reasoning: bool = False,
+        domain: Literal["Medical", "Generic"] = "Generic",
+        task: Literal["QnA", "Summarization"] = "Summarization",
+        qna: QnAQuery | None = None,
+    ) -> Future[DetectGroundednessResponse]:
+        return self.submit(
+            self.content_safety.detect_groundedness,
+            text=text,
+            groundingSources=groundingSources,
+            reasoning=reasoning,
+            domain=domain,
+            task=task,
+            qna=qna,
+        )
+
+    def detect_groundedness_sharded(
+        self,
+        text: str,
+        groundingSources: list[str],
+        reasoning: bool = False,
+        domain: Literal["Medical", "Generic"] = "Generic",
+        task: Literal["QnA", "Summarization"] = "Summarization",
+        qna: QnAQuery | None = None,
+        max_sources_length: int = GROUNDING_SOURCES_LIMIT,
+        max_concurrency: int | None = None,
+    ) -> DetectGroundednessResponse:
+        return self.detect_groundedness_sharded_future(
+            text,
+            groundingSources,
+            reasoning,
+            domain,
+            task,
+            qna,
+            max_sources_length,
+            max_concurrency,
+        ).result()
+
+    def detect_groundedness_sharded_future(
+        self,
+        text: str,
+        groundingSources: list[str],
+        reasoning: bool = False,
+        domain: Literal["Medical", "Generic"] = "Generic",
+        task: Literal["QnA", "Summarization"] = "Summarization",
+        qna: QnAQuery | None = None,
+        max_sources_length: int = GROUNDING_SOURCES_LIMIT,
+        max_concurrency: int | None = None,
+    ) -> Future[DetectGroundednessResponse]:
+        return self.submit(
+            self.content_safety.detect_groundedness_sharded,
+            text=text,
+            groundingSources=groundingSources,
+            reasoning=reasoning,
+            domain=domain,
+            task=task,
+            qna=qna,
+            max_sources_length=max_sources_length,
+            max_concurrency=max_concurrency,
+        )
+
+    def detect_protected_materials(self, text: str) -> DetectProtectedMaterialResponse:
+        return self.detect_protected_materials_future(text).result()
+
+    def detect_protected_materials_future(
+        self, text: str
+    ) -> Future[DetectProtectedMaterialResponse]:
+        return self.submit(self.content_safety.detect_protected_materials, text)
+
+    def detect_protected_material_for_code(
+        self, code: str
+    ) -> DetectProtectedMaterialCodeResponse:
+        return self.detect_protected_material_for_code_future(code).result()
+
+    def detect_protected_material_for_code_future(
+        self, code: str
+    ) -> Future[DetectProtectedMaterialCodeResponse]:
+        return self.submit(self.content_safety.detect_protected_material_for_code, code)
+
+    def text_moderation(
+        self,
+        text: str,
+        categories: list[str] | None = None,
+        blocklist_names: list[str] | None = None,
+        halt_on_blocklist_hit: bool = True,
+        output_type: Literal[
+            "FourSeverityLevels", "EightSeverityLevels"
+        ] = "FourSeverityLevels",
+    ) -> TextModerationResponse:
+        return self.text_moderation_future(
+            text, categories, blocklist_names, halt_on_blocklist_hit, output_type
+        ).result()
+
+    def text_moderation_future(
+        self,
+        text: str,
+        categories: list[str] | None = None,
+        blocklist_names: list[str] | None = None,
+        halt_on_blocklist_hit: bool = True,
+        output_type: Literal[
+            "FourSeverityLevels", "EightSeverityLevels"
+        ] = "FourSeverityLevels",
+    ) -> Future[TextModerationResponse]:
+        return self.submit(
+            self.content_safety.text_moderation,
+            text=text,
+            categories=categories,
+            blocklist_names=blocklist_names,
+            halt_on_blocklist_hit=halt_on_blocklist_hit,
+            output_type=output_type,
+        )
+
+    def text_moderation_long(
+        self,
+        text: str,
+        categories: list[str] | None = None,
+        blocklist_names: list[str] | None = None,
+        halt_on_blocklist_hit: bool = True,
+        output_type: Literal[
+            "FourSeverityLevels", "EightSeverityLevels"
+        ] = "FourSeverityLevels",
+        chunk_length: int = TEXT_MODERATION_CHARACTER_LIMIT,
+        overlap: int = 0,
+        max_concurrency: int | None = None,
+    ) -> TextModerationResponse:
+        return self.text_moderation_long_future(
+            text,
+            categories,
+            blocklist_names,
+            halt_on_blocklist_hit,
+            output_type,
+            chunk_length,
+            overlap,
+            max_concurrency,
+        ).result()
+
+    def text_moderation_long_future(
+        self,
+        text: str,
+        categories: list[str] | None = None,
+        blocklist_names: list[str] | None = None,
+        halt_on_blocklist_hit: bool = True,
+        output_type: Literal[
+            "FourSeverityLevels", "EightSeverityLevels"
+        ] = "FourSeverityLevels",
+        chunk_length: int = TEXT_MODERATION_CHARACTER_LIMIT,
+        overlap: int = 0,
+        max_concurrency: int | None = None,
+    ) -> Future[TextModerationResponse]:
+        return self.submit(
+            self.content_safety.text_moderation_long,
+            text=text,
+            categories=categories,
+            blocklist_names=blocklist_names,
+            halt_on_blocklist_hit=halt_on_blocklist_hit,
+            output_type=output_type,
+            chunk_length=chunk_length,
+            overlap=overlap,
+            max_concurrency=max_concurrency,
+        )
+
+    def text_moderation_stream(
+        self,
+        deltas: Iterable[str],
+        categories: list[str] | None = None,
+        blocklist_names: list[str] | None = None,
+        halt_on_blocklist_hit: bool = True,
+        output_type: Literal[
+            "FourSeverityLevels", "EightSeverityLevels"
+        ] = "FourSeverityLevels",
+        severity_threshold: int = 4,
+        window_length: int = 2_000,
+        min_new_length: int = 400,
+        context_length: int = 100,
+    ) -> Iterator[StreamVerdict]:
+        """See IContentSafety.text_moderation_stream; deltas are pulled in a worker
+        thread so that a blocking upstream does not stall the event loop."""
+        return self.iterate(
+            self.content_safety.text_moderation_stream(
+                _pull_in_thread(deltas),
+                categories=categories,
+                blocklist_names=blocklist_names,
+                halt_on_blocklist_hit=halt_on_blocklist_hit,
+                output_type=output_type,
+                severity_threshold=severity_threshold,
+                window_length=window_length,
+                min_new_length=min_new_length,
+                context_length=context_length,
+            )
+        )
+
+    def image_moderation(
+        self,
+        image: str | ImageSource,
+        categories: list[str] | None = None,
+        output_type: Literal[
+            "FourSeverityLevels", "EightSeverityLevels"
+        ] = "FourSeverityLevels",
+    ) -> ImageModerationResponse:
+        return self.image_moderation_future(image, categories, output_type).result()
+
+    def image_moderation_future(
+        self,
+        image: str | ImageSource,
+        categories: list[str] | None = None,
+        output_type: Literal[
+            "FourSeverityLevels", "EightSeverityLevels"
+        ] = "FourSeverityLevels",
+    ) -> Future[ImageModerationResponse]:
+        return self.submit(
+            self.content_safety.image_moderation,
+            image=image,
+            categories=categories,
+            output_type=output_type,
+        )
+
+    def guardrails(
+        self,
+        text: str,
+        documents: list[str] | None = None,
+        checks: Iterable[GuardrailCheck] = (
+            "prompt_shield",
+            "text_moderation",
+            "detect_protected_materials",
+        ),
+        blocklist_names: list[str] | None = None,
+        policy: Callable[[str, Any], bool] | None = None,
+        extra_checks: Mapping[str, Callable[[], Coroutine[Any, Any, Any]]]
+        | None = None,
+    ) -> GuardrailVerdict:
+        return self.guardrails_future(
+            text, documents, checks, blocklist_names, policy, extra_checks
+        ).result()
+
+    def guardrails_future(
+        self,
+        text: str,
+        documents: list[str] | None = None,
+        checks: Iterable[GuardrailCheck] = (
+            "prompt_shield",
+            "text_moderation",
+            "detect_protected_materials",
+        ),
+        blocklist_names: list[str] | None = None,
+        policy: Callable[[str, Any], bool] | None = None,
+        extra_checks: Mapping[str, Callable[[], Coroutine[Any, Any, Any]]]
+        | None = None,
+    ) -> Future[GuardrailVerdict]:
+        return self.submit(
+            self.content_safety.guardrails,
+            text=text,
+            documents=documents,
+            checks=checks,
+            blocklist_names=blocklist_names,
+            policy=policy,
+            extra_checks=extra_checks,
+        )
+
+    def invalidate_blocklist(self, blocklist_name: str) -> int:
+        async def invalidate() -> int:
+            return self.content_safety.invalidate_blocklist(blocklist_name)
+
+        return self.run(invalidate)
+
+    def create_or_update_blocklist(
+        self, blocklist_name: str, description: str = ""
+    ) -> TextBlocklist:
+        return self.create_or_update_blocklist_future(
+            blocklist_name, description
+        ).result()
+
+    def create_or_update_blocklist_future(
+        self, blocklist_name: str, description: str = ""
+    ) -> Future[TextBlocklist]:
+        return self.submit(
+            self.content_safety.create_or_update_blocklist, blocklist_name, description
+        )
+
+    def list_blocklists(self) -> list[TextBlocklist]:
+        return self.list_blocklists_future().result()
+
+    def list_blocklists_future(self) -> Future[list[TextBlocklist]]:
+        return self.submit(self.content_safety.list_blocklists)
+
+    def delete_blocklist(self, blocklist_name: str) -> None:
+        return self.delete_blocklist_future(blocklist_name).result()
+
+    def delete_blocklist_future(self, blocklist_name: str) -> Future[None]:
+        return self.submit(self.content_safety.delete_blocklist, blocklist_name)
+
+    def list_blocklist_items(self, blocklist_name: str) -> list[TextBlocklistItem]:
+        return self.list_blocklist_items_future(blocklist_name).result()
+
+    def list_blocklist_items_future(
+        self, blocklist_name: str
+    ) -> Future[list[TextBlocklistItem]]:
+        return self.submit(self.content_safety.list_blocklist_items, blocklist_name)
+
+    def add_or_update_blocklist_items(
+        self,
+        blocklist_name: str,
+        items: Iterable[str | BlocklistItemInput],
+        max_concurrency: int | None = None,
+    ) -> list[TextBlocklistItem]:
+        return self.add_or_update_blocklist_items_future(
+            blocklist_name, items, max_concurrency
+        ).result()
+
+    def add_or_update_blocklist_items_future(
+        self,
+        blocklist_name: str,
+        items: Iterable[str | BlocklistItemInput],
+        max_concurrency: int | None = None,
+    ) -> Future[list[TextBlocklistItem]]:
+        return self.submit(
+            self.content_safety.add_or_update_blocklist_items,
+            blocklist_name,
+            items,
+            max_concurrency,
+        )
+
+    def remove_blocklist_items(
+        self,
+        blocklist_name: str,
+        item_ids: Iterable[str],
+        max_concurrency: int | None = None,
+    ) -> None:
+        return self.remove_blocklist_items_future(
+            blocklist_name, item_ids, max_concurrency
+        ).result()
+
+    def remove_blocklist_items_future(
+        self,
+        blocklist_name: str,
+        item_ids: Iterable[str],
+        max_concurrency: int | None = None,
+    ) -> Future[None]:
+        return self.submit(
+            self.content_safety.remove_blocklist_items,
+            blocklist_name,
+            item_ids,
+            max_concurrency,
+        )
+
+    def sync_blocklist(
+        self,
+        blocklist_name: str,
+        items: Iterable[str | BlocklistItemInput],
+        description: str | None = None,
+        max_concurrency: int | None = None,
+    ) -> BlocklistSyncResult:
+        return self.sync_blocklist_future(
+            blocklist_name, items, description, max_concurrency
+        ).result()
+
+    def sync_blocklist_future(
+        self,
+        blocklist_name: str,
+        items: Iterable[str | BlocklistItemInput],
+        description: str | None = None,
+        max_concurrency: int | None = None,
+    ) -> Future[BlocklistSyncResult]:
+        return self.submit(
+            self.content_safety.sync_blocklist,
+            blocklist_name,
+            items,
+            description,
+            max_concurrency,
+        )
+
+    def prompt_shield_many(
+        self,
+        items: Iterable[tuple[str, list[str]]],
+        max_concurrency: int | None = None,
+        ordered: bool = True,
+    ) -> Iterator[BatchItem[PromptShieldResponse]]:
+        """See IContentSafety.prompt_shield_many; items are pulled in a worker
+        thread so that a blocking upstream does not stall the event loop."""
+        return self.iterate(
+            self.content_safety.prompt_shield_many(
+                _pull_in_thread(items), max_concurrency, ordered
+            )
+        )
+
+    def text_moderation_many(
+        self,
+        texts: Iterable[str],
+        categories: list[str] | None = None,
+        blocklist_names: list[str] | None = None,
+        halt_on_blocklist_hit: bool = True,
+        output_type: Literal[
+            "FourSeverityLevels", "EightSeverityLevels"
+        ] = "FourSeverityLevels",
+        max_concurrency: int | None = None,
+        ordered: bool = True,
+    ) -> Iterator[BatchItem[TextModerationResponse]]:
+        """See IContentSafety.text_moderation_many; texts are pulled in a worker
+        thread, as in text_moderation_stream. For compact results use
+        iterate(content_safety.text_moderation_many(texts, compact=True))."""
+        return self.iterate(
+            self.content_safety.text_moderation_many(
+                _pull_in_thread(texts),
+                categories=categories,
+                blocklist_names=blocklist_names,
+                halt_on_blocklist_hit=halt_on_blocklist_hit,
+                output_type=output_type,
+                max_concurrency=max_concurrency,
+                ordered=ordered,
+            )
+        )
+
+    def image_moderation_many(
+        self,
+        images: Iterable[str | ImageSource],
+        categories: list[str] | None = None,
+        output_type: Literal[
+            "FourSeverityLevels", "EightSeverityLevels"
+        ] = "FourSeverityLevels",
+        max_concurrency: int | None = None,
+        ordered: bool = True,
+        preprocessor: ImagePreprocessor | None = None,
+    ) -> Iterator[BatchItem[ImageModerationResponse]]:
+        """See IContentSafety.image_moderation_many; images are pulled in a worker
+        thread, as in text_moderation_stream."""
+        return self.iterate(
+            self.content_safety.image_moderation_many(
+                _pull_in_thread(images),
+                categories=categories,
+                output_type=output_type,
+                max_concurrency=max_concurrency,
+                ordered=ordered,
+                preprocessor=preprocessor,
+            )
+        )
+
+
+def _run_loop(loop: asyncio.AbstractEventLoop) -> None:
+    asyncio.set_event_loop(loop)
+    try:
+        loop.run_forever()
+    finally:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+
+async def _pull_in_thread(items: Iterable[T]) -> AsyncIterator[T]:
+    iterator = iter(items)
+    while (item := await asyncio.to_thread(next, iterator, _END)) is not _END:
+        yield cast(T, item)
@@ -0,0 +1,98 @@
+import re
+from typing import NamedTuple, Sequence
+
+from azure_content_safety.models import (
+    ModerationResponseAnalysisItem,
+    TextModerationResponse,
+)
+
+TEXT_MODERATION_CHARACTER_LIMIT = 10_000
+"""Maximum number of characters of the text:analyze API."""
+
+_SENTENCE_END = re.compile(r"[.!?。！？][\"')\]]*\s+|\n\s*")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class TextChunk(NamedTuple):
+    offset: int
+    text: str
+
+
+def _last_boundary(pattern: re.Pattern[str], text: str, start: int, end: int) -> int:
+    position = -1
+    for match in pattern.finditer(text, start, end):
+        position = match.end()
+    return position
+
+
+def split_text(text: str, max_length: int, overlap: int = 0) -> list[TextChunk]:
+    """Splits text into chunks of at most max_length characters.
+
+    Chunks end on a sentence boundary when one exists in the second half of the
+    window, else on whitespace, else they are cut hard. Consecutive chunks share up
+    to overlap characters so that matches spanning a boundary are still seen.
+    """
+    if max_length < 1:
+        raise ValueError("max_length must be at least 1")
+    if not 0 <= overlap < max_length:
+        raise ValueError("overlap must be between 0 and max_length")
+
+    chunks: list[TextChunk] = []
+    start = 0
+    while start < len(text):
+        end = min(start + max_length, len(text))
+        if end < len(text):
+            lower = start + max_length // 2
+            boundary = _last_boundary(_SENTENCE_END, text, lower, end)
+            if boundary <= lower:
+                boundary = _last_boundary(_WHITESPACE, text, lower, end)
+            if boundary > lower:
+                end = boundary
+
+        chunks.append(TextChunk(start, text[start:end]))
+        if end == len(text):
+            break
+
+        next_start = max(end - overlap, start + 1)
+        if overlap:
+            # do not start the next chunk in the middle of a word
+            match = _WHITESPACE.search(text, next_start, end)
+            if match is not None:
+                next_start = match.end()
+        start = next_start
+
+    return chunks
+
+
+def _remap_match(match: dict[str, str], offset: int) -> dict[str, str]:
+    if offset == 0 or "offset" not in match:
+        return match
+    return {**match, "offset": str(int(match["offset"]) + offset)}
+
+
+def merge_text_moderation(
+    chunks: Sequence[TextChunk], responses: Sequence[TextModerationResponse]
+) -> TextModerationResponse:
+    """Merges the responses of the chunks of one text: the severity of a category is
+    its maximum over the chunks, and blocklist matches are unioned with their
+    offsets (when the service reports any) remapped onto the original text."""
+    severities: dict[str, int] = {}
+    for response in responses:
+        for item in response.categoriesAnalysis:
+            severities[item.category] = max(
+                item.severity, severities.get(item.category, item.severity)
+            )
+
+    matches: dict[tuple[tuple[str, str], ...], dict[str, str]] = {}
+    for chunk, response in zip(chunks, responses, strict=True):
+        for match in response.blocklistsMatch:
+            remapped = _remap_match(match, chunk.offset)
+            matches.setdefault(tuple(sorted(remapped.items())), remapped)
+
+    return TextModerationResponse(
+        blocklistsMatch=list(matches.values()),
+        categoriesAnalysis=[
+            ModerationResponseAnalysisItem(category=category, severity=severity)
+            for category, severity in severities.items()
+        ],
+    )
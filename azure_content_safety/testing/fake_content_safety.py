@@ -0,0 +1,471 @@
+"""A local stand-in for the Azure Content Safety service.
+
+Serves the /contentsafety/* routes called by ContentSafety with schema-correct,
+deterministic responses (derived from a hash of the input), and injects
+configurable latency, errors and throttling so that client-side performance work
+can be measured end to end on one machine.
+
+    async with FakeContentSafetyServer(FakeServerConfig(latency_ms=20)) as server:
+        env = ContentSafetyEnv(
+            azure_content_safety_endpoint=server.url,
+            azure_content_safety_key=server.config.key,
+            azure_content_safety_api_version="2024-09-01",
+        )
+
+or from the command line:
+
+    python -m azure_content_safety.testing.fake_content_safety --port 8080
+"""
+
+import argparse
+import asyncio
+import hashlib
+import random
+import re
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Literal
+
+from aiohttp import web
+
+HARM_CATEGORIES = ["Hate", "SelfHarm", "Sexual", "Violence"]
+TEXT_CHARACTER_LIMIT = 10_000
+GROUNDEDNESS_TEXT_LIMIT = 7_500
+GROUNDING_SOURCES_LIMIT = 55_000
+PROMPT_ATTACK_MARKERS = (
+    "ignore previous instructions",
+    "ignore all previous instructions",
+    "you are now",
+    "jailbreak",
+    "developer mode",
+)
+PROTECTED_MATERIAL_MARKER = "kiss me out of the bearded barley"
+PROTECTED_CODE_MARKER = "pygame.init()"
+BLOCKLIST_ITEMS_PER_REQUEST = 100
+BLOCKLIST_PAGE_SIZE = 1_000
+
+
+@dataclass
+class FakeServerConfig:
+    key: str = "fake-key"
+    latency_ms: float = 0.0
+    latency_distribution: Literal["constant", "uniform", "exponential", "lognormal"] = (
+        "constant"
+    )
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after: float = 1.0
+    seed: int = 0
+    blocklists: dict[str, dict[str, str]] = field(default_factory=dict)
+    """Blocklist name -> item id -> item text, matched case-insensitively."""
+
+
+def _score(*parts: str) -> int:
+    digest = hashlib.sha256("\0".join(parts).encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big")
+
+
+def _severity(category: str, content: str, output_type: str) -> int:
+    score = _score(category, content) % 100
+    # most content is benign; a deterministic tail gets higher severities
+    if score < 70:
+        return 0
+    level = (score - 70) * 8 // 30
+    if output_type == "EightSeverityLevels":
+        return level
+    return level // 2 * 2
+
+
+def _error(status: int, code: str, message: str) -> web.Response:
+    return web.json_response(
+        {"error": {"code": code, "message": message}}, status=status
+    )
+
+
+def _too_long(name: str, limit: int) -> web.Response:
+    return _error(
+        400, "InvalidRequestBody", f"{name} exceeds the limit of {limit} characters"
+    )
+
+
+@dataclass
+class FakeContentSafetyServer:
+    config: FakeServerConfig = field(default_factory=FakeServerConfig)
+    host: str = "127.0.0.1"
+    port: int = 0
+    requests: Counter[str] = field(default_factory=Counter, init=False)
+    throttled: int = field(default=0, init=False)
+    errors: int = field(default=0, init=False)
+    descriptions: dict[str, str] = field(default_factory=dict, init=False)
+    """Blocklist name -> description, and "name/item id" -> item description."""
+    _random: random.Random = field(init=False, repr=False)
+    _runner: web.AppRunner | None = field(default=None, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._random = random.Random(self.config.seed)
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def create_app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        routes: dict[str, Callable[[dict], web.Response]] = {
+            "text:analyze": self.analyze_text,
+            "image:analyze": self.analyze_image,
+            "text:shieldPrompt": self.shield_prompt,
+            "text:detectGroundedness": self.detect_groundedness,
+            "text:detectProtectedMaterial": self.detect_protected_material,
+            "text:detectProtectedMaterialForCode": self.detect_protected_code,
+        }
+        for service, handler in routes.items():
+            app.router.add_post(f"/contentsafety/{service}", self._wrap(handler))
+
+        blocklists = "/contentsafety/text/blocklists"
+        app.router.add_get(blocklists, self._wrap_request(self.list_blocklists))
+        app.router.add_patch(
+            f"{blocklists}/{{name}}", self._wrap_request(self.upsert_blocklist)
+        )
+        app.router.add_delete(
+            f"{blocklists}/{{name}}", self._wrap_request(self.delete_blocklist)
+        )
+        app.router.add_post(
+            f"{blocklists}/{{target}}", self._wrap_request(self.change_blocklist_items)
+        )
+        app.router.add_get(
+            f"{blocklists}/{{name}}/blocklistItems",
+            self._wrap_request(self.list_blocklist_items),
+        )
+        return app
+
+    async def start(self) -> None:
+        self._runner = web.AppRunner(self.create_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "FakeContentSafetyServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.close()
+
+    def _latency(self) -> float:
+        mean = self.config.latency_ms / 1000
+        match self.config.latency_distribution:
+            case "uniform":
+                return self._random.uniform(0, 2 * mean)
+            case "exponential":
+                return self._random.expovariate(1 / mean) if mean > 0 else 0.0
+            case "lognormal":
+                # sigma 0.5, scaled so that the mean is latency_ms
+                return mean * self._random.lognormvariate(-0.125, 0.5)
+            case _:
+                return mean
+
+    async def _guard(self, request: web.Request) -> web.Response | None:
+        """Counts the request, applies latency and auth, and injects failures."""
+        service = request.path.rsplit("/", 1)[-1]
+        self.requests[service] += 1
+
+        latency = self._latency()
+        if latency > 0:
+            await asyncio.sleep(latency)
+
+        if request.headers.get("Ocp-Apim-Subscription-Key") != self.config.key:
+            return _error(401, "Unauthorized", "Invalid subscription key")
+        if "api-version" not in request.query:
+            return _error(404, "NotFound", "api-version is required")
+
+        if self._random.random() < self.config.throttle_rate:
+            self.throttled += 1
+            response = _error(429, "TooManyRequests", "Rate limit exceeded")
+            response.headers["Retry-After"] = f"{self.config.retry_after:g}"
+            return response
+        if self._random.random() < self.config.error_rate:
+            self.errors += 1
+            return _error(500, "InternalServerError", "Injected failure")
+        return None
+
+    def _wrap(
+        self, handler: Callable[[dict], web.Response]
+    ) -> Callable[[web.Request], Awaitable[web.StreamResponse]]:
+        async def handle(request: web.Request) -> web.Response:
+            body = await request.json()
+            if not isinstance(body, dict):
+                return _error(400, "InvalidRequestBody", "Body must be an object")
+            return handler(body)
+
+        return self._wrap_request(handle)
+
+    def _wrap_request(
+        self, handler: Callable[[web.Request], Awaitable[web.Response]]
+    ) -> Callable[[web.Request], Awaitable[web.StreamResponse]]:
+        async def handle(request: web.Request) -> web.StreamResponse:
+            rejected = await self._guard(request)
+            if rejected is not None:
+                return rejected
+
+            try:
+                return await handler(request)
+            except ValueError:
+                return _error(400, "InvalidRequestBody", "Body is not valid JSON")
+            except (KeyError, TypeError, AttributeError) as e:
+                return _error(400, "InvalidRequestBody", f"Invalid body: {e!r}")
+
+        return handle
+
+    def analyze_text(self, body: dict) -> web.Response:
+        text: str = body["text"]
+        if len(text) > TEXT_CHARACTER_LIMIT:
+            return _too_long("text", TEXT_CHARACTER_LIMIT)
+
+        matches: list[dict[str, str]] = []
+        folded = text.casefold()
+        for name in body.get("blocklistNames", []):
+            for item_id, item_text in self.config.blocklists.get(name, {}).items():
+                if item_text.casefold() in folded:
+                    matches.append(
+                        {
+                            "blocklistName": name,
+                            "blocklistItemId": item_id,
+                            "blocklistItemText": item_text,
+                        }
+                    )
+
+        categories = body.get("categories") or HARM_CATEGORIES
+        output_type = body.get("outputType", "FourSeverityLevels")
+        analysis: list[dict[str, Any]] = []
+        if not (matches and body.get("haltOnBlocklistHit", False)):
+            analysis = [
+                {"category": c, "severity": _severity(c, text, output_type)}
+                for c in categories
+            ]
+        return web.json_response(
+            {"blocklistsMatch": matches, "categoriesAnalysis": analysis}
+        )
+
+    def analyze_image(self, body: dict) -> web.Response:
+        content: str = body["image"]["content"]
+        categories = body.get("categories") or HARM_CATEGORIES
+        output_type = body.get("outputType", "FourSeverityLevels")
+        if output_type != "FourSeverityLevels":
+            return _error(
+                400, "InvalidRequestBody", "Image only supports FourSeverityLevels"
+            )
+
+        return web.json_response(
+            {
+                "categoriesAnalysis": [
+                    {"category": c, "severity": _severity(c, content, output_type)}
+                    for c in categories
+                ]
+            }
+        )
+
+    def shield_prompt(self, body: dict) -> web.Response:
+        def attack(text: str) -> bool:
+            folded = text.casefold()
+            return any(marker in folded for marker in PROMPT_ATTACK_MARKERS)
+
+        return web.json_response(
+            {
+                "userPromptAnalysis": {"attackDetected": attack(body["userPrompt"])},
+                "documentsAnalysis": [
+                    {"attackDetected": attack(document)}
+                    for document in body.get("documents", [])
+                ],
+            }
+        )
+
+    def detect_groundedness(self, body: dict) -> web.Response:
+        text: str = body["text"]
+        sources: list[str] = body["groundingSources"]
+        if len(text) > GROUNDEDNESS_TEXT_LIMIT:
+            return _too_long("text", GROUNDEDNESS_TEXT_LIMIT)
+        if sum(len(source) for source in sources) > GROUNDING_SOURCES_LIMIT:
+            return _too_long("groundingSources", GROUNDING_SOURCES_LIMIT)
+
+        # a sentence is grounded when all its words appear in one of the sources
+        source_words = [set(re.findall(r"\w+", s.casefold())) for s in sources]
+        ungrounded = [
+            sentence
+            for sentence in re.split(r"(?<=[.!?])\s+", text.strip())
+            if sentence
+            and not any(
+                set(re.findall(r"\w+", sentence.casefold())) <= words
+                for words in source_words
+            )
+        ]
+        length = sum(len(sentence) for sentence in ungrounded)
+        return web.json_response(
+            {
+                "ungroundedDetected": bool(ungrounded),
+                "ungroundedPercentage": round(length / len(text), 4) if text else 0.0,
+                "ungroundedDetails": [{"text": sentence} for sentence in ungrounded],
+            }
+        )
+
+    def detect_protected_material(self, body: dict) -> web.Response:
+        text: str = body["text"]
+        if len(text) > TEXT_CHARACTER_LIMIT:
+            return _too_long("text", TEXT_CHARACTER_LIMIT)
+
+        detected = PROTECTED_MATERIAL_MARKER in text.casefold()
+        return web.json_response({"protectedMaterialAnalysis": {"detected": detected}})
+
+    def detect_protected_code(self, body: dict) -> web.Response:
+        code: str = body["code"]
+        detected = PROTECTED_CODE_MARKER in code
+        citations: list[dict[str, str | list[str]]] = []
+        if detected:
+            citations.append(
+                {
+                    "license": "NOASSERTION",
+                    "sourceUrls": [
+                        f"https://github.com/example/repo-{_score(code) % 1000}"
+                    ],
+                }
+            )
+        return web.json_response(
+            {
+                "protectedMaterialAnalysis": {
+                    "detected": detected,
+                    "codeCitations": citations,
+                }
+            }
+        )
+
+    def _blocklist(self, name: str) -> dict[str, str] | None:
+        return self.config.blocklists.get(name)
+
+    def _blocklist_json(self, name: str) -> dict[str, str]:
+        return {"blocklistName": name, "description": self.descriptions.get(name, "")}
+
+    def _item_json(self, name: str, item_id: str) -> dict[str, str]:
+        return {
+            "blocklistItemId": item_id,
+            "text": self.config.blocklists[name][item_id],
+            "description": self.descriptions.get(f"{name}/{item_id}", ""),
+        }
+
+    def _page(self, request: web.Request, values: list) -> web.Response:
+        skip = int(request.query.get("skip", 0))
+        size = int(request.query.get("maxpagesize", BLOCKLIST_PAGE_SIZE))
+        page: dict[str, Any] = {"value": values[skip : skip + size]}
+        if skip + size < len(values):
+            query = {**request.query, "skip": str(skip + size)}
+            page["nextLink"] = str(request.rel_url.with_query(query))
+        return web.json_response(page)
+
+    async def list_blocklists(self, request: web.Request) -> web.Response:
+        return self._page(
+            request, [self._blocklist_json(name) for name in self.config.blocklists]
+        )
+
+    async def upsert_blocklist(self, request: web.Request) -> web.Response:
+        name = request.match_info["name"]
+        body = await request.json()
+        created = name not in self.config.blocklists
+        self.config.blocklists.setdefault(name, {})
+        self.descriptions[name] = body.get("description", "")
+        return web.json_response(
+            self._blocklist_json(name), status=201 if created else 200
+        )
+
+    async def delete_blocklist(self, request: web.Request) -> web.Response:
+        name = request.match_info["name"]
+        for item_id in self.config.blocklists.pop(name, {}):
+            self.descriptions.pop(f"{name}/{item_id}", None)
+        self.descriptions.pop(name, None)
+        return web.Response(status=204)
+
+    async def list_blocklist_items(self, request: web.Request) -> web.Response:
+        name = request.match_info["name"]
+        items = self._blocklist(name)
+        if items is None:
+            return _error(404, "NotFound", f"Blocklist {name} not found")
+        return self._page(request, [self._item_json(name, i) for i in items])
+
+    async def change_blocklist_items(self, request: web.Request) -> web.Response:
+        name, _, action = request.match_info["target"].partition(":")
+        items = self._blocklist(name)
+        if items is None:
+            return _error(404, "NotFound", f"Blocklist {name} not found")
+
+        body = await request.json()
+        match action:
+            case "addOrUpdateBlocklistItems":
+                new_items = body["blocklistItems"]
+                if not 0 < len(new_items) <= BLOCKLIST_ITEMS_PER_REQUEST:
+                    return _error(
+                        400, "InvalidRequestBody", "Too many or no blocklist items"
+                    )
+                ids = {text: item_id for item_id, text in items.items()}
+                upserted = []
+                for item in new_items:
+                    text = item["text"]
+                    digest = hashlib.sha256(f"{name}\0{text}".encode()).digest()
+                    item_id = ids.get(text) or str(uuid.UUID(bytes=digest[:16]))
+                    items[item_id] = text
+                    self.descriptions[f"{name}/{item_id}"] = item.get("description", "")
+                    upserted.append(self._item_json(name, item_id))
+                return web.json_response({"blocklistItems": upserted})
+            case "removeBlocklistItems":
+                item_ids = body["blocklistItemIds"]
+                if not 0 < len(item_ids) <= BLOCKLIST_ITEMS_PER_REQUEST:
+                    return _error(
+                        400, "InvalidRequestBody", "Too many or no blocklist item ids"
+                    )
+                for item_id in item_ids:
+                    items.pop(item_id, None)
+                    self.descriptions.pop(f"{name}/{item_id}", None)
+                return web.Response(status=204)
+            case _:
+                return _error(404, "NotFound", f"Unknown action {action}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--key", default="fake-key")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument(
+        "--latency-distribution",
+        choices=["constant", "uniform", "exponential", "lognormal"],
+        default="constant",
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = FakeContentSafetyServer(
+        config=FakeServerConfig(
+            key=args.key,
+            latency_ms=args.latency_ms,
+            latency_distribution=args.latency_distribution,
+            error_rate=args.error_rate,
+            throttle_rate=args.throttle_rate,
+            retry_after=args.retry_after,
+            seed=args.seed,
+        ),
+        host=args.host,
+        port=args.port,
+    )
+    print(f"serving fake Content Safety on {server.url}")
+    web.run_app(server.create_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
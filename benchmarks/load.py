@@ -0,0 +1,136 @@
+"""Closed-loop, open-loop and allocation measurements of one scenario."""
+
+import asyncio
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass, field
+
+from azure_content_safety.protocols.i_content_safety import IContentSafety
+from azure_content_safety.services.instrumentation import nearest_rank
+from benchmarks.scenarios import Scenario
+
+
+@dataclass
+class LoadResult:
+    operation: str
+    mode: str
+    requests: int = 0
+    errors: int = 0
+    elapsed_s: float = 0.0
+    cpu_s: float = 0.0
+    latencies_s: list[float] = field(default_factory=list, repr=False)
+
+    def summary(self) -> dict:
+        completed = max(1, self.requests)
+        result = asdict(self)
+        del result["latencies_s"]
+        ordered = sorted(self.latencies_s)
+        result.update(
+            {
+                "req_per_s": self.requests / self.elapsed_s if self.elapsed_s else 0.0,
+                "error_rate": self.errors / completed,
+                "p50_ms": nearest_rank(ordered, 50) * 1000,
+                "p95_ms": nearest_rank(ordered, 95) * 1000,
+                "p99_ms": nearest_rank(ordered, 99) * 1000,
+                "max_ms": max(ordered, default=0.0) * 1000,
+                "cpu_ms_per_call": self.cpu_s / completed * 1000,
+            }
+        )
+        return result
+
+
+async def _timed_call(
+    client: IContentSafety,
+    scenario: Scenario,
+    i: int,
+    started: float,
+    result: LoadResult,
+) -> None:
+    try:
+        await scenario(client, i)
+    except Exception:
+        result.errors += 1
+    result.requests += 1
+    result.latencies_s.append(time.perf_counter() - started)
+
+
+async def closed_loop(
+    client: IContentSafety,
+    operation: str,
+    scenario: Scenario,
+    concurrency: int,
+    duration_s: float,
+) -> LoadResult:
+    """concurrency workers each send their next request as soon as the previous one
+    completed, which measures the maximum throughput of the client."""
+    result = LoadResult(operation=operation, mode="closed")
+    counter = 0
+    deadline = time.perf_counter() + duration_s
+
+    async def worker() -> None:
+        nonlocal counter
+        while time.perf_counter() < deadline:
+            counter += 1
+            await _timed_call(client, scenario, counter, time.perf_counter(), result)
+
+    cpu, started = time.process_time(), time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.elapsed_s = time.perf_counter() - started
+    result.cpu_s = time.process_time() - cpu
+    return result
+
+
+async def open_loop(
+    client: IContentSafety,
+    operation: str,
+    scenario: Scenario,
+    rate: float,
+    duration_s: float,
+) -> LoadResult:
+    """Requests arrive at a fixed rate whether or not earlier ones completed. The
+    latency of a request is measured from its scheduled arrival, so that a stalled
+    client is not hidden by coordinated omission."""
+    result = LoadResult(operation=operation, mode="open")
+    tasks: list[asyncio.Task] = []
+    total = int(rate * duration_s)
+
+    cpu, started = time.process_time(), time.perf_counter()
+    for i in range(total):
+        scheduled = started + i / rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(
+            asyncio.create_task(_timed_call(client, scenario, i, scheduled, result))
+        )
+    await asyncio.gather(*tasks)
+    result.elapsed_s = time.perf_counter() - started
+    result.cpu_s = time.process_time() - cpu
+    return result
+
+
+async def allocations(
+    client: IContentSafety, scenario: Scenario, calls: int
+) -> dict[str, float]:
+    """Peak memory allocated by one call, measured sequentially with tracemalloc."""
+    await scenario(client, -1)  # warm up the connection and lazy imports
+
+    peaks: list[int] = []
+    tracemalloc.start()
+    try:
+        for i in range(calls):
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            try:
+                await scenario(client, i)
+            except Exception:
+                pass
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "peak_kib_per_call_mean": sum(peaks) / max(1, len(peaks)) / 1024,
+        "peak_kib_per_call_max": max(peaks, default=0) / 1024,
+    }
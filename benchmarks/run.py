@@ -0,0 +1,217 @@
+"""Benchmarks of the ContentSafety client against a local stub endpoint.
+
+By default a fake Content Safety server (azure_content_safety.testing) is started in
+a separate process, so that CPU time and memory are the client's only. Results are
+written as JSON and can be compared against a previous run:
+
+    python -m benchmarks.run --output after.json --compare before.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from timeit import Timer
+
+from azure_content_safety.services.content_safety import ContentSafety, ContentSafetyEnv
+from benchmarks.load import allocations, closed_loop, open_loop
+from benchmarks.scenarios import PARSE_BODIES, SCENARIOS
+
+COMPARED_METRICS = {
+    # metric -> True when higher is better
+    "req_per_s": True,
+    "p50_ms": False,
+    "p99_ms": False,
+    "cpu_ms_per_call": False,
+    "peak_kib_per_call_mean": False,
+    "us_per_parse": False,
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub(latency_ms: float) -> tuple[subprocess.Popen, str]:
+    port = _free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "azure_content_safety.testing.fake_content_safety",
+            "--port",
+            str(port),
+            "--latency-ms",
+            str(latency_ms),
+        ],
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError("fake Content Safety server did not start")
+
+
+def parse_benchmark(number: int) -> dict[str, dict[str, float]]:
+    """Time to build each response model from a raw JSON body."""
+    results = {}
+    for name, (model, body) in PARSE_BODIES.items():
+        content = json.dumps(body).encode()
+        seconds = min(
+            Timer(lambda: model.model_validate_json(content)).repeat(
+                repeat=5, number=number
+            )
+        )
+        results[name] = {"us_per_parse": seconds / number * 1e6}
+    return results
+
+
+async def run(args: argparse.Namespace, endpoint: str) -> dict:
+    client = ContentSafety(
+        logger=logging.getLogger("benchmarks"),
+        env=ContentSafetyEnv(
+            azure_content_safety_endpoint=endpoint,
+            azure_content_safety_key=args.key,
+            azure_content_safety_api_version="2024-09-01",
+            azure_content_safety_max_retries=0,
+        ),
+    )
+    results: dict[str, dict] = {}
+    async with client:
+        for operation in args.operations:
+            scenario = SCENARIOS[operation]
+            summary: dict = {}
+            if args.mode in ("closed", "both"):
+                result = await closed_loop(
+                    client, operation, scenario, args.concurrency, args.duration
+                )
+                summary["closed"] = result.summary()
+            if args.mode in ("open", "both"):
+                result = await open_loop(
+                    client, operation, scenario, args.rate, args.duration
+                )
+                summary["open"] = result.summary()
+            if args.alloc_calls:
+                summary["allocations"] = await allocations(
+                    client, scenario, args.alloc_calls
+                )
+            results[operation] = summary
+            print(_format_row(operation, summary), flush=True)
+
+    return results
+
+
+def _format_row(operation: str, summary: dict) -> str:
+    parts = [f"{operation:36}"]
+    for mode in ("closed", "open"):
+        if mode in summary:
+            s = summary[mode]
+            parts.append(
+                f"{mode}: {s['req_per_s']:8.1f} req/s p50 {s['p50_ms']:7.2f}ms "
+                f"p99 {s['p99_ms']:7.2f}ms cpu {s['cpu_ms_per_call']:.3f}ms"
+            )
+    if "allocations" in summary:
+        parts.append(f"peak {summary['allocations']['peak_kib_per_call_mean']:.1f}KiB")
+    return " | ".join(parts)
+
+
+def _flatten(results: dict) -> dict[str, float]:
+    flat = {}
+    for operation, summary in results.get("operations", {}).items():
+        for section, metrics in summary.items():
+            for metric, value in metrics.items():
+                if metric in COMPARED_METRICS:
+                    flat[f"{operation}.{section}.{metric}"] = value
+    for model, metrics in results.get("parse", {}).items():
+        for metric, value in metrics.items():
+            flat[f"parse.{model}.{metric}"] = value
+    return flat
+
+
+def compare(before: dict, after: dict, threshold: float) -> list[str]:
+    """Returns a line per metric that regressed by more than threshold."""
+    regressions = []
+    previous = _flatten(before)
+    for key, value in _flatten(after).items():
+        old = previous.get(key)
+        if not old:
+            continue
+        change = (value - old) / old
+        higher_is_better = COMPARED_METRICS[key.rsplit(".", 1)[-1]]
+        if (-change if higher_is_better else change) > threshold:
+            regressions.append(f"{key}: {old:.3f} -> {value:.3f} ({change:+.1%})")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=(__doc__ or "").partition("\n")[0])
+    parser.add_argument("--endpoint", help="use a running stub instead of starting one")
+    parser.add_argument("--key", default="fake-key")
+    parser.add_argument(
+        "--operations", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS)
+    )
+    parser.add_argument("--mode", choices=["closed", "open", "both"], default="both")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rate", type=float, default=200.0, help="open loop req/s")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per run")
+    parser.add_argument("--alloc-calls", type=int, default=50)
+    parser.add_argument("--parse-number", type=int, default=10_000)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="stub latency")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--compare", help="previous JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    process = None
+    endpoint = args.endpoint
+    if endpoint is None:
+        process, endpoint = start_stub(args.latency_ms)
+
+    try:
+        operations = asyncio.run(run(args, endpoint))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": {k: v for k, v in vars(args).items() if k != "key"},
+        },
+        "operations": operations,
+        "parse": parse_benchmark(args.parse_number) if args.parse_number else {},
+    }
+    for name, metrics in results["parse"].items():
+        print(f"{name:36} parse {metrics['us_per_parse']:.2f}us")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,7 @@ async def main():
         "take the trail marked on your father's map."
     )
     print(result)
+    await content_safety.close()
 
 
 if __name__ == "__main__":
@@ -38,6 +38,7 @@ async def main():
         pygame.quit()"""
     )
     print(result)
+    await content_safety.close()
 
 
 if __name__ == "__main__":
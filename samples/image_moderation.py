@@ -1,5 +1,4 @@
-import base64
-import os
+from pathlib import Path
 
 from azure_content_safety.hosting import container
 from azure_content_safety.protocols.i_content_safety import IContentSafety
@@ -8,11 +7,12 @@ from azure_content_safety.protocols.i_content_safety import IContentSafety
 async def main():
     content_safety = container[IContentSafety]
 
-    with open(os.path.join("samples", "test_image.jpg"), "rb") as f:
-        image_str = base64.b64encode(f.read()).decode("utf-8")
-
-    result = await content_safety.image_moderation(image=image_str)
+    # the image file is streamed and base64-encoded while the request is sent
+    result = await content_safety.image_moderation(
+        image=Path("samples") / "test_image.jpg"
+    )
     print(result)
+    await content_safety.close()
 
 
 if __name__ == "__main__":
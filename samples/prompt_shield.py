@@ -27,6 +27,7 @@ async def main():
         ],
     )
     print(result)
+    await content_safety.close()
 
 
 if __name__ == "__main__":
@@ -10,6 +10,7 @@ async def main():
         categories=["Hate", "Sexual", "SelfHarm", "Violence"],
     )
     print(result)
+    await content_safety.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,183 @@
+import asyncio
+from contextlib import ExitStack
+from unittest.mock import MagicMock
+
+import pytest
+from pytest_mock import MockerFixture
+
+from azure_content_safety.errors import ContentSafetyHttpError
+from azure_content_safety.services.adaptive_concurrency import (
+    AdaptiveConcurrencyLimiter,
+)
+from azure_content_safety.services.content_safety import ContentSafety, ContentSafetyEnv
+from azure_content_safety.services.instrumentation import Instrumentation
+from tests.conftest import FakeClock
+
+
+async def complete(
+    limiter: AdaptiveConcurrencyLimiter,
+    clock: FakeClock,
+    seconds: float,
+    error: Exception | None = None,
+    operation: str = "op",
+) -> None:
+    await limiter.acquire()
+    try:
+        with limiter.request(operation):
+            clock.now += seconds
+            if error is not None:
+                raise error
+    except type(error or Exception):
+        pass
+
+
+def test_invalid_limits():
+    with pytest.raises(ValueError):
+        AdaptiveConcurrencyLimiter(min_limit=0)
+    with pytest.raises(ValueError):
+        AdaptiveConcurrencyLimiter(min_limit=10, max_limit=5)
+    with pytest.raises(ValueError):
+        AdaptiveConcurrencyLimiter(backoff=1)
+    with pytest.raises(ValueError):
+        AdaptiveConcurrencyLimiter(tolerance=1)
+
+
+@pytest.mark.asyncio
+async def test_increases_additively_while_in_use(clock: FakeClock):
+    # arrange
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, clock=clock)
+
+    # act
+    for _ in range(4):
+        await limiter.acquire()
+        await complete(limiter, clock, 0.1)  # two in flight, the limit is in use
+        limiter.in_flight -= 1
+
+    # assert
+    assert 2 < limiter.limit < 4
+    assert limiter.increases == 4
+    assert limiter.decreases == 0
+
+
+@pytest.mark.asyncio
+async def test_idle_limit_does_not_grow(clock: FakeClock):
+    # arrange
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8, clock=clock)
+
+    # act
+    for _ in range(10):
+        await complete(limiter, clock, 0.1)
+
+    # assert
+    assert limiter.limit == 8
+
+
+@pytest.mark.asyncio
+async def test_throttling_decreases_once_per_round_trip(clock: FakeClock):
+    # arrange
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=16, clock=clock)
+    await complete(limiter, clock, 1.0)
+
+    # act
+    await complete(limiter, clock, 0.0, ContentSafetyHttpError("op", 429, "slow down"))
+    await complete(limiter, clock, 0.0, ContentSafetyHttpError("op", 429, "slow down"))
+    clock.now += 1.0
+    await complete(limiter, clock, 0.0, TimeoutError())
+    await complete(limiter, clock, 0.0, ContentSafetyHttpError("op", 400, "bad"))
+
+    # assert
+    assert limiter.limit == 4
+    assert limiter.throttled == 3
+    assert limiter.decreases == 2
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_latency_above_baseline_decreases(clock: FakeClock):
+    # arrange
+    instrumentation = Instrumentation()
+    limiter = AdaptiveConcurrencyLimiter(
+        initial_limit=16, tolerance=2, clock=clock, instrumentation=instrumentation
+    )
+    for _ in range(5):
+        await complete(limiter, clock, 0.1, operation="text")
+    await complete(limiter, clock, 1.0, operation="image")
+
+    # act
+    for _ in range(5):
+        await limiter.acquire()
+    with ExitStack() as stack:  # five slow responses to one burst
+        for _ in range(5):
+            stack.enter_context(limiter.request("text"))
+        clock.now += 1.0
+
+    # assert
+    assert limiter.limit == 8
+    registry = instrumentation.registry
+    baseline = registry.gauge("concurrency_baseline_seconds", operation="text")
+    assert baseline is not None and baseline < 0.2  # drifts up slowly
+    gradient = registry.gauge("concurrency_gradient", operation="text")
+    assert gradient is not None and gradient < 0.5
+    assert registry.gauge("concurrency_gradient", operation="image") == 1.0
+    assert registry.gauge("concurrency_limit") == 8
+    assert registry.gauge("concurrency_in_flight") == 0
+    assert registry.counter("concurrency_decreases_total") == 1
+
+
+@pytest.mark.asyncio
+async def test_requests_over_the_limit_wait_in_order():
+    # arrange
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=1)
+    await limiter.acquire()
+    order: list[int] = []
+
+    async def wait(i: int) -> None:
+        await limiter.acquire()
+        order.append(i)
+
+    tasks = [asyncio.create_task(wait(i)) for i in range(3)]
+    await asyncio.sleep(0)
+    tasks[1].cancel()
+
+    # act
+    for _ in range(2):
+        with limiter.request("op"):
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+    # assert
+    assert order == [0, 2]
+    assert limiter.snapshot()["queued"] == 0
+    assert limiter.in_flight == 1
+
+
+@pytest.mark.asyncio
+async def test_content_safety_limits_requests(mocker: MockerFixture):
+    # arrange
+    content_safety = ContentSafety(
+        logger=MagicMock(),
+        env=ContentSafetyEnv(
+            azure_content_safety_endpoint="http://example.com",
+            azure_content_safety_key="key",
+            azure_content_safety_api_version="1.0",
+            azure_content_safety_max_retries=0,
+            azure_content_safety_adaptive_concurrency=True,
+            azure_content_safety_max_concurrency=4,
+        ),
+    )
+    mocker.patch.object(
+        content_safety,
+        "_send",
+        side_effect=ContentSafetyHttpError("text_moderation", 429, "slow down"),
+    )
+
+    # act
+    with pytest.raises(ContentSafetyHttpError):
+        await content_safety.text_moderation("text")
+
+    # assert
+    assert content_safety.concurrency_limiter is not None
+    snapshot = content_safety.concurrency_limiter.snapshot()
+    assert snapshot["limit"] == 2
+    assert snapshot["throttled"] == 1
+    assert snapshot["in_flight"] == 0
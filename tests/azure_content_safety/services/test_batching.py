@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+
+from azure_content_safety.services.batching import bounded_map
+
+
+async def collect(iterator) -> list:
+    return [item async for item in iterator]
+
+
+@pytest.mark.asyncio
+async def test_bounded_map_ordered():
+    # arrange
+    async def fn(delay: float) -> float:
+        await asyncio.sleep(delay)
+        return delay * 2
+
+    # act
+    items = await collect(bounded_map(fn, [0.03, 0.01, 0.02], 3))
+
+    # assert
+    assert [item.index for item in items] == [0, 1, 2]
+    assert [item.result for item in items] == [0.06, 0.02, 0.04]
+
+
+@pytest.mark.asyncio
+async def test_bounded_map_as_completed():
+    # arrange
+    async def fn(delay: float) -> float:
+        await asyncio.sleep(delay)
+        return delay
+
+    # act
+    items = await collect(bounded_map(fn, [0.03, 0.01, 0.02], 3, ordered=False))
+
+    # assert
+    assert [item.index for item in items] == [1, 2, 0]
+
+
+@pytest.mark.asyncio
+async def test_bounded_map_max_concurrency():
+    # arrange
+    in_flight = 0
+    peak = 0
+
+    async def fn(value: int) -> int:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+        return value
+
+    # act
+    items = await collect(bounded_map(fn, range(20), 4))
+
+    # assert
+    assert [item.result for item in items] == list(range(20))
+    assert peak == 4
+
+
+@pytest.mark.asyncio
+async def test_bounded_map_errors_as_values():
+    # arrange
+    async def fn(value: int) -> int:
+        if value == 1:
+            raise ValueError("bad item")
+        return value
+
+    # act
+    items = await collect(bounded_map(fn, [0, 1, 2], 2))
+
+    # assert
+    assert [item.ok for item in items] == [True, False, True]
+    assert isinstance(items[1].error, ValueError)
+    assert items[1].result is None
+
+
+@pytest.mark.asyncio
+async def test_bounded_map_async_iterable():
+    # arrange
+    async def source():
+        for value in range(3):
+            yield value
+
+    async def fn(value: int) -> int:
+        return value + 1
+
+    # act
+    items = await collect(bounded_map(fn, source(), 2))
+
+    # assert
+    assert [item.result for item in items] == [1, 2, 3]
+
+
+@pytest.mark.asyncio
+async def test_bounded_map_empty():
+    async def fn(value: int) -> int:
+        return value
+
+    assert await collect(bounded_map(fn, [], 2)) == []
+
+
+@pytest.mark.asyncio
+async def test_bounded_map_early_exit_cancels():
+    # arrange
+    cancelled = 0
+
+    async def fn(value: int) -> int:
+        nonlocal cancelled
+        try:
+            await asyncio.sleep(0 if value == 0 else 10)
+        except asyncio.CancelledError:
+            cancelled += 1
+            raise
+        return value
+
+    # act
+    iterator = bounded_map(fn, range(3), 3)
+    first = await anext(iterator)
+    await iterator.aclose()
+
+    # assert
+    assert first.result == 0
+    assert cancelled == 2
+
+
+@pytest.mark.asyncio
+async def test_bounded_map_max_concurrency_err():
+    async def fn(value: int) -> int:
+        return value
+
+    with pytest.raises(ValueError, match="max_concurrency must be at least 1"):
+        await collect(bounded_map(fn, [1], 0))
@@ -0,0 +1,89 @@
+from unittest.mock import MagicMock
+
+from azure_content_safety.services.blocklist_matcher import (
+    AhoCorasick,
+    LocalBlocklists,
+)
+
+
+def test_aho_corasick_finds_overlapping_patterns():
+    # arrange
+    automaton = AhoCorasick({"he": "he", "she": "she", "his": "his", "hers": "hers"})
+
+    # act
+    matches = list(automaton.iter_matches("ushers"))
+
+    # assert
+    assert matches == [(4, "she"), (4, "he"), (6, "hers")]
+
+
+def test_aho_corasick_ignores_empty_patterns():
+    # arrange
+    automaton = AhoCorasick({"empty": "", "a": "a"})
+
+    # act
+    matches = list(automaton.iter_matches("aa"))
+
+    # assert
+    assert matches == [(1, "a"), (2, "a")]
+
+
+def test_match_is_case_insensitive_and_deduplicated():
+    # arrange
+    blocklists = LocalBlocklists()
+    blocklists.set_items("list", {"1": "Foo", "2": "bar"})
+
+    # act
+    matches = blocklists.match("FOO foo baz", ["list"])
+
+    # assert
+    assert matches == [
+        {"blocklistName": "list", "blocklistItemId": "1", "blocklistItemText": "Foo"}
+    ]
+
+
+def test_incremental_rebuild_only_changed_blocklist():
+    # arrange
+    blocklists = LocalBlocklists()
+    blocklists.set_items("a", {"1": "foo"})
+    blocklists.set_items("b", {"1": "bar"})
+    blocklists.match("text", ["a", "b"])
+    automaton_b = blocklists._blocklists["b"].automaton
+
+    # act
+    blocklists.upsert_items("a", {"2": "text"})
+    matches = blocklists.match("text", ["a", "b"])
+
+    # assert
+    assert blocklists._blocklists["b"].automaton is automaton_b
+    assert [m["blocklistItemId"] for m in matches] == ["2"]
+
+
+def test_remove_items_and_delete():
+    # arrange
+    on_change = MagicMock()
+    blocklists = LocalBlocklists(on_change=[on_change])
+    blocklists.set_items("list", {"1": "foo", "2": "bar"})
+
+    # act
+    blocklists.remove_items("list", ["1"])
+    after_remove = blocklists.match("foo bar", ["list"])
+    blocklists.delete("list")
+
+    # assert
+    assert [m["blocklistItemId"] for m in after_remove] == ["2"]
+    assert blocklists.names() == []
+    assert on_change.call_count == 3
+
+
+def test_covers():
+    # arrange
+    blocklists = LocalBlocklists()
+    blocklists.set_items("plain", {"1": "foo"})
+    blocklists.set_items("regex", {"1": "fo+"}, regex_item_ids=["1"])
+
+    # assert
+    assert blocklists.covers(["plain"])
+    assert not blocklists.covers(["plain", "regex"])
+    assert not blocklists.covers(["unknown"])
+    assert blocklists.match("fooo", ["regex"]) == []
@@ -0,0 +1,62 @@
+import pytest
+
+from azure_content_safety.models import TextBlocklistItem
+from azure_content_safety.protocols.i_content_safety import BlocklistItemInput
+from azure_content_safety.services.blocklist_sync import (
+    BLOCKLIST_ITEM_TEXT_LIMIT,
+    batched,
+    diff_blocklist_items,
+    to_blocklist_items,
+)
+
+
+def test_batched():
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(batched([], 2)) == []
+
+
+def test_to_blocklist_items_keeps_last_item_of_each_text():
+    # act
+    items = to_blocklist_items(
+        [
+            "a",
+            BlocklistItemInput(text="b"),
+            BlocklistItemInput(text="a", description="x"),
+        ]
+    )
+
+    # assert
+    assert items == [
+        BlocklistItemInput(text="b"),
+        BlocklistItemInput(text="a", description="x"),
+    ]
+
+
+@pytest.mark.parametrize("text", ["", "x" * (BLOCKLIST_ITEM_TEXT_LIMIT + 1)])
+def test_to_blocklist_items_rejects_invalid_text(text: str):
+    with pytest.raises(ValueError):
+        to_blocklist_items([text])
+
+
+def test_diff_blocklist_items():
+    # arrange
+    current = [
+        TextBlocklistItem(blocklistItemId="1", text="keep"),
+        TextBlocklistItem(blocklistItemId="2", text="changed", description="old"),
+        TextBlocklistItem(blocklistItemId="3", text="gone"),
+        TextBlocklistItem(blocklistItemId="4", text="keep"),
+        TextBlocklistItem(blocklistItemId="5", text="regex", isRegex=True),
+    ]
+    desired = [
+        BlocklistItemInput(text="keep"),
+        BlocklistItemInput(text="changed", description="new"),
+        BlocklistItemInput(text="new"),
+        BlocklistItemInput(text="regex"),
+    ]
+
+    # act
+    upserts, removed = diff_blocklist_items(current, desired)
+
+    # assert
+    assert [item.text for item in upserts] == ["changed", "new", "regex"]
+    assert removed == ["3", "4", "5"]
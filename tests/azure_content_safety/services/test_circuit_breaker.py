@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from azure_content_safety.errors import CircuitOpenError, ContentSafetyHttpError
+from azure_content_safety.services.circuit_breaker import CircuitBreaker
+from azure_content_safety.services.guardrails import GuardrailPolicy
+from azure_content_safety.services.instrumentation import Instrumentation
+from tests.conftest import FakeClock
+
+
+def fail(breaker: CircuitBreaker, error: Exception) -> None:
+    with pytest.raises(type(error)):
+        with breaker.call("op"):
+            raise error
+
+
+def test_opens_after_consecutive_failures(clock: FakeClock):
+    # arrange
+    breaker = CircuitBreaker(failure_threshold=2, clock=clock)
+
+    # act
+    fail(breaker, ContentSafetyHttpError("op", 503, "unavailable"))
+    fail(breaker, ContentSafetyHttpError("op", 400, "bad request"))
+    fail(breaker, TimeoutError())
+    state = breaker.state("op")
+    fail(breaker, ContentSafetyHttpError("op", 500, "error"))
+
+    # assert
+    assert state == "closed"
+    assert breaker.state("op") == "open"
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.acquire("op")
+    assert error.value.retry_in == 30.0
+    assert breaker.snapshot()["op"]["rejected"] == 1
+    assert breaker.state("other") == "closed"
+
+
+def test_half_open_probe_closes_or_reopens(clock: FakeClock):
+    # arrange
+    instrumentation = Instrumentation()
+    breaker = CircuitBreaker(
+        failure_threshold=1,
+        recovery_s=10,
+        clock=clock,
+        instrumentation=instrumentation,
+    )
+    fail(breaker, TimeoutError())
+    registry = instrumentation.registry
+
+    # act & assert
+    assert registry.gauge("circuit_state", operation="op") == 2
+    clock.now = 10
+    assert breaker.state("op") == "half_open"
+    assert registry.gauge("circuit_state", operation="op") == 1
+    fail(breaker, TimeoutError())
+    assert breaker.state("op") == "open"
+
+    clock.now = 20
+    with breaker.call("op"):
+        with pytest.raises(CircuitOpenError):
+            breaker.acquire("op")  # only one probe at a time
+    assert breaker.state("op") == "closed"
+    assert breaker.snapshot()["op"]["opened"] == 2
+    assert registry.gauge("circuit_state", operation="op") == 0
+    assert registry.counter("circuit_opened_total", operation="op") == 2
+    assert registry.counter("circuit_rejected_total", operation="op") == 1
+    assert registry.counter("circuit_calls_total", operation="op") == 3
+
+
+def test_cancelled_probe_is_released(clock: FakeClock):
+    # arrange
+    breaker = CircuitBreaker(failure_threshold=1, recovery_s=10, clock=clock)
+    fail(breaker, TimeoutError())
+    clock.now = 10
+
+    # act
+    with pytest.raises(asyncio.CancelledError):
+        with breaker.call("op"):
+            raise asyncio.CancelledError()
+
+    # assert
+    assert breaker.state("op") == "half_open"
+    breaker.acquire("op")
+
+
+@pytest.mark.parametrize("fail_open, blocked", [(True, False), (False, True)])
+def test_guardrail_policy_verdict_while_open(fail_open: bool, blocked: bool):
+    # arrange
+    error = CircuitOpenError("text_moderation", 1.0, fail_open)
+
+    # act & assert
+    assert GuardrailPolicy()("text_moderation", error) is blocked
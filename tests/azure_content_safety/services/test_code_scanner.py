@@ -0,0 +1,202 @@
+import threading
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from pytest_mock import MockerFixture
+
+from azure_content_safety.models import (
+    DetectProtectedMaterialCodeResponse,
+    DetectProtectedMaterialCodeResponseItem,
+)
+from azure_content_safety.services.code_scanner import (
+    CodeScanIndex,
+    CodeScanner,
+    chunk_lines,
+    is_vendored,
+    parse_unified_diff,
+    read_text,
+)
+
+DIFF = """diff --git a/app.py b/app.py
+--- a/app.py
++++ b/app.py
+@@ -1,3 +1,4 @@
+ import os
+-import sys
++import pygame
++pygame.init()
+ main()
+@@ -10,0 +12,1 @@
++print("done")
+diff --git a/old.py b/old.py
+--- a/old.py
++++ /dev/null
+@@ -1 +0,0 @@
+-x = 1
+"""
+
+
+def _response(detected: bool) -> DetectProtectedMaterialCodeResponse:
+    return DetectProtectedMaterialCodeResponse(
+        protectedMaterialAnalysis=DetectProtectedMaterialCodeResponseItem(
+            detected=detected,
+            codeCitations=[{"license": "MIT", "sourceUrls": ["https://x"]}]
+            if detected
+            else [],
+        )
+    )
+
+
+def _content_safety() -> MagicMock:
+    content_safety = MagicMock()
+    content_safety.detect_protected_material_for_code = AsyncMock(
+        side_effect=lambda code: _response("pygame.init()" in code)
+    )
+    return content_safety
+
+
+def test_chunk_lines_cuts_before_top_level_definitions():
+    # arrange
+    lines = ["def a():\n", "    pass\n", "\n", "def b():\n", "    pass\n", "\n"]
+
+    # act
+    chunks = list(chunk_lines("x.py", lines, max_lines=5))
+
+    # assert
+    assert [(c.start_line, c.end_line) for c in chunks] == [(1, 3), (4, 6)]
+    assert chunks[1].text == "def b():\n    pass\n\n"
+
+
+def test_chunk_lines_hard_cut_and_blank_chunks():
+    # act
+    chunks = list(chunk_lines("x.py", ["  a\n"] * 5 + ["\n"] * 3, 10, max_lines=3))
+
+    # assert
+    assert [(c.start_line, c.end_line) for c in chunks] == [(10, 12), (13, 15)]
+
+
+def test_read_text_and_is_vendored():
+    assert read_text(b"print(1)\n") == "print(1)\n"
+    assert read_text(b"\x89PNG\0\0") is None
+    assert read_text(b"\xff\xfe") is None
+    assert is_vendored("node_modules/x/index.js")
+    assert not is_vendored("src/vendor.py")
+
+
+def test_parse_unified_diff():
+    # act
+    added = parse_unified_diff(DIFF)
+
+    # assert
+    assert added == {
+        "app.py": [
+            (2, ["import pygame\n", "pygame.init()\n"]),
+            (12, ['print("done")\n']),
+        ]
+    }
+
+
+def test_code_scan_index_persists(tmp_path: Path):
+    # arrange
+    path = tmp_path / "index.json"
+    index = CodeScanIndex(path)
+    index.set("digest", _response(True).protectedMaterialAnalysis)
+
+    # act
+    index.save()
+    loaded = CodeScanIndex(path)
+
+    # assert
+    assert len(loaded) == 1
+    assert loaded.get("digest") == _response(True).protectedMaterialAnalysis
+    assert loaded.get("other") is None
+
+
+@pytest.mark.asyncio
+async def test_scan_directory_skips_binary_vendored_and_indexed(tmp_path: Path):
+    # arrange
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "game.py").write_text("import pygame\npygame.init()\n")
+    (tmp_path / "src" / "copy.py").write_text("import pygame\npygame.init()\n")
+    (tmp_path / "src" / "util.py").write_text("x = 1\n")
+    (tmp_path / "logo.png").write_bytes(b"\x89PNG\0\0")
+    (tmp_path / "node_modules").mkdir()
+    (tmp_path / "node_modules" / "lib.js").write_text("pygame.init()\n")
+    content_safety = _content_safety()
+    scanner = CodeScanner(content_safety)
+    index = CodeScanIndex(tmp_path / "index.json")
+
+    # act
+    report = await scanner.scan_directory(tmp_path / "src", index)
+    (tmp_path / "src" / "util.py").write_text("x = 2\n")
+    rescan = await scanner.scan_directory(
+        tmp_path / "src", CodeScanIndex(tmp_path / "index.json")
+    )
+
+    # assert
+    assert report.files == 3
+    assert report.chunks == 3
+    assert report.cached == 0
+    assert [(f.path, f.start_line, f.end_line) for f in report.findings] == [
+        ("copy.py", 1, 2),
+        ("game.py", 1, 2),
+    ]
+    assert report.findings[0].codeCitations[0]["license"] == "MIT"
+    assert rescan.cached == 2
+    assert len(rescan.findings) == 2
+    assert content_safety.detect_protected_material_for_code.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_scan_directory_does_file_io_in_worker_threads(
+    tmp_path: Path, mocker: MockerFixture
+):
+    # arrange
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "game.py").write_text("import pygame\npygame.init()\n")
+    threads: dict[str, threading.Thread] = {}
+    read_bytes = Path.read_bytes
+    save = CodeScanIndex.save
+
+    def spy_read(path: Path) -> bytes:
+        threads["read"] = threading.current_thread()
+        return read_bytes(path)
+
+    def spy_save(index: CodeScanIndex) -> None:
+        threads["save"] = threading.current_thread()
+        save(index)
+
+    mocker.patch.object(Path, "read_bytes", spy_read)
+    mocker.patch.object(CodeScanIndex, "save", spy_save)
+    index = CodeScanIndex(tmp_path / "index.json")
+
+    # act
+    report = await CodeScanner(_content_safety()).scan_directory(
+        tmp_path / "src", index
+    )
+
+    # assert
+    assert len(report.findings) == 1
+    assert (tmp_path / "index.json").exists()
+    assert threading.main_thread() not in threads.values()
+    assert set(threads) == {"read", "save"}
+
+
+@pytest.mark.asyncio
+async def test_scan_diff_reports_errors():
+    # arrange
+    content_safety = MagicMock()
+    content_safety.detect_protected_material_for_code = AsyncMock(
+        side_effect=[_response(True), ValueError("boom")]
+    )
+
+    # act
+    report = await CodeScanner(content_safety, max_concurrency=1).scan_diff(DIFF)
+
+    # assert
+    assert report.files == 1
+    assert [(f.path, f.start_line, f.end_line) for f in report.findings] == [
+        ("app.py", 2, 3)
+    ]
+    assert list(report.errors) == ["app.py:12-12"]
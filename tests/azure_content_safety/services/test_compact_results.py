@@ -0,0 +1,76 @@
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from azure_content_safety.models import (
+    CompactModeration,
+    ModerationResponseAnalysisItem,
+    TextModerationResponse,
+)
+from azure_content_safety.services.compact_results import (
+    compact_moderation,
+    decode_compact_moderation,
+)
+
+
+def test_decode_compact_moderation():
+    # arrange
+    content = json.dumps(
+        {
+            "blocklistsMatch": [
+                {
+                    "blocklistName": "list",
+                    "blocklistItemId": "1",
+                    "blocklistItemText": "bad",
+                }
+            ],
+            "categoriesAnalysis": [
+                {"category": "Hate", "severity": 2},
+                {"category": "Violence", "severity": 4},
+            ],
+        }
+    ).encode()
+
+    # act
+    result = decode_compact_moderation(content)
+
+    # assert
+    assert result == CompactModeration(
+        categories=(("Hate", 2), ("Violence", 4)),
+        blocklist_matches=(("list", "1"),),
+    )
+    assert result.severity("Violence") == 4
+    assert result.severity("Sexual") == 0
+    assert result.max_severity == 4
+
+
+def test_decode_compact_moderation_of_image_body():
+    # act
+    result = decode_compact_moderation(b'{"categoriesAnalysis": []}')
+
+    # assert
+    assert result.categories == ()
+    assert result.blocklist_matches == ()
+    assert result.max_severity == 0
+
+
+def test_decode_compact_moderation_validates():
+    with pytest.raises(ValidationError):
+        decode_compact_moderation(b'{"categoriesAnalysis": [{"category": "Hate"}]}')
+
+
+def test_compact_moderation():
+    # act
+    result = compact_moderation(
+        TextModerationResponse(
+            blocklistsMatch=[{"blocklistName": "list", "blocklistItemId": "1"}],
+            categoriesAnalysis=[
+                ModerationResponseAnalysisItem(category="Hate", severity=2)
+            ],
+        )
+    )
+
+    # assert
+    assert result.categories == (("Hate", 2),)
+    assert result.blocklist_matches == (("list", "1"),)
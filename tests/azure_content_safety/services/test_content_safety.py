@@ -1,9 +1,18 @@
-from unittest.mock import MagicMock
+import asyncio
+import io
+import json
+import threading
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
+import pytest_asyncio
+from pydantic import BaseModel
 from pytest_mock import MockerFixture
 
+from azure_content_safety.errors import CircuitOpenError, ContentSafetyHttpError
 from azure_content_safety.models import (
+    CompactModeration,
     DetectedGroundednessResponseDetails,
     DetectGroundednessResponse,
     DetectProtectedMaterialCodeResponse,
@@ -16,12 +25,22 @@ from azure_content_safety.models import (
     TextModerationResponse,
     UserPromptAnalysis,
 )
-from azure_content_safety.services.content_safety import ContentSafety, ContentSafetyEnv
+from azure_content_safety.services.circuit_breaker import CircuitBreaker
+from azure_content_safety.services.content_safety import (
+    FAIL_OPEN_RESPONSES,
+    ContentSafety,
+    ContentSafetyEnv,
+)
+from azure_content_safety.services.disk_cache import DiskResponseCache
+from azure_content_safety.services.hedging import Hedging
+from azure_content_safety.services.image_payload import ImagePayload
+from azure_content_safety.services.response_cache import ResponseCache
+from azure_content_safety.testing.fake_content_safety import FakeContentSafetyServer
 
 
-@pytest.fixture
-def content_safety():
-    return ContentSafety(
+@pytest_asyncio.fixture
+async def content_safety():
+    content_safety = ContentSafety(
         logger=MagicMock(),
         env=ContentSafetyEnv(
             azure_content_safety_endpoint="http://example.com",
@@ -29,6 +48,32 @@ def content_safety():
             azure_content_safety_api_version="1.0",
         ),
     )
+    yield content_safety
+    await content_safety.close()
+
+
+def test_calls_from_successive_event_loops(threaded_server: FakeContentSafetyServer):
+    # arrange
+    content_safety = ContentSafety(
+        logger=MagicMock(),
+        env=ContentSafetyEnv(
+            azure_content_safety_endpoint=threaded_server.url,
+            azure_content_safety_key=threaded_server.config.key,
+            azure_content_safety_api_version="2024-09-01",
+        ),
+    )
+
+    # act
+    first = asyncio.run(content_safety.text_moderation("first"))
+    session = content_safety._session
+    second = asyncio.run(content_safety.text_moderation("second"))
+    asyncio.run(content_safety.close())
+
+    # assert
+    assert first.categoriesAnalysis and second.categoriesAnalysis
+    assert threaded_server.requests["text:analyze"] == 2
+    assert session is not None and session.closed
+    assert content_safety._session is None
 
 
 @pytest.fixture
@@ -51,13 +96,17 @@ def image_moderation_response():
 
 
 class MockResponse:
-    def __init__(self, json_body: dict, status: int):
+    def __init__(self, json_body: dict, status: int, headers: dict | None = None):
         self._json_body = json_body
         self.status = status
+        self.headers = headers or {}
 
-    async def json(self):
+    async def json(self, **kwargs):
         return self._json_body
 
+    async def read(self):
+        return json.dumps(self._json_body).encode()
+
     async def __aexit__(self, exc_type, exc, tb):
         pass
 
@@ -80,7 +129,47 @@ async def test_http_post(mocker: MockerFixture, content_safety: ContentSafety):
 
     # act
     result = await content_safety.http_post("fn_name", "url", {})
-    assert result == {}
+    assert result == b"{}"
+
+
+@pytest.mark.asyncio
+async def test_http_post_reuses_session(
+    mocker: MockerFixture, content_safety: ContentSafety
+):
+    # arrange
+    patched = mocker.patch(
+        "aiohttp.ClientSession.post", return_value=MockResponse({}, 200)
+    )
+
+    # act
+    await content_safety.http_post("fn_name", "url", {})
+    session = content_safety._session
+    await content_safety.http_post("fn_name", "url", {})
+
+    # assert
+    assert session is not None
+    assert content_safety._session is session
+    assert patched.call_count == 2
+    await content_safety.close()
+
+
+@pytest.mark.asyncio
+async def test_start_close(content_safety: ContentSafety):
+    # act
+    async with content_safety:
+        session = content_safety._session
+        assert session is not None
+        assert session.connector is not None
+        assert session.connector.limit_per_host == 32
+
+        await content_safety.start()
+        assert content_safety._session is session
+
+    # assert
+    assert content_safety._session is None
+    assert session.closed
+
+    await content_safety.close()
 
 
 @pytest.mark.asyncio
@@ -95,6 +184,103 @@ async def test_http_post_err(mocker: MockerFixture, content_safety: ContentSafet
         await content_safety.http_post("fn_name", "url", {})
 
 
+@pytest.mark.asyncio
+async def test_http_post_retry(mocker: MockerFixture, content_safety: ContentSafety):
+    # arrange
+    patched = mocker.patch(
+        "aiohttp.ClientSession.post",
+        side_effect=[
+            MockResponse({"error": "throttled"}, 429, {"Retry-After": "0"}),
+            MockResponse({"error": "unavailable"}, 503),
+            MockResponse({"value": 1}, 200),
+        ],
+    )
+    sleep = mocker.patch("asyncio.sleep")
+
+    # act
+    result = await content_safety.http_post("fn_name", "url", {})
+
+    # assert
+    assert json.loads(result) == {"value": 1}
+    assert patched.call_count == 3
+    assert sleep.call_count == 2
+    assert sleep.call_args_list[0].args == (0.0,)
+
+
+@pytest.mark.asyncio
+async def test_http_post_retry_exhausted(
+    mocker: MockerFixture, content_safety: ContentSafety
+):
+    # arrange
+    patched = mocker.patch(
+        "aiohttp.ClientSession.post",
+        return_value=MockResponse({"error": "throttled"}, 429),
+    )
+    mocker.patch("asyncio.sleep")
+
+    # act
+    with pytest.raises(ContentSafetyHttpError) as e:
+        await content_safety.http_post("fn_name", "url", {})
+
+    # assert
+    assert e.value.status == 429
+    assert patched.call_count == 4
+
+
+@pytest.mark.asyncio
+async def test_http_post_retry_budget(
+    mocker: MockerFixture, content_safety: ContentSafety
+):
+    # arrange
+    content_safety.retry_policy.budget_max = 1.0
+    patched = mocker.patch(
+        "aiohttp.ClientSession.post",
+        return_value=MockResponse({"error": "unavailable"}, 503),
+    )
+    mocker.patch("asyncio.sleep")
+
+    # act
+    with pytest.raises(ContentSafetyHttpError):
+        await content_safety.http_post("fn_name", "url", {})
+
+    # assert
+    assert patched.call_count == 2
+    assert content_safety.retry_policy.budget("fn_name") < 1
+
+
+@pytest.mark.asyncio
+async def test_http_post_rate_limited(
+    mocker: MockerFixture, content_safety: ContentSafety
+):
+    # arrange
+    content_safety.rate_limiter = MagicMock(acquire=AsyncMock(return_value=0.0))
+    mocker.patch("aiohttp.ClientSession.post", return_value=MockResponse({}, 200))
+
+    # act
+    await content_safety.http_post("fn_name", "url", {})
+
+    # assert
+    content_safety.rate_limiter.acquire.assert_awaited_once()
+
+
+def test_rate_limiter_from_env():
+    # act
+    content_safety = ContentSafety(
+        logger=MagicMock(),
+        env=ContentSafetyEnv(
+            azure_content_safety_endpoint="http://example.com",
+            azure_content_safety_key="key",
+            azure_content_safety_api_version="1.0",
+            azure_content_safety_rate_limit_tps=5,
+        ),
+    )
+
+    # assert
+    assert content_safety.rate_limiter is not None
+    assert content_safety.rate_limiter.rate == 5
+    assert content_safety.rate_limiter.capacity == 5
+
+
 @pytest.mark.asyncio
 async def test_prompt_shield(mocker: MockerFixture, content_safety: ContentSafety):
     # arrange
@@ -104,7 +290,7 @@ async def test_prompt_shield(mocker: MockerFixture, content_safety: ContentSafet
     )
     mocker.patch(
         "azure_content_safety.services.content_safety.ContentSafety.http_post",
-        return_value=return_value.model_dump(),
+        return_value=return_value.model_dump_json().encode(),
     )
 
     # act
@@ -124,7 +310,7 @@ async def test_detect_groundedness(
     )
     mocker.patch(
         "azure_content_safety.services.content_safety.ContentSafety.http_post",
-        return_value=return_value.model_dump(),
+        return_value=return_value.model_dump_json().encode(),
     )
 
     # act
@@ -159,7 +345,7 @@ async def test_detect_groundedness_with_qna(
     )
     mocker.patch(
         "azure_content_safety.services.content_safety.ContentSafety.http_post",
-        return_value=return_value.model_dump(),
+        return_value=return_value.model_dump_json().encode(),
     )
 
     # act
@@ -182,7 +368,7 @@ async def test_detect_protected_materials(
     )
     mocker.patch(
         "azure_content_safety.services.content_safety.ContentSafety.http_post",
-        return_value=return_value.model_dump(),
+        return_value=return_value.model_dump_json().encode(),
     )
 
     # act
@@ -203,7 +389,7 @@ async def test_detect_protected_material_for_code(
     )
     mocker.patch(
         "azure_content_safety.services.content_safety.ContentSafety.http_post",
-        return_value=return_value.model_dump(),
+        return_value=return_value.model_dump_json().encode(),
     )
 
     # act
@@ -220,7 +406,7 @@ async def test_text_moderation(
     # arrange
     patched = mocker.patch(
         "azure_content_safety.services.content_safety.ContentSafety.http_post",
-        return_value=text_moderation_response.model_dump(),
+        return_value=text_moderation_response.model_dump_json().encode(),
     )
 
     # act
@@ -238,7 +424,7 @@ async def test_text_moderation_with_categories(
     # arrange
     patched = mocker.patch(
         "azure_content_safety.services.content_safety.ContentSafety.http_post",
-        return_value=text_moderation_response.model_dump(),
+        return_value=text_moderation_response.model_dump_json().encode(),
     )
 
     # act
@@ -256,7 +442,7 @@ async def test_text_moderation_with_blocklist_names(
     # arrange
     patched = mocker.patch(
         "azure_content_safety.services.content_safety.ContentSafety.http_post",
-        return_value=text_moderation_response.model_dump(),
+        return_value=text_moderation_response.model_dump_json().encode(),
     )
 
     # act
@@ -281,7 +467,7 @@ async def test_image_moderation(
     # arrange
     patched = mocker.patch(
         "azure_content_safety.services.content_safety.ContentSafety.http_post",
-        return_value=image_moderation_response.model_dump(),
+        return_value=image_moderation_response.model_dump_json().encode(),
     )
 
     # act
@@ -299,10 +485,702 @@ async def test_image_moderation_categories(
     # arrange
     patched = mocker.patch(
         "azure_content_safety.services.content_safety.ContentSafety.http_post",
-        return_value=image_moderation_response.model_dump(),
+        return_value=image_moderation_response.model_dump_json().encode(),
     )
 
     # act
     result = await content_safety.image_moderation("image_base64", ["category"])
     assert result == image_moderation_response
     assert patched.call_args.kwargs["json"]["categories"] == ["category"]
+
+
+@pytest.mark.asyncio
+async def test_text_moderation_cached(
+    mocker: MockerFixture,
+    content_safety: ContentSafety,
+    text_moderation_response: TextModerationResponse,
+):
+    # arrange
+    content_safety.cache = ResponseCache()
+    patched = mocker.patch(
+        "azure_content_safety.services.content_safety.ContentSafety.http_post",
+        return_value=text_moderation_response.model_dump_json().encode(),
+    )
+
+    # act
+    first = await content_safety.text_moderation("text", blocklist_names=["list"])
+    second = await content_safety.text_moderation("text", blocklist_names=["list"])
+    other = await content_safety.text_moderation(
+        "text", output_type="EightSeverityLevels"
+    )
+
+    # assert
+    assert first == second == other == text_moderation_response
+    assert patched.call_count == 2
+    assert content_safety.cache.stats().hits == 1
+
+
+@pytest.mark.asyncio
+async def test_image_moderation_cached(
+    mocker: MockerFixture,
+    content_safety: ContentSafety,
+    image_moderation_response: ImageModerationResponse,
+):
+    # arrange
+    content_safety.cache = ResponseCache()
+    patched = mocker.patch(
+        "azure_content_safety.services.content_safety.ContentSafety.http_post",
+        return_value=image_moderation_response.model_dump_json().encode(),
+    )
+
+    # act
+    await content_safety.image_moderation("image_base64")
+    result = await content_safety.image_moderation("image_base64")
+
+    # assert
+    assert result == image_moderation_response
+    assert patched.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_invalidate_blocklist(
+    mocker: MockerFixture,
+    content_safety: ContentSafety,
+    text_moderation_response: TextModerationResponse,
+):
+    # arrange
+    content_safety.cache = ResponseCache()
+    patched = mocker.patch(
+        "azure_content_safety.services.content_safety.ContentSafety.http_post",
+        return_value=text_moderation_response.model_dump_json().encode(),
+    )
+    await content_safety.text_moderation("text", blocklist_names=["list"])
+
+    # act
+    removed = content_safety.invalidate_blocklist("list")
+    await content_safety.text_moderation("text", blocklist_names=["list"])
+
+    # assert
+    assert removed == 1
+    assert patched.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_text_moderation_local_blocklist_hit(
+    mocker: MockerFixture, content_safety: ContentSafety
+):
+    # arrange
+    patched = mocker.patch(
+        "azure_content_safety.services.content_safety.ContentSafety.http_post"
+    )
+    content_safety.local_blocklists.set_items("list", {"1": "Bad Word"})
+
+    # act
+    result = await content_safety.text_moderation(
+        "some bad word here", blocklist_names=["list"]
+    )
+
+    # assert
+    patched.assert_not_called()
+    assert result.categoriesAnalysis == []
+    assert result.blocklistsMatch == [
+        {
+            "blocklistName": "list",
+            "blocklistItemId": "1",
+            "blocklistItemText": "Bad Word",
+        }
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "text, blocklist_names, halt_on_blocklist_hit",
+    [
+        ("clean text", ["list"], True),
+        ("bad word", ["list"], False),
+        ("bad word", ["list", "unknown"], True),
+    ],
+)
+async def test_text_moderation_local_blocklist_falls_through(
+    mocker: MockerFixture,
+    content_safety: ContentSafety,
+    text_moderation_response: TextModerationResponse,
+    text: str,
+    blocklist_names: list[str],
+    halt_on_blocklist_hit: bool,
+):
+    # arrange
+    patched = mocker.patch(
+        "azure_content_safety.services.content_safety.ContentSafety.http_post",
+        return_value=text_moderation_response.model_dump_json().encode(),
+    )
+    content_safety.local_blocklists.set_items("list", {"1": "bad word"})
+
+    # act
+    result = await content_safety.text_moderation(
+        text,
+        blocklist_names=blocklist_names,
+        halt_on_blocklist_hit=halt_on_blocklist_hit,
+    )
+
+    # assert
+    assert result == text_moderation_response
+    patched.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_local_blocklist_change_invalidates_cache(
+    mocker: MockerFixture,
+    content_safety: ContentSafety,
+    text_moderation_response: TextModerationResponse,
+):
+    # arrange
+    content_safety.cache = ResponseCache()
+    mocker.patch(
+        "azure_content_safety.services.content_safety.ContentSafety.http_post",
+        return_value=text_moderation_response.model_dump_json().encode(),
+    )
+    await content_safety.text_moderation("text", blocklist_names=["list"])
+
+    # act
+    content_safety.local_blocklists.upsert_items("list", {"1": "bad"})
+
+    # assert
+    assert len(content_safety.cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_delete_blocklist_invalidates_disk_cache_in_thread(
+    mocker: MockerFixture, content_safety: ContentSafety, tmp_path: Path
+):
+    # arrange
+    content_safety.cache = DiskResponseCache(tmp_path / "cache.db")
+    content_safety.local_blocklists.set_items("list", {"1": "bad"})
+    mocker.patch(
+        "azure_content_safety.services.content_safety.ContentSafety.http_request",
+        return_value=b"",
+    )
+    threads: list[threading.Thread] = []
+    invalidate = content_safety.cache.invalidate
+
+    def spy(tag: str) -> int:
+        threads.append(threading.current_thread())
+        return invalidate(tag)
+
+    mocker.patch.object(content_safety.cache, "invalidate", side_effect=spy)
+
+    # act
+    await content_safety.delete_blocklist("list")
+
+    # assert
+    assert content_safety.local_blocklists.names() == []
+    assert len(threads) == 1
+    assert threads[0] is not threading.main_thread()
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_fails_open_without_caching(
+    mocker: MockerFixture, content_safety: ContentSafety
+):
+    # arrange
+    content_safety.cache = ResponseCache()
+    content_safety.circuit_breaker = CircuitBreaker(failure_threshold=1, fail_open=True)
+    content_safety.circuit_breaker.record_failure("text_moderation")
+    send = mocker.patch(
+        "azure_content_safety.services.content_safety.ContentSafety._send_with_retries"
+    )
+
+    # act
+    response = await content_safety.text_moderation("text")
+
+    # assert
+    assert response == TextModerationResponse(blocklistsMatch=[], categoriesAnalysis=[])
+    assert len(content_safety.cache) == 0
+    send.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_raises_for_blocklist_management(
+    mocker: MockerFixture, content_safety: ContentSafety
+):
+    # arrange
+    content_safety.circuit_breaker = CircuitBreaker(failure_threshold=1, fail_open=True)
+    content_safety.circuit_breaker.record_failure("delete_blocklist")
+
+    # act & assert
+    with pytest.raises(CircuitOpenError):
+        await content_safety.delete_blocklist("list")
+
+
+@pytest.mark.parametrize(
+    "fn_name, model",
+    [
+        ("prompt_shield", PromptShieldResponse),
+        ("detect_groundedness", DetectGroundednessResponse),
+        ("detect_protected_materials", DetectProtectedMaterialResponse),
+        ("detect_protected_material_for_code", DetectProtectedMaterialCodeResponse),
+        ("text_moderation", TextModerationResponse),
+        ("image_moderation", ImageModerationResponse),
+    ],
+)
+def test_fail_open_responses_validate(fn_name: str, model: type[BaseModel]):
+    model.model_validate_json(FAIL_OPEN_RESPONSES[fn_name])
+
+
+def test_cache_from_env():
+    # act
+    content_safety = ContentSafety(
+        logger=MagicMock(),
+        env=ContentSafetyEnv(
+            azure_content_safety_endpoint="http://example.com",
+            azure_content_safety_key="key",
+            azure_content_safety_api_version="1.0",
+            azure_content_safety_cache_max_entries=10,
+        ),
+    )
+
+    # assert
+    assert isinstance(content_safety.cache, ResponseCache)
+    assert content_safety.cache.max_entries == 10
+
+
+def test_invalidate_blocklist_without_cache(content_safety: ContentSafety):
+    assert content_safety.invalidate_blocklist("list") == 0
+
+
+@pytest.mark.asyncio
+async def test_text_moderation_many(
+    mocker: MockerFixture,
+    content_safety: ContentSafety,
+    text_moderation_response: TextModerationResponse,
+):
+    # arrange
+    patched = mocker.patch(
+        "azure_content_safety.services.content_safety.ContentSafety.http_post",
+        side_effect=[
+            text_moderation_response.model_dump_json().encode(),
+            ValueError("failed"),
+        ],
+    )
+
+    # act
+    items = [
+        item
+        async for item in content_safety.text_moderation_many(
+            ["a", "b"], categories=["category"], max_concurrency=1
+        )
+    ]
+
+    # assert
+    assert items[0].result == text_moderation_response
+    assert isinstance(items[1].error, ValueError)
+    assert [call.kwargs["json"]["text"] for call in patched.call_args_list] == [
+        "a",
+        "b",
+    ]
+    assert patched.call_args.kwargs["json"]["categories"] == ["category"]
+
+
+@pytest.mark.asyncio
+async def test_text_moderation_many_compact(
+    mocker: MockerFixture,
+    content_safety: ContentSafety,
+    image_moderation_response: ImageModerationResponse,
+):
+    # arrange
+    mocker.patch(
+        "azure_content_safety.services.content_safety.ContentSafety.http_post",
+        return_value=image_moderation_response.model_dump_json().encode(),
+    )
+    content_safety.local_blocklists.set_items("list", {"1": "bad"})
+
+    # act
+    items = [
+        item
+        async for item in content_safety.text_moderation_many(
+            ["good", "bad"], blocklist_names=["list"], compact=True
+        )
+    ]
+
+    # assert
+    assert items[0].result == CompactModeration(categories=(("category", 1),))
+    assert items[1].result == CompactModeration(
+        categories=(), blocklist_matches=(("list", "1"),)
+    )
+
+
+@pytest.mark.asyncio
+async def test_image_moderation_many_compact(
+    mocker: MockerFixture,
+    content_safety: ContentSafety,
+    image_moderation_response: ImageModerationResponse,
+):
+    # arrange
+    mocker.patch(
+        "azure_content_safety.services.content_safety.ContentSafety.http_post",
+        return_value=image_moderation_response.model_dump_json().encode(),
+    )
+
+    # act
+    items = [
+        item
+        async for item in content_safety.image_moderation_many(
+            ["aW1hZ2U="], compact=True
+        )
+    ]
+
+    # assert
+    assert items[0].result == CompactModeration(categories=(("category", 1),))
+
+
+@pytest.mark.asyncio
+async def test_image_moderation_many(
+    mocker: MockerFixture,
+    content_safety: ContentSafety,
+    image_moderation_response: ImageModerationResponse,
+):
+    # arrange
+    mocker.patch(
+        "azure_content_safety.services.content_safety.ContentSafety.http_post",
+        return_value=image_moderation_response.model_dump_json().encode(),
+    )
+
+    # act
+    items = [
+        item
+        async for item in content_safety.image_moderation_many(
+            ["image1", "image2"], ordered=False
+        )
+    ]
+
+    # assert
+    assert sorted(item.index for item in items) == [0, 1]
+    assert all(item.result == image_moderation_response for item in items)
+
+
+@pytest.mark.asyncio
+async def test_prompt_shield_many(mocker: MockerFixture, content_safety: ContentSafety):
+    # arrange
+    return_value = PromptShieldResponse(
+        userPromptAnalysis=UserPromptAnalysis(attackDetected=False),
+        documentsAnalysis=[],
+    )
+    patched = mocker.patch(
+        "azure_content_safety.services.content_safety.ContentSafety.http_post",
+        return_value=return_value.model_dump_json().encode(),
+    )
+
+    # act
+    items = [
+        item
+        async for item in content_safety.prompt_shield_many([("prompt", ["document"])])
+    ]
+
+    # assert
+    assert items[0].result == return_value
+    assert patched.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_text_moderation_long(
+    mocker: MockerFixture,
+    content_safety: ContentSafety,
+):
+    # arrange
+    patched = mocker.patch(
+        "azure_content_safety.services.content_safety.ContentSafety.http_post",
+        side_effect=[
+            TextModerationResponse(
+                blocklistsMatch=[],
+                categoriesAnalysis=[
+                    ModerationResponseAnalysisItem(category="Hate", severity=severity)
+                ],
+            )
+            .model_dump_json()
+            .encode()
+            for severity in [0, 4, 2]
+        ],
+    )
+
+    # act
+    result = await content_safety.text_moderation(
+        " ".join(f"word{i}" for i in range(3000))
+    )
+
+    # assert
+    assert patched.call_count == 3
+    assert all(
+        len(call.kwargs["json"]["text"]) <= 10_000 for call in patched.call_args_list
+    )
+    assert result.categoriesAnalysis == [
+        ModerationResponseAnalysisItem(category="Hate", severity=4)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_text_moderation_long_too_long(
+    mocker: MockerFixture, content_safety: ContentSafety
+):
+    # arrange
+    patched = mocker.patch(
+        "azure_content_safety.services.content_safety.ContentSafety.http_post"
+    )
+
+    # act
+    with pytest.raises(ValueError, match="the maximum is 1000000"):
+        await content_safety.text_moderation_long("a" * 1_000_001)
+
+    # assert
+    patched.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_text_moderation_long_chunk_length_err(content_safety: ContentSafety):
+    with pytest.raises(ValueError, match="chunk_length must be at most 10000"):
+        await content_safety.text_moderation_long("text", chunk_length=20_000)
+
+
+@pytest.mark.asyncio
+async def test_text_moderation_long_err(
+    mocker: MockerFixture, content_safety: ContentSafety
+):
+    # arrange
+    mocker.patch(
+        "azure_content_safety.services.content_safety.ContentSafety.http_post",
+        side_effect=ValueError("Failed to text_moderation"),
+    )
+
+    # act
+    with pytest.raises(ValueError, match="Failed to text_moderation"):
+        await content_safety.text_moderation_long("word " * 10, chunk_length=10)
+
+
+@pytest.mark.asyncio
+async def test_text_moderation_coalesced(
+    mocker: MockerFixture,
+    content_safety: ContentSafety,
+    text_moderation_response: TextModerationResponse,
+):
+    # arrange
+    async def http_post(**kwargs):
+        await asyncio.sleep(0.01)
+        return text_moderation_response.model_dump_json().encode()
+
+    patched = mocker.patch(
+        "azure_content_safety.services.content_safety.ContentSafety.http_post",
+        side_effect=http_post,
+    )
+
+    # act
+    results = await asyncio.gather(
+        *(content_safety.text_moderation("text") for _ in range(5)),
+        content_safety.text_moderation("other"),
+    )
+
+    # assert
+    assert all(result == text_moderation_response for result in results)
+    assert patched.call_count == 2
+    assert content_safety.single_flight is not None
+    assert content_safety.single_flight.coalesced == 4
+    assert len(content_safety.single_flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_image_moderation_coalesced_error(
+    mocker: MockerFixture, content_safety: ContentSafety
+):
+    # arrange
+    async def http_post(**kwargs):
+        await asyncio.sleep(0.01)
+        raise ValueError("Failed to image_moderation")
+
+    patched = mocker.patch(
+        "azure_content_safety.services.content_safety.ContentSafety.http_post",
+        side_effect=http_post,
+    )
+
+    # act
+    results = await asyncio.gather(
+        *(content_safety.image_moderation("image") for _ in range(3)),
+        return_exceptions=True,
+    )
+
+    # assert
+    assert all(isinstance(result, ValueError) for result in results)
+    assert patched.call_count == 1
+
+
+@pytest.mark.asyncio
+async def test_text_moderation_stream(
+    mocker: MockerFixture, content_safety: ContentSafety
+):
+    # arrange
+    patched = mocker.patch(
+        "azure_content_safety.services.content_safety.ContentSafety.http_post",
+        return_value=TextModerationResponse(
+            blocklistsMatch=[],
+            categoriesAnalysis=[
+                ModerationResponseAnalysisItem(category="Hate", severity=2)
+            ],
+        )
+        .model_dump_json()
+        .encode(),
+    )
+
+    async def deltas():
+        for i in range(10):
+            yield f"token{i} "
+
+    # act
+    verdicts = [
+        verdict
+        async for verdict in content_safety.text_moderation_stream(
+            deltas(), categories=["Hate"], min_new_length=20, context_length=0
+        )
+    ]
+
+    # assert
+    assert [verdict.blocked for verdict in verdicts] == [False] * len(verdicts)
+    assert verdicts[-1].end == 70
+    assert patched.call_args.kwargs["json"]["categories"] == ["Hate"]
+
+
+def test_text_moderation_stream_err(content_safety: ContentSafety):
+    with pytest.raises(ValueError, match="window_length must be at most 10000"):
+        content_safety.text_moderation_stream(MagicMock(), window_length=20_000)
+
+
+@pytest.mark.asyncio
+async def test_detect_groundedness_text_too_long(
+    mocker: MockerFixture, content_safety: ContentSafety
+):
+    # arrange
+    http_post = mocker.patch(
+        "azure_content_safety.services.content_safety.ContentSafety.http_post"
+    )
+
+    # act
+    with pytest.raises(ValueError, match="maximum is 7500"):
+        await content_safety.detect_groundedness("x" * 7_501, ["document"])
+
+    # assert
+    http_post.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_detect_groundedness_shards_long_sources(
+    mocker: MockerFixture, content_safety: ContentSafety
+):
+    # arrange
+    responses = [
+        DetectGroundednessResponse(
+            ungroundedDetected=True,
+            ungroundedPercentage=0.5,
+            ungroundedDetails=[
+                DetectedGroundednessResponseDetails(text="a."),
+                DetectedGroundednessResponseDetails(text=text),
+            ],
+        )
+        for text in ["b.", "c."]
+    ]
+    http_post = mocker.patch(
+        "azure_content_safety.services.content_safety.ContentSafety.http_post",
+        side_effect=[r.model_dump_json().encode() for r in responses],
+    )
+
+    # act
+    result = await content_safety.detect_groundedness(
+        "a. b.", ["x" * 40_000, "y" * 30_000, "x" * 40_000]
+    )
+
+    # assert
+    assert http_post.call_count == 2
+    sources = [call.args[2]["groundingSources"] for call in http_post.call_args_list]
+    assert sorted(map(len, sources)) == [1, 1]
+    assert result.ungroundedDetected
+    assert [d.text for d in result.ungroundedDetails] == ["a."]
+
+
+@pytest.mark.asyncio
+async def test_http_send_hedges_slow_requests(
+    mocker: MockerFixture, content_safety: ContentSafety
+):
+    # arrange
+    content_safety.hedging = Hedging(
+        percentile=50, min_samples=1, min_delay_s=0.0, max_ratio=1.0
+    )
+    content_safety.hedging.record("text_moderation", 0.01)
+
+    delays = [10.0, 0.0]
+
+    async def send(*args) -> bytes:
+        await asyncio.sleep(delays.pop(0))
+        return b"{}"
+
+    mocker.patch.object(content_safety, "_send", side_effect=send)
+
+    # act
+    result = await content_safety.http_post("text_moderation", "url", {})
+
+    # assert
+    assert result == b"{}"
+    assert content_safety.hedging.snapshot()["text_moderation"]["won"] == 1
+
+
+@pytest.mark.parametrize(
+    "fn_name, body",
+    [
+        ("add_or_update_blocklist_items", b"{}"),
+        ("image_moderation", ImagePayload(io.BytesIO(b"image"))),
+    ],
+)
+@pytest.mark.asyncio
+async def test_http_send_does_not_hedge_blocklists_or_file_objects(
+    mocker: MockerFixture, content_safety: ContentSafety, fn_name: str, body
+):
+    # arrange
+    content_safety.hedging = Hedging(
+        percentile=50, min_samples=1, min_delay_s=0.0, max_ratio=1.0
+    )
+    content_safety.hedging.record(fn_name, 0.001)
+
+    async def send(*args) -> bytes:
+        await asyncio.sleep(0.01)
+        return b"{}"
+
+    patched = mocker.patch.object(content_safety, "_send", side_effect=send)
+
+    # act
+    result = await content_safety.http_send(fn_name, "url", body)
+
+    # assert
+    assert result == b"{}"
+    assert patched.call_count == 1
+    assert fn_name not in content_safety.hedging.snapshot()
+
+
+@pytest.mark.asyncio
+async def test_disk_cache_shared_by_clients(mocker: MockerFixture, tmp_path):
+    # arrange
+    env = ContentSafetyEnv(
+        azure_content_safety_endpoint="http://example.com",
+        azure_content_safety_key="key",
+        azure_content_safety_api_version="1.0",
+        azure_content_safety_disk_cache_path=str(tmp_path / "cache.db"),
+    )
+    response = PromptShieldResponse(
+        userPromptAnalysis=UserPromptAnalysis(attackDetected=True),
+        documentsAnalysis=[],
+    )
+    http_post = mocker.patch(
+        "azure_content_safety.services.content_safety.ContentSafety.http_post",
+        return_value=response.model_dump_json().encode(),
+    )
+
+    # act
+    first = await ContentSafety(logger=MagicMock(), env=env).prompt_shield("p", [])
+    second = await ContentSafety(logger=MagicMock(), env=env).prompt_shield("p", [])
+
+    # assert
+    assert first == second == response
+    assert http_post.call_count == 1
@@ -0,0 +1,129 @@
+import multiprocessing
+import sqlite3
+from pathlib import Path
+
+from azure_content_safety.services.disk_cache import DiskResponseCache
+from tests.conftest import FakeClock
+
+
+def _write(path: Path, worker: int) -> None:
+    cache = DiskResponseCache(path, busy_timeout_s=30, write_timeout_s=30)
+    for i in range(100):
+        cache.set(f"{worker}-{i}", f"{worker}-{i}".encode(), tags=[f"w{worker}"])
+
+
+def test_get_set_shared_between_instances(tmp_path: Path):
+    # arrange
+    writer = DiskResponseCache(tmp_path / "cache.db")
+    reader = DiskResponseCache(tmp_path / "cache.db")
+
+    # act
+    writer.set("a", b'{"value": 1}')
+
+    # assert
+    assert reader.get("a") == b'{"value": 1}'
+    assert reader.get("b") is None
+    assert reader.stats() == (1, 1, 0, 1)
+
+
+def test_namespace(tmp_path: Path):
+    # arrange
+    v1 = DiskResponseCache(tmp_path / "cache.db", namespace="v1")
+    v2 = DiskResponseCache(tmp_path / "cache.db", namespace="v2")
+
+    # act
+    v1.set("a", b"1")
+
+    # assert
+    assert v1.get("a") == b"1"
+    assert v2.get("a") is None
+
+
+def test_ttl(tmp_path: Path, clock: FakeClock):
+    # arrange
+    cache = DiskResponseCache(tmp_path / "cache.db", ttl=10, clock=clock)
+    cache.set("a", b"1")
+
+    # act
+    clock.now += 10
+
+    # assert
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_eviction(tmp_path: Path, clock: FakeClock):
+    # arrange
+    cache = DiskResponseCache(
+        tmp_path / "cache.db", max_entries=3, evict_every=5, clock=clock
+    )
+
+    # act
+    for i in range(5):
+        clock.now += 1
+        cache.set(str(i), str(i).encode(), tags=["t"])
+
+    # assert
+    assert [cache.get(str(i)) for i in range(5)] == [None, None, b"2", b"3", b"4"]
+    assert cache.evictions == 2
+    assert cache.invalidate("t") == 3
+
+
+def test_invalidate_and_clear(tmp_path: Path):
+    # arrange
+    cache = DiskResponseCache(tmp_path / "cache.db")
+    cache.set("a", b"1", tags=["blocklist:x", "blocklist:y"])
+    cache.set("b", b"2", tags=["blocklist:y"])
+    cache.set("c", b"3")
+
+    # act
+    removed = cache.invalidate("blocklist:x")
+
+    # assert
+    assert removed == 1
+    assert cache.get("a") is None
+    assert cache.invalidate("blocklist:y") == 1
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_set_drops_entry_while_locked(tmp_path: Path):
+    # arrange
+    cache = DiskResponseCache(tmp_path / "cache.db", write_timeout_s=0.01)
+    cache.set("a", b"1")
+    other = sqlite3.connect(tmp_path / "cache.db", isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+
+    # act
+    try:
+        cache.set("b", b"2")
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+
+    # assert
+    assert cache.dropped == 1
+    assert cache.get("a") == b"1"
+    assert cache.get("b") is None
+    cache.set("b", b"2")
+    assert cache.get("b") == b"2"
+
+
+def test_concurrent_writer_processes(tmp_path: Path):
+    # arrange
+    path = tmp_path / "cache.db"
+    context = multiprocessing.get_context("spawn")
+    workers = [context.Process(target=_write, args=(path, i)) for i in range(4)]
+
+    # act
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(60)
+
+    # assert
+    assert [worker.exitcode for worker in workers] == [0, 0, 0, 0]
+    cache = DiskResponseCache(path)
+    assert len(cache) == 400
+    assert cache.get("3-99") == b"3-99"
+    assert cache.invalidate("w2") == 100
@@ -0,0 +1,146 @@
+from collections import Counter
+
+import pytest
+
+from azure_content_safety.errors import ContentSafetyHttpError
+from azure_content_safety.services.endpoint_pool import (
+    EndpointConfig,
+    EndpointPool,
+    parse_endpoints,
+)
+from tests.conftest import FakeClock
+
+URL = "https://primary/contentsafety/text:analyze?api-version=1"
+BLOCKLIST_URL = "https://primary/contentsafety/text/blocklists/a?api-version=1"
+
+
+def make_pool(*weights: float, **kwargs) -> EndpointPool:
+    configs = [
+        EndpointConfig(url=f"https://e{i}/", key=f"k{i}", weight=weight)
+        for i, weight in enumerate(weights)
+    ]
+    return EndpointPool.from_configs(configs, "https://primary", **kwargs)
+
+
+def test_parse_endpoints():
+    # act
+    configs = parse_endpoints(
+        '[{"url": "https://a", "key": "k", "weight": 2, "tps": 10}]'
+    )
+
+    # assert
+    assert configs == [EndpointConfig(url="https://a", key="k", weight=2, tps=10)]
+    pool = EndpointPool.from_configs(configs, "https://primary")
+    assert pool.endpoints[0].name == "a"
+    assert pool.endpoints[0].rate_limiter is not None
+
+
+def test_invalid_pool():
+    with pytest.raises(ValueError):
+        make_pool()
+    with pytest.raises(ValueError):
+        make_pool(0)
+    with pytest.raises(ValueError):
+        make_pool(1, routing="random")  # type: ignore[arg-type]
+
+
+def test_url_for_rebases_on_endpoint():
+    # arrange
+    pool = make_pool(1)
+
+    # act
+    url = pool.url_for(pool.endpoints[0], URL)
+
+    # assert
+    assert url == "https://e0/contentsafety/text:analyze?api-version=1"
+
+
+def test_weighted_round_robin():
+    # arrange
+    pool = make_pool(3, 1, routing="weighted_round_robin")
+
+    # act
+    picks = [pool.pick(URL).name for _ in range(8)]
+
+    # assert
+    assert Counter(picks) == {"e0": 6, "e1": 2}
+    assert picks[:4] != ["e0", "e0", "e0", "e1"]
+
+
+def test_least_outstanding():
+    # arrange
+    pool = make_pool(1, 1)
+    busy = pool.endpoints[0]
+
+    # act
+    with pool.request(busy):
+        picks = {pool.pick(URL).name for _ in range(4)}
+
+    # assert
+    assert picks == {"e1"}
+    assert busy.outstanding == 0
+
+
+def test_pinned_and_tried():
+    # arrange
+    pool = make_pool(1, 1)
+
+    # act & assert
+    assert {pool.pick(BLOCKLIST_URL).name for _ in range(4)} == {"e0"}
+    assert not pool.can_fail_over(BLOCKLIST_URL, set())
+    assert pool.pick(URL, tried={"e0"}).name == "e1"
+    assert not pool.can_fail_over(URL, {"e0", "e1"})
+    assert pool.pick(URL, tried={"e0"}, pinned=True).name == "e0"
+    assert not pool.can_fail_over(URL, {"e0"}, pinned=True)
+
+
+def test_ejects_after_failures_and_readmits_on_probation(clock: FakeClock):
+    # arrange
+    pool = make_pool(1, 1, failure_threshold=2, eject_s=10, clock=clock)
+    bad = pool.endpoints[0]
+
+    # act
+    for _ in range(2):
+        with pytest.raises(ContentSafetyHttpError):
+            with pool.request(bad):
+                raise ContentSafetyHttpError("fn", 503, "unavailable")
+    with pytest.raises(ContentSafetyHttpError):
+        with pool.request(bad):
+            raise ContentSafetyHttpError("fn", 400, "bad request")
+
+    # assert
+    assert not pool.is_healthy(bad)
+    assert {pool.pick(URL).name for _ in range(4)} == {"e1"}
+    clock.now += 10
+    assert pool.is_healthy(bad)
+    pool.record_failure(bad)
+    assert not pool.is_healthy(bad)
+    assert pool.snapshot()["e0"]["ejections"] == 2
+
+
+def test_all_ejected_picks_first_to_recover(clock: FakeClock):
+    # arrange
+    pool = make_pool(1, 1, failure_threshold=1, eject_s=10, clock=clock)
+    pool.record_failure(pool.endpoints[1])
+    clock.now += 1
+    pool.record_failure(pool.endpoints[0])
+
+    # act
+    endpoint = pool.pick(URL)
+
+    # assert
+    assert endpoint.name == "e1"
+
+
+def test_ejects_slow_endpoint_while_another_is_healthy():
+    # arrange
+    pool = make_pool(1, 1, latency_threshold_s=0.5)
+    slow, fast = pool.endpoints
+
+    # act
+    pool.record_success(slow, 2.0)
+    pool.record_success(fast, 2.0)
+
+    # assert
+    assert not pool.is_healthy(slow)
+    assert pool.is_healthy(fast)
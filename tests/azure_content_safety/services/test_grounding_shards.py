@@ -0,0 +1,84 @@
+from azure_content_safety.models import (
+    DetectedGroundednessResponseDetails,
+    DetectGroundednessResponse,
+)
+from azure_content_safety.services.grounding_shards import (
+    merge_groundedness,
+    shard_sources,
+)
+
+
+def _response(percentage: float, *details: str) -> DetectGroundednessResponse:
+    return DetectGroundednessResponse(
+        ungroundedDetected=bool(details) or percentage > 0,
+        ungroundedPercentage=percentage,
+        ungroundedDetails=[
+            DetectedGroundednessResponseDetails(text=d) for d in details
+        ],
+    )
+
+
+def test_shard_sources_packs_first_fit_decreasing():
+    # act
+    shards = shard_sources(["aaaa", "bb", "cccccc", "dd", "bb", " "], 8)
+
+    # assert
+    assert shards == [["bb", "cccccc"], ["aaaa", "dd"]]
+
+
+def test_shard_sources_splits_long_sources():
+    # arrange
+    source = "First sentence. " * 10
+
+    # act
+    shards = shard_sources([source], 50)
+
+    # assert
+    assert len(shards) > 1
+    assert all(sum(len(s) for s in shard) <= 50 for shard in shards)
+    assert "".join(s for shard in shards for s in shard).split() == source.split()
+
+
+def test_shard_sources_empty():
+    assert shard_sources([], 10) == []
+    assert shard_sources(["", "  "], 10) == []
+
+
+def test_merge_groundedness_grounded_by_any_shard():
+    # act
+    result = merge_groundedness("a. b.", [_response(0.5, "a."), _response(0.0)])
+
+    # assert
+    assert result == _response(0.0)
+
+
+def test_merge_groundedness_intersects_details():
+    # arrange
+    text = "a. b. c. d."
+
+    # act
+    result = merge_groundedness(
+        text, [_response(0.5, "a.", "b."), _response(0.5, "c.", "b.")]
+    )
+
+    # assert
+    assert result.ungroundedDetected
+    assert [d.text for d in result.ungroundedDetails] == ["b."]
+    assert result.ungroundedPercentage == round(2 / len(text), 4)
+
+
+def test_merge_groundedness_disjoint_details_are_grounded():
+    # act
+    result = merge_groundedness("a. b.", [_response(0.5, "a."), _response(0.5, "b.")])
+
+    # assert
+    assert result == _response(0.0)
+
+
+def test_merge_groundedness_without_details():
+    # act
+    result = merge_groundedness("a. b.", [_response(0.8), _response(0.4)])
+
+    # assert
+    assert result.ungroundedDetected
+    assert result.ungroundedPercentage == 0.4
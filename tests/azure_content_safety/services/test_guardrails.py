@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+
+from azure_content_safety.models import (
+    DetectProtectedMaterialResponse,
+    DocumentAnalysis,
+    ModerationResponseAnalysisItem,
+    PromptShieldResponse,
+    TextModerationResponse,
+    UserPromptAnalysis,
+)
+from azure_content_safety.services.guardrails import GuardrailPolicy, run_guardrails
+
+
+def prompt_shield_response(attack: bool) -> PromptShieldResponse:
+    return PromptShieldResponse(
+        userPromptAnalysis=UserPromptAnalysis(attackDetected=attack),
+        documentsAnalysis=[DocumentAnalysis(attackDetected=False)],
+    )
+
+
+def text_moderation_response(severity: int) -> TextModerationResponse:
+    return TextModerationResponse(
+        blocklistsMatch=[],
+        categoriesAnalysis=[
+            ModerationResponseAnalysisItem(category="Hate", severity=severity)
+        ],
+    )
+
+
+def returning(result, delay: float = 0.0):
+    async def check():
+        await asyncio.sleep(delay)
+        return result
+
+    return check
+
+
+@pytest.mark.parametrize(
+    "result, blocked",
+    [
+        (text_moderation_response(2), False),
+        (text_moderation_response(4), True),
+        (prompt_shield_response(False), False),
+        (prompt_shield_response(True), True),
+        (
+            DetectProtectedMaterialResponse(
+                protectedMaterialAnalysis={"detected": True}
+            ),
+            True,
+        ),
+        (ValueError("failed"), True),
+        ("unknown", False),
+    ],
+)
+def test_policy(result, blocked: bool):
+    assert GuardrailPolicy()("check", result) is blocked
+
+
+def test_policy_rules_and_fail_open():
+    # arrange
+    policy = GuardrailPolicy(
+        block_on_error=False,
+        rules={"text": lambda r: r.categoriesAnalysis[0].severity > 0},
+    )
+
+    # assert
+    assert policy("text", text_moderation_response(2))
+    assert not policy("other", ValueError("failed"))
+
+
+@pytest.mark.asyncio
+async def test_run_guardrails_passes():
+    # act
+    verdict = await run_guardrails(
+        {
+            "prompt_shield": returning(prompt_shield_response(False), 0.01),
+            "text_moderation": returning(text_moderation_response(0)),
+        },
+        GuardrailPolicy(),
+    )
+
+    # assert
+    assert not verdict.blocked
+    assert verdict.decided_by is None
+    assert list(verdict.checks) == ["prompt_shield", "text_moderation"]
+    assert verdict.checks["prompt_shield"].duration_s >= 0.01
+    assert not any(check.cancelled for check in verdict.checks.values())
+
+
+@pytest.mark.asyncio
+async def test_run_guardrails_cancels_on_block():
+    # arrange
+    cancelled = asyncio.Event()
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    # act
+    verdict = await run_guardrails(
+        {"slow": slow, "text_moderation": returning(text_moderation_response(6))},
+        GuardrailPolicy(),
+    )
+
+    # assert
+    assert verdict.blocked
+    assert verdict.decided_by == "text_moderation"
+    assert verdict.checks["slow"].cancelled
+    assert verdict.checks["slow"].result is None
+    assert verdict.duration_s < 1
+    assert cancelled.is_set()
+
+
+@pytest.mark.asyncio
+async def test_run_guardrails_error():
+    # arrange
+    async def failing():
+        raise ValueError("failed")
+
+    # act
+    closed = await run_guardrails({"failing": failing}, GuardrailPolicy())
+    opened = await run_guardrails(
+        {"failing": failing}, GuardrailPolicy(block_on_error=False)
+    )
+
+    # assert
+    assert closed.decided_by == "failing"
+    assert isinstance(closed.checks["failing"].error, ValueError)
+    assert not opened.blocked
@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+from azure_content_safety.services.hedging import Hedging, LatencyWindow
+from azure_content_safety.services.instrumentation import Instrumentation
+
+
+def test_latency_window_percentile():
+    # arrange
+    window = LatencyWindow(size=100, refresh_every=1)
+
+    # act
+    for i in range(1, 201):
+        window.record(i / 1000)
+
+    # assert
+    assert len(window.samples) == 100
+    assert window.percentile(50) == 0.15
+    assert window.percentile(100) == 0.2
+
+
+def make_hedging() -> Hedging:
+    hedging = Hedging(percentile=50, min_samples=2, min_delay_s=0.0, max_ratio=1.0)
+    hedging.record("op", 0.01)
+    hedging.record("op", 0.01)
+    return hedging
+
+
+@pytest.mark.asyncio
+async def test_hedge_wins_and_primary_is_cancelled():
+    # arrange
+    hedging = make_hedging()
+    hedging.instrumentation = instrumentation = Instrumentation()
+    cancelled = asyncio.Event()
+
+    async def send(hedge: bool) -> str:
+        if hedge:
+            return "hedge"
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return "primary"
+
+    # act
+    result = await hedging.run("op", send)
+
+    # assert
+    assert result == "hedge"
+    assert cancelled.is_set()
+    assert hedging.snapshot()["op"] == {
+        "requests": 1,
+        "hedged": 1,
+        "won": 1,
+        "delay_s": 0.01,
+    }
+    registry = instrumentation.registry
+    assert registry.counter("hedge_requests_total", operation="op") == 1
+    assert registry.counter("hedged_total", operation="op") == 1
+    assert registry.counter("hedge_won_total", operation="op") == 1
+    assert registry.gauge("hedge_delay_seconds", operation="op") == 0.01
+
+
+@pytest.mark.asyncio
+async def test_no_hedge_for_fast_requests_or_without_samples():
+    # arrange
+    hedging = make_hedging()
+    calls: list[bool] = []
+
+    async def send(hedge: bool) -> str:
+        calls.append(hedge)
+        return "primary"
+
+    # act
+    fast = await hedging.run("op", send)
+    unknown = await hedging.run("other", send)
+
+    # assert
+    assert (fast, unknown) == ("primary", "primary")
+    assert calls == [False, False]
+    assert hedging.snapshot()["other"]["delay_s"] is None
+
+
+@pytest.mark.asyncio
+async def test_hedge_falls_back_to_the_other_request_on_error():
+    # arrange
+    hedging = make_hedging()
+
+    async def send(hedge: bool) -> str:
+        if hedge:
+            raise TimeoutError()
+        await asyncio.sleep(0.05)
+        return "primary"
+
+    # act
+    result = await hedging.run("op", send)
+
+    # assert
+    assert result == "primary"
+    assert hedging.snapshot()["op"]["won"] == 0
+
+
+@pytest.mark.asyncio
+async def test_hedges_are_limited_by_budget():
+    # arrange
+    hedging = make_hedging()
+    hedging.max_ratio = 0.0
+    calls: list[bool] = []
+
+    async def send(hedge: bool) -> str:
+        calls.append(hedge)
+        await asyncio.sleep(0.03)
+        return "primary"
+
+    # act
+    await hedging.run("op", send)
+
+    # assert
+    assert calls == [False]
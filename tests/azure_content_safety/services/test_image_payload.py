@@ -0,0 +1,141 @@
+import base64
+import io
+import json
+import os
+from pathlib import Path
+from typing import BinaryIO, cast
+from unittest.mock import MagicMock
+
+import pytest
+
+from azure_content_safety.services.content_safety import ContentSafety, ContentSafetyEnv
+from azure_content_safety.services.image_payload import ImagePayload
+from azure_content_safety.testing.fake_content_safety import FakeContentSafetyServer
+
+IMAGE = os.urandom(1000)
+OPTIONS = {"outputType": "FourSeverityLevels", "categories": ["Hate"]}
+EXPECTED = {"image": {"content": base64.b64encode(IMAGE).decode()}, **OPTIONS}
+
+
+class OneShotReader(io.RawIOBase):
+    """A non-seekable stream returning short, unaligned reads."""
+
+    def __init__(self, data: bytes):
+        self._data = data
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        chunk, self._data = self._data[:7], self._data[7:]
+        return chunk
+
+
+def one_shot_reader(data: bytes) -> BinaryIO:
+    # BinaryIO is nominal for type checkers, which io.RawIOBase does not declare
+    return cast(BinaryIO, OneShotReader(data))
+
+
+def body_of(payload: ImagePayload) -> bytes:
+    return b"".join(payload.chunks())
+
+
+@pytest.mark.parametrize(
+    "source",
+    [IMAGE, bytearray(IMAGE), memoryview(IMAGE)],
+    ids=["bytes", "bytearray", "memoryview"],
+)
+def test_buffers(source):
+    # arrange
+    payload = ImagePayload(source, OPTIONS, chunk_size=30)
+
+    # act
+    body = body_of(payload)
+
+    # assert
+    assert json.loads(body) == EXPECTED
+    assert payload.content_length == len(body)
+    assert body_of(payload) == body
+
+
+def test_path(tmp_path: Path):
+    # arrange
+    path = tmp_path / "image.jpg"
+    path.write_bytes(IMAGE)
+    payload = ImagePayload(path, OPTIONS)
+
+    # act
+    body = body_of(payload)
+
+    # assert
+    assert json.loads(body) == EXPECTED
+    assert payload.content_length == len(body)
+    assert payload.replayable
+
+
+def test_seekable_file():
+    # arrange
+    f = io.BytesIO(b"header" + IMAGE)
+    f.seek(6)
+    payload = ImagePayload(f, OPTIONS, chunk_size=30)
+
+    # act
+    first = body_of(payload)
+    second = body_of(payload)
+
+    # assert
+    assert json.loads(first) == EXPECTED
+    assert first == second
+    assert payload.digest() == ImagePayload(IMAGE).digest()
+
+
+def test_one_shot_file():
+    # arrange
+    payload = ImagePayload(one_shot_reader(IMAGE), OPTIONS)
+
+    # act
+    body = body_of(payload)
+
+    # assert
+    assert json.loads(body) == EXPECTED
+    assert not payload.replayable
+    assert payload.content_length is None
+    with pytest.raises(ValueError, match="cannot hash"):
+        payload.digest()
+
+
+def test_no_options():
+    assert json.loads(body_of(ImagePayload(b"abc"))) == {"image": {"content": "YWJj"}}
+
+
+@pytest.mark.asyncio
+async def test_image_moderation_raw(tmp_path: Path):
+    # arrange
+    path = tmp_path / "image.jpg"
+    path.write_bytes(IMAGE)
+
+    async with FakeContentSafetyServer() as server:
+        content_safety = ContentSafety(
+            logger=MagicMock(),
+            env=ContentSafetyEnv(
+                azure_content_safety_endpoint=server.url,
+                azure_content_safety_key=server.config.key,
+                azure_content_safety_api_version="2024-09-01",
+                azure_content_safety_cache_max_entries=10,
+            ),
+        )
+        async with content_safety:
+            # act
+            encoded = await content_safety.image_moderation(
+                base64.b64encode(IMAGE).decode(), ["Hate"]
+            )
+            from_path = await content_safety.image_moderation(path, ["Hate"])
+            from_bytes = await content_safety.image_moderation(IMAGE, ["Hate"])
+            from_file = await content_safety.image_moderation(
+                one_shot_reader(IMAGE), ["Hate"]
+            )
+
+    # assert
+    assert encoded == from_path == from_bytes == from_file
+    # the path and the bytes have the same content address
+    assert server.requests["image:analyze"] == 3
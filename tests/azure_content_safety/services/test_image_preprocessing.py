@@ -0,0 +1,194 @@
+import base64
+import io
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+from pytest_mock import MockerFixture
+
+from azure_content_safety.models import ImageModerationResponse
+from azure_content_safety.services.content_safety import ContentSafety, ContentSafetyEnv
+from azure_content_safety.services.image_preprocessing import (
+    ImagePreprocessor,
+    PreparedImage,
+    prepare_image,
+)
+from azure_content_safety.services.response_cache import ResponseCache
+
+IMAGE = os.urandom(1000)
+OPTIONS = {"outputType": "FourSeverityLevels", "categories": ["Hate"]}
+RESPONSE = ImageModerationResponse(categoriesAnalysis=[])
+
+
+@pytest.fixture
+def preprocessor():
+    with ThreadPoolExecutor(2) as executor:
+        yield ImagePreprocessor(executor=executor, queue_size=2)
+
+
+@pytest.fixture
+def content_safety():
+    return ContentSafety(
+        logger=MagicMock(),
+        env=ContentSafetyEnv(
+            azure_content_safety_endpoint="http://example.com",
+            azure_content_safety_key="key",
+            azure_content_safety_api_version="1.0",
+        ),
+    )
+
+
+async def collect(preprocessor: ImagePreprocessor, images) -> list:
+    return [item async for item in preprocessor.prepare_many(images, OPTIONS)]
+
+
+def test_prepare_image_raw(tmp_path: Path):
+    # arrange
+    path = tmp_path / "image.png"
+    path.write_bytes(IMAGE)
+
+    # act
+    from_bytes = prepare_image(IMAGE, OPTIONS, None)
+    from_path = prepare_image(path, OPTIONS, None)
+
+    # assert
+    assert from_bytes == from_path
+    assert json.loads(from_bytes.body) == {
+        "image": {"content": base64.b64encode(IMAGE).decode()},
+        **OPTIONS,
+    }
+    assert not from_bytes.resized
+
+
+def test_prepare_image_base64():
+    # arrange
+    image = base64.b64encode(IMAGE).decode()
+
+    # act
+    prepared = prepare_image(image, OPTIONS, None)
+
+    # assert
+    assert json.loads(prepared.body) == {"image": {"content": image}, **OPTIONS}
+    assert prepared.cache_key != prepare_image(IMAGE, OPTIONS, None).cache_key
+
+
+def test_prepare_image_resize_requires_pillow(mocker: MockerFixture):
+    # arrange
+    mocker.patch.dict(sys.modules, {"PIL": None})
+
+    # act / assert
+    with pytest.raises(ImportError, match="pip install pillow"):
+        prepare_image(IMAGE, OPTIONS, 512)
+
+
+def test_queue_size_must_be_positive():
+    with pytest.raises(ValueError):
+        ImagePreprocessor(queue_size=0)
+
+
+@pytest.mark.asyncio
+async def test_prepare_many_in_order(preprocessor: ImagePreprocessor):
+    # arrange
+    images = [os.urandom(100 + i) for i in range(10)]
+
+    # act
+    items = await collect(preprocessor, images)
+
+    # assert
+    assert items == [prepare_image(image, OPTIONS, None) for image in images]
+
+
+@pytest.mark.asyncio
+async def test_prepare_many_reads_file_objects(preprocessor: ImagePreprocessor):
+    # act
+    items = await collect(preprocessor, [io.BytesIO(IMAGE), bytearray(IMAGE)])
+
+    # assert
+    assert items == [prepare_image(IMAGE, OPTIONS, None)] * 2
+
+
+@pytest.mark.asyncio
+async def test_prepare_many_carries_errors(
+    preprocessor: ImagePreprocessor, tmp_path: Path
+):
+    # act
+    items = await collect(preprocessor, [IMAGE, tmp_path / "missing.png", IMAGE])
+
+    # assert
+    assert isinstance(items[0], PreparedImage)
+    assert isinstance(items[1], FileNotFoundError)
+    assert isinstance(items[2], PreparedImage)
+
+
+@pytest.mark.asyncio
+async def test_prepare_many_reads_ahead_by_queue_size(
+    preprocessor: ImagePreprocessor,
+):
+    # arrange
+    read: list[int] = []
+
+    def images():
+        for i in range(100):
+            read.append(i)
+            yield IMAGE
+
+    # act
+    items = preprocessor.prepare_many(images(), OPTIONS)
+    await anext(items)
+    await items.aclose()
+
+    # assert
+    assert len(read) <= preprocessor.queue_size + 2
+
+
+@pytest.mark.asyncio
+async def test_prepare_many_process_pool():
+    # arrange
+    preprocessor = ImagePreprocessor(max_workers=1)
+
+    # act
+    try:
+        items = await collect(preprocessor, [IMAGE])
+    finally:
+        preprocessor.close()
+
+    # assert
+    assert items == [prepare_image(IMAGE, OPTIONS, None)]
+    assert preprocessor.executor is None
+
+
+@pytest.mark.asyncio
+async def test_image_moderation_many_preprocessor(
+    mocker: MockerFixture,
+    content_safety: ContentSafety,
+    preprocessor: ImagePreprocessor,
+):
+    # arrange
+    content_safety.cache = ResponseCache()
+    patched = mocker.patch(
+        "azure_content_safety.services.content_safety.ContentSafety.http_send",
+        return_value=RESPONSE.model_dump_json().encode(),
+    )
+    await content_safety.image_moderation(IMAGE, categories=["Hate"])
+    image = base64.b64encode(os.urandom(10)).decode()
+    await content_safety.image_moderation(image, categories=["Hate"])
+
+    # act
+    items = [
+        item
+        async for item in content_safety.image_moderation_many(
+            [IMAGE, image, os.urandom(10), Path("missing.png")],
+            categories=["Hate"],
+            preprocessor=preprocessor,
+        )
+    ]
+
+    # assert
+    assert [item.result for item in items[:3]] == [RESPONSE] * 3
+    assert isinstance(items[3].error, FileNotFoundError)
+    # the first two images are answered from the entries of image_moderation
+    assert patched.call_count == 3
@@ -0,0 +1,177 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from azure_content_safety.protocols.i_instrumentation import RequestTimings
+from azure_content_safety.services.content_safety import ContentSafety, ContentSafetyEnv
+from azure_content_safety.services.instrumentation import (
+    Histogram,
+    Instrumentation,
+    MetricsRegistry,
+    instrumented,
+    nearest_rank,
+)
+from azure_content_safety.testing.fake_content_safety import FakeContentSafetyServer
+
+
+def test_histogram():
+    # arrange
+    histogram = Histogram(buckets=[1, 2, 4, 8])
+
+    # act
+    for value in [0.5, 1.5, 1.5, 3, 100]:
+        histogram.observe(value)
+
+    # assert
+    assert histogram.counts == [1, 2, 1, 0, 1]
+    assert histogram.count == 5
+    assert histogram.sum == 106.5
+    assert histogram.percentile(50) == 2
+    assert histogram.percentile(99) == 100
+    assert histogram.snapshot()["min"] == 0.5
+
+
+def test_nearest_rank():
+    # arrange
+    ordered = [float(value) for value in range(1, 21)]
+
+    # assert
+    assert nearest_rank(ordered, 50) == 10
+    assert nearest_rank(ordered, 95) == 19
+    assert nearest_rank(ordered, 100) == 20
+    assert nearest_rank(ordered, 0) == 1
+    assert nearest_rank([], 50) == 0.0
+
+
+def test_histogram_empty():
+    assert Histogram().snapshot() == {
+        "count": 0,
+        "sum": 0.0,
+        "min": 0.0,
+        "max": 0.0,
+        "p50": 0.0,
+        "p95": 0.0,
+        "p99": 0.0,
+    }
+
+
+def test_metrics_registry():
+    # arrange
+    registry = MetricsRegistry()
+
+    # act
+    registry.increment("requests_total", operation="a", status="200")
+    registry.increment("requests_total", operation="a", status="200")
+    registry.observe("latency", 0.1, operation="a")
+    registry.set_gauge("limit", 4)
+    registry.set_gauge("limit", 2)
+
+    # assert
+    assert registry.counter("requests_total", status="200", operation="a") == 2
+    assert registry.counter("requests_total", operation="b") == 0
+    snapshot = registry.snapshot()
+    assert snapshot["requests_total"] == [
+        {"labels": {"operation": "a", "status": "200"}, "value": 2}
+    ]
+    assert snapshot["latency"][0]["count"] == 1
+    assert registry.gauge("limit") == 2
+    assert registry.gauge("missing") is None
+    assert snapshot["limit"] == [{"labels": {}, "value": 2}]
+
+
+def test_record_request():
+    # arrange
+    instrumentation = Instrumentation()
+
+    # act
+    instrumentation.record_request(
+        RequestTimings("op", attempt=1, status=429, ttfb_s=0.01, request_bytes=100)
+    )
+
+    # assert
+    registry = instrumentation.registry
+    assert registry.counter("requests_total", operation="op", status="429") == 1
+    assert registry.counter("retries_total", operation="op") == 1
+    assert registry.histogram("ttfb_seconds", operation="op").sum == 0.01
+    assert registry.histogram("request_bytes", operation="op").sum == 100
+
+
+def test_span():
+    # arrange
+    spans = []
+    instrumentation = Instrumentation(
+        on_span_start=lambda operation: operation,
+        on_span_end=lambda handle, seconds, error: spans.append((handle, error)),
+    )
+
+    # act
+    with instrumentation.span("ok"):
+        pass
+    with pytest.raises(ValueError):
+        with instrumentation.span("failed"):
+            raise ValueError("failed")
+
+    # assert
+    assert spans[0] == ("ok", None)
+    assert spans[1][0] == "failed"
+    assert isinstance(spans[1][1], ValueError)
+    registry = instrumentation.registry
+    assert registry.histogram("call_seconds", operation="ok").count == 1
+    assert registry.counter("call_errors_total", operation="failed", error="ValueError")
+
+
+@pytest.mark.asyncio
+async def test_instrumented_disabled():
+    # arrange
+    class Client:
+        instrumentation = None
+
+        @instrumented("call")
+        async def call(self, value: int) -> int:
+            return value
+
+    # act
+    result = await Client().call(1)
+
+    # assert
+    assert result == 1
+
+
+@pytest.mark.asyncio
+async def test_content_safety_instrumentation():
+    # arrange
+    async with FakeContentSafetyServer() as server:
+        content_safety = ContentSafety(
+            logger=MagicMock(),
+            env=ContentSafetyEnv(
+                azure_content_safety_endpoint=server.url,
+                azure_content_safety_key=server.config.key,
+                azure_content_safety_api_version="2024-09-01",
+                azure_content_safety_instrumentation=True,
+            ),
+        )
+
+        # act
+        async with content_safety:
+            await content_safety.text_moderation("hello")
+            await content_safety.text_moderation("world")
+
+    # assert
+    assert isinstance(content_safety.instrumentation, Instrumentation)
+    registry = content_safety.instrumentation.registry
+    assert (
+        registry.counter("requests_total", operation="text_moderation", status="200")
+        == 2
+    )
+    for name in [
+        "connection_acquire_seconds",
+        "ttfb_seconds",
+        "body_read_seconds",
+        "validation_seconds",
+        "call_seconds",
+    ]:
+        histogram = registry.histogram(name, operation="text_moderation")
+        assert histogram.count == 2, name
+        assert histogram.sum > 0, name
+    assert registry.histogram("request_bytes", operation="text_moderation").min > 0
+    assert registry.histogram("response_bytes", operation="text_moderation").min > 0
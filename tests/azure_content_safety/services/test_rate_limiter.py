@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+from pytest_mock import MockerFixture
+
+from azure_content_safety.services.rate_limiter import TokenBucket
+from tests.conftest import FakeClock
+
+
+@pytest.mark.asyncio
+async def test_token_bucket(mocker: MockerFixture, clock: FakeClock):
+    # arrange
+    async def sleep(delay: float):
+        clock.now += delay
+
+    mocker.patch("asyncio.sleep", side_effect=sleep)
+    bucket = TokenBucket(rate=10, capacity=2, clock=clock)
+
+    # act
+    waits = [await bucket.acquire() for _ in range(4)]
+
+    # assert
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] == pytest.approx(0.1)
+    assert waits[3] == pytest.approx(0.1)
+    assert clock.now == pytest.approx(0.2)
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_refill(mocker: MockerFixture, clock: FakeClock):
+    # arrange
+    bucket = TokenBucket(rate=1, capacity=1, clock=clock)
+    await bucket.acquire()
+
+    # act
+    clock.now = 5
+    waited = await bucket.acquire()
+
+    # assert
+    assert waited == 0.0
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_cancelled_waiter(clock: FakeClock):
+    # arrange
+    bucket = TokenBucket(rate=10, capacity=1, clock=clock)
+    await bucket.acquire()
+
+    # act
+    first = asyncio.create_task(bucket.acquire())
+    second = asyncio.create_task(bucket.acquire())
+    await asyncio.sleep(0)
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    clock.now = 0.1
+    waited = await bucket.acquire()
+    second.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await second
+
+    # assert
+    assert waited == pytest.approx(0.1)
+
+
+def test_token_bucket_err():
+    with pytest.raises(ValueError, match="rate must be positive"):
+        TokenBucket(rate=0, capacity=1)
+
+    with pytest.raises(ValueError, match="capacity must be at least 1"):
+        TokenBucket(rate=1, capacity=0.5)
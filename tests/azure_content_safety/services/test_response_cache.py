@@ -0,0 +1,120 @@
+import pytest
+
+from azure_content_safety.services.response_cache import (
+    ResponseCache,
+    blocklist_tag,
+    make_cache_key,
+)
+from tests.conftest import FakeClock
+
+
+def test_make_cache_key():
+    # act
+    key = make_cache_key("text_moderation", {"text": "a", "outputType": "x"})
+
+    # assert
+    assert key == make_cache_key("text_moderation", {"outputType": "x", "text": "a"})
+    assert key != make_cache_key("image_moderation", {"text": "a", "outputType": "x"})
+    assert key != make_cache_key("text_moderation", {"text": "a", "outputType": "y"})
+
+
+def test_make_cache_key_sorts_unordered_fields():
+    # act
+    key = make_cache_key(
+        "text_moderation",
+        {"text": "a", "categories": ["Hate", "Violence"], "blocklistNames": ["b", "a"]},
+    )
+
+    # assert
+    assert key == make_cache_key(
+        "text_moderation",
+        {"text": "a", "categories": ["Violence", "Hate"], "blocklistNames": ["a", "b"]},
+    )
+    assert key != make_cache_key(
+        "text_moderation", {"text": "a", "categories": ["Hate"], "blocklistNames": []}
+    )
+
+
+def test_get_set():
+    # arrange
+    cache = ResponseCache(max_entries=2)
+
+    # act
+    cache.set("a", b"1")
+
+    # assert
+    assert cache.get("a") == b"1"
+    assert cache.get("b") is None
+    assert cache.stats() == (1, 1, 0, 1)
+
+
+def test_lru_eviction():
+    # arrange
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", b"1")
+    cache.set("b", b"2")
+
+    # act
+    cache.get("a")
+    cache.set("c", b"3")
+
+    # assert
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1"
+    assert cache.get("c") == b"3"
+    assert cache.evictions == 1
+    assert len(cache) == 2
+
+
+def test_ttl(clock: FakeClock):
+    # arrange
+    cache = ResponseCache(ttl=10, clock=clock)
+    cache.set("a", b"1")
+
+    # act
+    clock.now = 9.9
+    before = cache.get("a")
+    clock.now = 10
+    after = cache.get("a")
+
+    # assert
+    assert before == b"1"
+    assert after is None
+    assert len(cache) == 0
+
+
+def test_invalidate():
+    # arrange
+    cache = ResponseCache()
+    cache.set("a", b"1", [blocklist_tag("x")])
+    cache.set("b", b"2", [blocklist_tag("x"), blocklist_tag("y")])
+    cache.set("c", b"3", [blocklist_tag("y")])
+
+    # act
+    removed = cache.invalidate(blocklist_tag("x"))
+
+    # assert
+    assert removed == 2
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+    assert cache.get("c") == b"3"
+    assert cache.invalidate(blocklist_tag("y")) == 1
+    assert cache.invalidate(blocklist_tag("unknown")) == 0
+
+
+def test_clear():
+    # arrange
+    cache = ResponseCache()
+    cache.set("a", b"1", ["tag"])
+
+    # act
+    cache.clear()
+
+    # assert
+    assert len(cache) == 0
+    assert cache.invalidate("tag") == 0
+
+
+def test_max_entries_err():
+    with pytest.raises(ValueError, match="max_entries must be at least 1"):
+        ResponseCache(max_entries=0)
@@ -0,0 +1,59 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+from azure_content_safety.services.retry import RetryPolicy, parse_retry_after
+
+
+def test_parse_retry_after():
+    # arrange
+    now = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+    date = format_datetime(datetime(2024, 1, 1, 0, 0, 7, tzinfo=timezone.utc), True)
+
+    # assert
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("") is None
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after(date, now=now) == 7.0
+    assert parse_retry_after("not a date") is None
+
+
+def test_backoff():
+    # arrange
+    policy = RetryPolicy(backoff_base=0.5, backoff_max=3.0, random=lambda: 1.0)
+
+    # assert
+    assert [policy.backoff(attempt) for attempt in range(4)] == [0.5, 1.0, 2.0, 3.0]
+    assert policy.backoff(0, "2") == 2.0
+    assert policy.backoff(0, "60") == 3.0
+
+
+def test_is_retryable():
+    policy = RetryPolicy()
+
+    assert policy.is_retryable(429)
+    assert policy.is_retryable(503)
+    assert not policy.is_retryable(400)
+
+
+def test_retry_budget():
+    # arrange
+    policy = RetryPolicy(max_retries=5, budget_ratio=0.5, budget_max=2.0)
+
+    # act
+    allowed = [policy.try_acquire_retry("op", attempt) for attempt in range(3)]
+    policy.record_request("op")
+    policy.record_request("op")
+
+    # assert
+    assert allowed == [True, True, False]
+    assert policy.budget("op") == 1.0
+    assert policy.budget("other") == 2.0
+    assert policy.try_acquire_retry("op", 0)
+
+
+def test_max_retries():
+    policy = RetryPolicy(max_retries=1)
+
+    assert policy.try_acquire_retry("op", 0)
+    assert not policy.try_acquire_retry("op", 1)
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from azure_content_safety.services.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_do_coalesces():
+    # arrange
+    single_flight = SingleFlight()
+    calls = 0
+
+    async def fn() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    # act
+    results = await asyncio.gather(*(single_flight.do("key", fn) for _ in range(3)))
+    after = await single_flight.do("key", fn)
+
+    # assert
+    assert results == [1, 1, 1]
+    assert after == 2
+    assert single_flight.coalesced == 2
+    assert len(single_flight) == 0
+
+
+@pytest.mark.asyncio
+async def test_do_shares_exception():
+    # arrange
+    single_flight = SingleFlight()
+
+    async def fn() -> int:
+        await asyncio.sleep(0.01)
+        raise ValueError("failed")
+
+    # act
+    results = await asyncio.gather(
+        *(single_flight.do("key", fn) for _ in range(2)), return_exceptions=True
+    )
+
+    # assert
+    assert all(isinstance(result, ValueError) for result in results)
+    assert results[0] is results[1]
+
+
+@pytest.mark.asyncio
+async def test_do_cancelled_caller():
+    # arrange
+    single_flight = SingleFlight()
+
+    async def fn() -> str:
+        await asyncio.sleep(0.01)
+        return "done"
+
+    leader = asyncio.create_task(single_flight.do("key", fn))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(single_flight.do("key", fn))
+    await asyncio.sleep(0)
+
+    # act
+    leader.cancel()
+    result = await follower
+
+    # assert
+    assert result == "done"
+    assert leader.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_do_cancels_call_with_last_caller():
+    # arrange
+    single_flight = SingleFlight()
+    cancelled = asyncio.Event()
+
+    async def fn() -> str:
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return "done"
+
+    callers = [asyncio.create_task(single_flight.do("key", fn)) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    # act
+    callers[0].cancel()
+    await asyncio.sleep(0)
+    still_running = not cancelled.is_set()
+    callers[1].cancel()
+    await asyncio.gather(*callers, return_exceptions=True)
+    await asyncio.sleep(0)
+
+    # assert
+    assert still_running
+    assert cancelled.is_set()
+    assert len(single_flight) == 0
@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from azure_content_safety.models import (
+    ModerationResponseAnalysisItem,
+    TextModerationResponse,
+)
+from azure_content_safety.services.stream_moderation import moderate_stream
+
+
+def response(severity: int = 0, blocklists: bool = False) -> TextModerationResponse:
+    return TextModerationResponse(
+        blocklistsMatch=[{"blocklistName": "list"}] if blocklists else [],
+        categoriesAnalysis=[
+            ModerationResponseAnalysisItem(category="Hate", severity=severity)
+        ],
+    )
+
+
+async def tokens(text: str, size: int = 5):
+    for i in range(0, len(text), size):
+        await asyncio.sleep(0)
+        yield text[i : i + size]
+
+
+async def collect(iterator) -> list:
+    return [item async for item in iterator]
+
+
+@pytest.mark.asyncio
+async def test_moderate_stream_windows():
+    # arrange
+    text = "".join(f"{i:04d}," for i in range(20))
+    sent: list[str] = []
+
+    async def moderate(window: str) -> TextModerationResponse:
+        sent.append(window)
+        return response()
+
+    # act
+    verdicts = await collect(
+        moderate_stream(
+            moderate,
+            tokens(text),
+            severity_threshold=4,
+            window_length=30,
+            min_new_length=20,
+            context_length=5,
+            max_in_flight=1,
+        )
+    )
+
+    # assert
+    assert not any(verdict.blocked for verdict in verdicts)
+    assert [text[v.start : v.end] for v in verdicts] == sent
+    assert all(len(window) <= 30 for window in sent)
+    assert verdicts[0].start == 0
+    assert verdicts[-1].end == len(text)
+    # only the context is sent twice, instead of every growing prefix
+    assert sum(len(window) for window in sent) < 2 * len(text)
+
+
+@pytest.mark.asyncio
+async def test_moderate_stream_blocks_and_closes_upstream():
+    # arrange
+    closed = False
+    produced = 0
+
+    async def upstream():
+        nonlocal closed, produced
+        try:
+            for i in range(1000):
+                produced += 1
+                await asyncio.sleep(0)
+                yield "bad " if i == 10 else "ok  "
+        finally:
+            closed = True
+
+    async def moderate(window: str) -> TextModerationResponse:
+        return response(severity=6 if "bad" in window else 0)
+
+    # act
+    verdicts = await collect(
+        moderate_stream(
+            moderate,
+            upstream(),
+            severity_threshold=4,
+            window_length=100,
+            min_new_length=8,
+            context_length=0,
+        )
+    )
+
+    # assert
+    assert verdicts[-1].blocked
+    assert not any(verdict.blocked for verdict in verdicts[:-1])
+    assert closed
+    assert produced < 1000
+
+
+@pytest.mark.asyncio
+async def test_moderate_stream_blocklist_blocks():
+    # arrange
+    async def moderate(window: str) -> TextModerationResponse:
+        return response(blocklists=True)
+
+    # act
+    verdicts = await collect(moderate_stream(moderate, tokens("a" * 50), 4, 20, 10, 0))
+
+    # assert
+    assert len(verdicts) == 1
+    assert verdicts[0].blocked
+
+
+@pytest.mark.asyncio
+async def test_moderate_stream_error():
+    # arrange
+    async def moderate(window: str) -> TextModerationResponse:
+        raise ValueError("Failed to text_moderation")
+
+    # act
+    with pytest.raises(ValueError, match="Failed to text_moderation"):
+        await collect(moderate_stream(moderate, tokens("a" * 50), 4, 20, 10, 0))
+
+
+@pytest.mark.asyncio
+async def test_moderate_stream_err():
+    async def moderate(window: str) -> TextModerationResponse:
+        return response()
+
+    with pytest.raises(ValueError, match="context_length must be between"):
+        await collect(moderate_stream(moderate, tokens("a"), 4, 10, 5, 10))
+
+    with pytest.raises(ValueError, match="min_new_length must be between"):
+        await collect(moderate_stream(moderate, tokens("a"), 4, 10, 9, 5))
@@ -0,0 +1,177 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import pytest
+from pytest_mock import MockerFixture
+
+from azure_content_safety.models import (
+    ModerationResponseAnalysisItem,
+    TextModerationResponse,
+)
+from azure_content_safety.services.content_safety import ContentSafety, ContentSafetyEnv
+from azure_content_safety.services.sync_content_safety import SyncContentSafety
+
+RESPONSE = TextModerationResponse(
+    blocklistsMatch=[],
+    categoriesAnalysis=[ModerationResponseAnalysisItem(category="Hate", severity=0)],
+)
+
+
+@pytest.fixture
+def client():
+    client = SyncContentSafety(
+        content_safety=ContentSafety(
+            logger=MagicMock(),
+            env=ContentSafetyEnv(
+                azure_content_safety_endpoint="http://example.com",
+                azure_content_safety_key="key",
+                azure_content_safety_api_version="1.0",
+            ),
+        )
+    )
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def http_post(mocker: MockerFixture):
+    threads: list[str] = []
+
+    async def http_post(fn_name: str, url: str, json: dict, pinned: bool) -> bytes:
+        threads.append(threading.current_thread().name)
+        return RESPONSE.model_dump_json().encode()
+
+    mocker.patch(
+        "azure_content_safety.services.content_safety.ContentSafety.http_post",
+        side_effect=http_post,
+    )
+    return threads
+
+
+def test_blocking_calls_share_one_loop(client: SyncContentSafety, http_post):
+    # act
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(
+            pool.map(lambda i: client.text_moderation(f"text {i}"), range(8))
+        )
+
+    # assert
+    assert results == [RESPONSE] * 8
+    assert set(http_post) == {"content-safety-loop"}
+
+
+def test_submit(client: SyncContentSafety, http_post):
+    # act
+    future = client.submit(client.content_safety.text_moderation, "text")
+
+    # assert
+    assert isinstance(future, Future)
+    assert future.result() == RESPONSE
+
+
+def test_future_variant(client: SyncContentSafety, http_post):
+    # act
+    futures = [client.text_moderation_future(f"text {i}") for i in range(4)]
+
+    # assert
+    assert all(isinstance(future, Future) for future in futures)
+    assert [future.result() for future in futures] == [RESPONSE] * 4
+    assert set(http_post) == {"content-safety-loop"}
+
+
+def test_text_moderation_many(client: SyncContentSafety, http_post):
+    # act
+    items = list(client.text_moderation_many(["a", "b", "c"]))
+
+    # assert
+    assert [item.index for item in items] == [0, 1, 2]
+    assert all(item.result == RESPONSE for item in items)
+
+
+def test_text_moderation_many_pulls_in_thread(client: SyncContentSafety, http_post):
+    # arrange
+    pulled: list[str] = []
+
+    def texts():
+        for text in ["a", "b"]:
+            pulled.append(threading.current_thread().name)
+            yield text
+
+    # act
+    items = list(client.text_moderation_many(texts()))
+
+    # assert
+    assert len(items) == 2
+    assert pulled and "content-safety-loop" not in pulled
+
+
+def test_text_moderation_stream(client: SyncContentSafety, http_post):
+    # arrange
+    def deltas():
+        yield from ["hello ", "world"]
+
+    # act
+    verdicts = list(client.text_moderation_stream(deltas()))
+
+    # assert
+    assert verdicts[-1].end == len("hello world")
+    assert not any(verdict.blocked for verdict in verdicts)
+
+
+def test_close_stops_loop_and_restarts(client: SyncContentSafety, http_post):
+    # arrange
+    client.text_moderation("text")
+    thread = client._thread
+    assert thread is not None
+
+    # act
+    client.close()
+    result = client.text_moderation("text")
+
+    # assert
+    assert not thread.is_alive()
+    assert result == RESPONSE
+    assert client._thread is not thread
+
+
+def test_blocking_call_on_loop_thread_raises(client: SyncContentSafety):
+    # act
+    async def nested() -> None:
+        client.run(client.content_safety.start)
+
+    # assert
+    with pytest.raises(RuntimeError):
+        client.run(nested)
+
+
+def test_restart_with_rate_limiter(mocker: MockerFixture):
+    # arrange
+    client = SyncContentSafety(
+        content_safety=ContentSafety(
+            logger=MagicMock(),
+            env=ContentSafetyEnv(
+                azure_content_safety_endpoint="http://example.com",
+                azure_content_safety_key="key",
+                azure_content_safety_api_version="1.0",
+                azure_content_safety_rate_limit_tps=1000,
+                azure_content_safety_rate_limit_burst=1,
+            ),
+        )
+    )
+    send = mocker.patch(
+        "azure_content_safety.services.content_safety.ContentSafety._send",
+        return_value=RESPONSE.model_dump_json().encode(),
+    )
+    futures = [client.text_moderation_future(f"text {i}") for i in range(4)]
+    assert [future.result() for future in futures] == [RESPONSE] * 4
+
+    # act
+    client.close()
+    futures = [client.text_moderation_future(f"again {i}") for i in range(4)]
+    results = [future.result() for future in futures]
+    client.close()
+
+    # assert
+    assert results == [RESPONSE] * 4
+    assert send.call_count == 8
@@ -0,0 +1,114 @@
+import pytest
+
+from azure_content_safety.models import (
+    ModerationResponseAnalysisItem,
+    TextModerationResponse,
+)
+from azure_content_safety.services.text_chunking import (
+    TextChunk,
+    merge_text_moderation,
+    split_text,
+)
+
+
+def test_split_text_short():
+    assert split_text("hello world", 100) == [TextChunk(0, "hello world")]
+
+
+def test_split_text_sentence_boundary():
+    # arrange
+    text = "One two three. Four five six. Seven eight nine."
+
+    # act
+    chunks = split_text(text, 32)
+
+    # assert
+    assert [chunk.text for chunk in chunks] == [
+        "One two three. Four five six. ",
+        "Seven eight nine.",
+    ]
+    assert "".join(chunk.text for chunk in chunks) == text
+    assert all(text[c.offset : c.offset + len(c.text)] == c.text for c in chunks)
+
+
+def test_split_text_whitespace_boundary():
+    # act
+    chunks = split_text("aaaa bbbb cccc dddd", 12)
+
+    # assert
+    assert [chunk.text for chunk in chunks] == ["aaaa bbbb ", "cccc dddd"]
+
+
+def test_split_text_hard_cut():
+    assert [chunk.text for chunk in split_text("abcdefghij", 4)] == [
+        "abcd",
+        "efgh",
+        "ij",
+    ]
+
+
+def test_split_text_overlap():
+    # arrange
+    text = "aaaa bbbb cccc dddd eeee"
+
+    # act
+    chunks = split_text(text, 12, overlap=6)
+
+    # assert
+    assert all(len(chunk.text) <= 12 for chunk in chunks)
+    assert [chunk.text for chunk in chunks] == [
+        "aaaa bbbb ",
+        "bbbb cccc ",
+        "cccc dddd ",
+        "dddd eeee",
+    ]
+    assert all(text[c.offset : c.offset + len(c.text)] == c.text for c in chunks)
+
+
+def test_split_text_err():
+    with pytest.raises(ValueError, match="max_length must be at least 1"):
+        split_text("text", 0)
+
+    with pytest.raises(ValueError, match="overlap must be between"):
+        split_text("text", 4, overlap=4)
+
+
+def test_merge_text_moderation():
+    # arrange
+    chunks = [TextChunk(0, "first"), TextChunk(100, "second")]
+    responses = [
+        TextModerationResponse(
+            blocklistsMatch=[
+                {"blocklistName": "list", "blocklistItemId": "1"},
+                {"blocklistName": "list", "blocklistItemId": "2", "offset": "3"},
+            ],
+            categoriesAnalysis=[
+                ModerationResponseAnalysisItem(category="Hate", severity=2),
+                ModerationResponseAnalysisItem(category="Violence", severity=4),
+            ],
+        ),
+        TextModerationResponse(
+            blocklistsMatch=[
+                {"blocklistName": "list", "blocklistItemId": "1"},
+                {"blocklistName": "list", "blocklistItemId": "2", "offset": "3"},
+            ],
+            categoriesAnalysis=[
+                ModerationResponseAnalysisItem(category="Hate", severity=6),
+                ModerationResponseAnalysisItem(category="Violence", severity=0),
+            ],
+        ),
+    ]
+
+    # act
+    result = merge_text_moderation(chunks, responses)
+
+    # assert
+    assert result.categoriesAnalysis == [
+        ModerationResponseAnalysisItem(category="Hate", severity=6),
+        ModerationResponseAnalysisItem(category="Violence", severity=4),
+    ]
+    assert result.blocklistsMatch == [
+        {"blocklistName": "list", "blocklistItemId": "1"},
+        {"blocklistName": "list", "blocklistItemId": "2", "offset": "3"},
+        {"blocklistName": "list", "blocklistItemId": "2", "offset": "103"},
+    ]
@@ -0,0 +1,197 @@
+import json
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from pytest_mock import MockerFixture
+
+from azure_content_safety.bulk import (
+    Checkpoint,
+    main,
+    open_output,
+    parse_args,
+    read_records,
+    run_bulk,
+)
+from azure_content_safety.models import DetectProtectedMaterialResponse
+from azure_content_safety.protocols.i_content_safety import IContentSafety
+
+
+def _content_safety() -> MagicMock:
+    async def detect(text: str) -> DetectProtectedMaterialResponse:
+        if text == "bad":
+            raise ValueError("boom")
+        return DetectProtectedMaterialResponse(
+            protectedMaterialAnalysis={"detected": text == "lyrics"}
+        )
+
+    content_safety = MagicMock()
+    content_safety.detect_protected_materials = AsyncMock(side_effect=detect)
+    return content_safety
+
+
+def _lines(path: Path) -> list[dict]:
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_read_records(tmp_path: Path):
+    # arrange
+    (tmp_path / "in.jsonl").write_text('{"text": "a"}\n\n{"text": "b"}\n')
+    (tmp_path / "in.csv").write_text('id,text\n1,"a, b"\n')
+
+    # act
+    jsonl = list(read_records(tmp_path / "in.jsonl", "jsonl"))
+    rows = list(read_records(tmp_path / "in.csv", "csv"))
+
+    # assert
+    assert jsonl == [{"text": "a"}, {"text": "b"}]
+    assert rows == [{"id": "1", "text": "a, b"}]
+
+
+def test_checkpoint_watermark(tmp_path: Path):
+    # arrange
+    checkpoint = Checkpoint(tmp_path / "checkpoint")
+
+    # act
+    for index in (1, 0, 3):
+        checkpoint.mark(index)
+    checkpoint.save()
+    loaded = Checkpoint.load(tmp_path / "checkpoint")
+
+    # assert
+    assert (loaded.watermark, loaded.done) == (2, {3})
+    assert loaded.is_done(1)
+    assert loaded.is_done(3)
+    assert not loaded.is_done(2)
+
+
+@pytest.mark.asyncio
+async def test_run_bulk(tmp_path: Path):
+    # arrange
+    records = [{"id": "a", "text": "lyrics"}, {"id": "b", "text": "bad"}]
+    checkpoint = Checkpoint(tmp_path / "out.jsonl.checkpoint")
+
+    # act
+    with open_output(tmp_path / "out.jsonl", checkpoint) as output:
+        summary = await run_bulk(
+            _content_safety(), "detect_protected_materials", records, output, checkpoint
+        )
+
+    # assert
+    assert (summary.succeeded, summary.failed, summary.skipped) == (1, 1, 0)
+    lines = sorted(_lines(tmp_path / "out.jsonl"), key=lambda line: line["index"])
+    assert lines[0]["id"] == "a"
+    assert lines[0]["result"] == {"protectedMaterialAnalysis": {"detected": True}}
+    assert lines[1]["error"] == "ValueError: boom"
+    assert Checkpoint.load(checkpoint.path).watermark == 2
+
+
+@pytest.mark.asyncio
+async def test_run_bulk_resumes_from_checkpoint(tmp_path: Path):
+    # arrange
+    output_path = tmp_path / "out.jsonl"
+    done = b'{"index": 0, "id": 0, "result": null, "error": null}\n'
+    output_path.write_bytes(done + b'{"index": 2, "id": 2, "res')
+    checkpoint = Checkpoint(
+        tmp_path / "checkpoint", watermark=1, done={3}, output_offset=len(done)
+    )
+    checkpoint.save()
+    content_safety = _content_safety()
+
+    # act
+    checkpoint = Checkpoint.load(tmp_path / "checkpoint")
+    with open_output(output_path, checkpoint) as output:
+        summary = await run_bulk(
+            content_safety,
+            "detect_protected_materials",
+            [{"text": str(i)} for i in range(5)],
+            output,
+            checkpoint,
+            checkpoint_every=1,
+        )
+
+    # assert
+    assert summary.skipped == 2
+    assert sorted(line["index"] for line in _lines(output_path)) == [0, 1, 2, 4]
+    assert content_safety.detect_protected_materials.await_count == 3
+    assert Checkpoint.load(checkpoint.path).watermark == 5
+
+
+@pytest.mark.asyncio
+async def test_run_bulk_retries_failed(tmp_path: Path):
+    # arrange
+    output_path = tmp_path / "out.jsonl"
+    records = [{"text": "lyrics"}, {"text": "bad"}]
+    checkpoint = Checkpoint(tmp_path / "checkpoint")
+    with open_output(output_path, checkpoint) as output:
+        await run_bulk(
+            _content_safety(), "detect_protected_materials", records, output, checkpoint
+        )
+    records[1]["text"] = "fixed"
+    content_safety = _content_safety()
+
+    # act
+    checkpoint = Checkpoint.load(tmp_path / "checkpoint")
+    with open_output(output_path, checkpoint) as output:
+        resumed = await run_bulk(
+            content_safety, "detect_protected_materials", records, output, checkpoint
+        )
+        retried = await run_bulk(
+            content_safety,
+            "detect_protected_materials",
+            records,
+            output,
+            checkpoint,
+            retry_failed=True,
+        )
+
+    # assert
+    assert (resumed.skipped, resumed.failed_before) == (1, 1)
+    assert (retried.succeeded, retried.skipped) == (1, 1)
+    assert content_safety.detect_protected_materials.await_count == 1
+    lines = _lines(output_path)
+    assert [line["index"] for line in lines[-1:]] == [1]
+    assert lines[-1]["error"] is None
+    assert Checkpoint.load(checkpoint.path).failed == set()
+
+
+@pytest.mark.asyncio
+async def test_run_bulk_unknown_operation(tmp_path: Path):
+    with pytest.raises(ValueError, match="operation must be one of"):
+        await run_bulk(
+            MagicMock(), "close", [], MagicMock(), Checkpoint(tmp_path / "c")
+        )
+
+
+def test_parse_args():
+    # act
+    args = parse_args(
+        ["in.csv", "out.jsonl", "--arg", 'categories=["Hate"]', "--arg", "x=y"]
+    )
+
+    # assert
+    assert args.format == "csv"
+    assert dict(args.arg) == {"categories": ["Hate"], "x": "y"}
+    assert args.checkpoint == Path("out.jsonl.checkpoint")
+
+
+def test_main(tmp_path: Path, mocker: MockerFixture):
+    # arrange
+    (tmp_path / "in.jsonl").write_text('{"text": "lyrics"}\n{"text": "bad"}\n')
+    lifespan = mocker.patch("azure_content_safety.hosting.lifespan")
+    lifespan.return_value.__aenter__.return_value = {IContentSafety: _content_safety()}
+
+    # act
+    code = main(
+        [
+            str(tmp_path / "in.jsonl"),
+            str(tmp_path / "out.jsonl"),
+            "--operation",
+            "detect_protected_materials",
+        ]
+    )
+
+    # assert
+    assert code == 1
+    assert len(_lines(tmp_path / "out.jsonl")) == 2
+    assert (tmp_path / "out.jsonl.checkpoint").exists()
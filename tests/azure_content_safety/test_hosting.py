@@ -0,0 +1,94 @@
+import json
+import re
+import subprocess
+import sys
+
+import pytest
+from pytest_mock import MockerFixture
+
+from azure_content_safety import hosting
+from azure_content_safety.protocols.i_content_safety import IContentSafety
+from azure_content_safety.services.sync_content_safety import SyncContentSafety
+
+IMPORT_TIME_BUDGET_MS = 100
+"""Cumulative import time of azure_content_safety.hosting, about 30 ms today."""
+
+
+def run_python(*args: str) -> subprocess.CompletedProcess[str]:
+    return subprocess.run(
+        [sys.executable, *args], capture_output=True, text=True, check=True
+    )
+
+
+def test_import_has_no_heavy_dependencies():
+    # act
+    process = run_python(
+        "-c",
+        "import json, sys, azure_content_safety, azure_content_safety.hosting;"
+        "print(json.dumps(sorted(sys.modules)))",
+    )
+
+    # assert
+    modules = set(json.loads(process.stdout))
+    assert not {"aiohttp", "dotenv", "lagom", "pydantic"} & modules
+
+
+def test_import_time_budget():
+    # act
+    cumulative_us = []
+    for _ in range(3):
+        process = run_python(
+            "-X", "importtime", "-c", "import azure_content_safety.hosting"
+        )
+        match = re.search(
+            r"\|\s*(\d+)\s*\|\s*azure_content_safety\.hosting$",
+            process.stderr,
+            re.MULTILINE,
+        )
+        assert match is not None
+        cumulative_us.append(int(match.group(1)))
+
+    # assert
+    assert min(cumulative_us) / 1000 < IMPORT_TIME_BUDGET_MS
+
+
+def test_container_loads_env_on_first_resolve(
+    mocker: MockerFixture, monkeypatch: pytest.MonkeyPatch
+):
+    # arrange
+    monkeypatch.setattr(hosting, "_container", None)
+    monkeypatch.setenv("AZURE_CONTENT_SAFETY_ENDPOINT", "http://example.com")
+    monkeypatch.setenv("AZURE_CONTENT_SAFETY_KEY", "key")
+    monkeypatch.setenv("AZURE_CONTENT_SAFETY_API_VERSION", "1.0")
+    load_dotenv = mocker.patch("dotenv.load_dotenv")
+
+    # act
+    container = hosting.container
+    before = load_dotenv.call_count
+    content_safety = container[IContentSafety]
+
+    # assert
+    assert hosting.container is container
+    assert before == 0
+    load_dotenv.assert_called_once_with(dotenv_path=".env")
+    assert container[IContentSafety] is content_safety
+
+
+def test_container_sync_client_is_singleton(monkeypatch: pytest.MonkeyPatch):
+    # arrange
+    monkeypatch.setattr(hosting, "_container", None)
+    monkeypatch.setenv("AZURE_CONTENT_SAFETY_ENDPOINT", "http://example.com")
+    monkeypatch.setenv("AZURE_CONTENT_SAFETY_KEY", "key")
+    monkeypatch.setenv("AZURE_CONTENT_SAFETY_API_VERSION", "1.0")
+
+    # act
+    client = hosting.container[SyncContentSafety]
+
+    # assert
+    assert hosting.container[SyncContentSafety] is client
+    assert client.content_safety is hosting.container[IContentSafety]
+
+
+def test_unknown_attribute():
+    with pytest.raises(AttributeError):
+        hosting.unknown
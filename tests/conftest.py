@@ -0,0 +1,40 @@
+import asyncio
+import threading
+from typing import Iterator
+
+import pytest
+
+from azure_content_safety.testing.fake_content_safety import FakeContentSafetyServer
+
+
+class FakeClock:
+    """A clock for the clock argument of time-based services, moved by hand."""
+
+    def __init__(self, now: float = 0.0) -> None:
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture
+def threaded_server() -> Iterator[FakeContentSafetyServer]:
+    """A fake server on its own event loop thread, for sync tests that run their
+    own event loops."""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    server = FakeContentSafetyServer()
+    asyncio.run_coroutine_threadsafe(server.start(), loop).result()
+    try:
+        yield server
+    finally:
+        asyncio.run_coroutine_threadsafe(server.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()